@@ -1,11 +1,18 @@
-from typing import List, Dict, Any, Optional
-from app.core.hygiene import ContextHygieneController
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
+from app.core.registry import get_controller
+from app.core.tokens import DEFAULT_MAX_TOKEN_THRESHOLD
+from app.core.models import HygieneOutput
 
 def sanitize_context(
     history: List[str], 
     query: str, 
     llm: Optional[Any] = None,
-    prompt_type: str = "optimized"
+    prompt_type: str = "optimized",
+    fast_path: bool = True,
+    max_token_threshold: int = DEFAULT_MAX_TOKEN_THRESHOLD,
+    previous_version_id: Optional[str] = None,
+    use_cache: bool = True,
+    engine: str = "llm"
 ) -> Dict[str, Any]:
     """
     Middleware Function: Intercepts and sanitizes context before reasoning.
@@ -15,23 +22,141 @@ def sanitize_context(
         query: The new user query.
         llm: Optional custom LLM instance (LangChain).
         prompt_type: "optimized" (default), "standard", or "opensource".
+        fast_path: Let obviously safe turns be decided locally without an LLM call.
+        max_token_threshold: Token budget for the optimized context (counted locally).
+        previous_version_id: Incremental mode. Pass metadata['context_version_id'] from the
+                             previous turn and only the messages appended since as `history`.
+                             Raises UnknownContextVersion (app.core.store) when that version
+                             is no longer stored; resend the full history without it.
+        use_cache: Set False to bypass the result cache and force a fresh optimization.
+        engine: "llm" (default) or "local" (BM25 + recency pruning, no model call).
 
     Returns:
         Dict containing:
         - 'status': 'pass' or 'halt'
         - 'content': Optimized context string (if pass) or Rejection message (if halt)
-        - 'metadata': Full hygiene metrics
+        - 'metadata': Full hygiene metrics (incl. 'decision_tier': which tier decided)
     """
-    # 1. Initialize Controller
-    governor = ContextHygieneController(llm=llm, prompt_type=prompt_type)
+    # 1. Fetch a pooled Controller (prompt, chain and client are reused across calls)
+    governor = get_controller(llm=llm, prompt_type=prompt_type, engine=engine)
 
     # 2. Run Optimization
     result = governor.optimize_context(
         raw_context=history,
-        new_query=query
+        new_query=query,
+        max_token_threshold=max_token_threshold,
+        fast_path=fast_path,
+        previous_version_id=previous_version_id,
+        use_cache=use_cache
     )
 
     # 3. Apply Decision Logic (The "Firewall")
+    return apply_firewall(result)
+
+async def asanitize_context(
+    history: List[str], 
+    query: str, 
+    llm: Optional[Any] = None,
+    prompt_type: str = "optimized",
+    fast_path: bool = True,
+    max_token_threshold: int = DEFAULT_MAX_TOKEN_THRESHOLD,
+    previous_version_id: Optional[str] = None,
+    use_cache: bool = True,
+    timeout: Optional[float] = None,
+    engine: str = "llm"
+) -> Dict[str, Any]:
+    """
+    Async Middleware Function: same contract as sanitize_context, without blocking the event loop.
+
+    Args:
+        timeout: Optional limit in seconds for the LLM call (raises asyncio.TimeoutError).
+
+    See sanitize_context for the remaining arguments and the return value.
+    """
+    governor = get_controller(llm=llm, prompt_type=prompt_type, engine=engine)
+
+    result = await governor.aoptimize_context(
+        raw_context=history,
+        new_query=query,
+        max_token_threshold=max_token_threshold,
+        fast_path=fast_path,
+        previous_version_id=previous_version_id,
+        use_cache=use_cache,
+        timeout=timeout
+    )
+
+    return apply_firewall(result)
+
+def iter_sanitize_context_batch(
+    items: Iterable[Tuple[List[str], str]],
+    llm: Optional[Any] = None,
+    prompt_type: str = "optimized",
+    max_concurrency: int = 8,
+    max_token_threshold: int = DEFAULT_MAX_TOKEN_THRESHOLD,
+    fast_path: bool = True,
+    use_cache: bool = True,
+    engine: str = "llm"
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Sanitizes many (history, query) pairs, yielding (index, decision) as each one completes.
+
+    Args:
+        items: Iterable of (history, query) pairs. Consumed lazily.
+        max_concurrency: Maximum concurrent LLM calls.
+
+    Returns:
+        Iterator of (input index, dict). The dict is shaped like sanitize_context's output;
+        an item that failed has 'status': 'error' and the exception text in 'reason'.
+    """
+    governor = get_controller(llm=llm, prompt_type=prompt_type, engine=engine)
+
+    for item in governor.iter_optimize_context_batch(
+        items,
+        max_token_threshold=max_token_threshold,
+        max_concurrency=max_concurrency,
+        fast_path=fast_path,
+        use_cache=use_cache
+    ):
+        if item.ok:
+            yield item.index, apply_firewall(item.result)
+        else:
+            yield item.index, {
+                "status": "error",
+                "reason": f"{type(item.error).__name__}: {item.error}",
+                "content": None,
+                "metadata": None
+            }
+
+def sanitize_context_batch(
+    items: Iterable[Tuple[List[str], str]],
+    llm: Optional[Any] = None,
+    prompt_type: str = "optimized",
+    max_concurrency: int = 8,
+    max_token_threshold: int = DEFAULT_MAX_TOKEN_THRESHOLD,
+    fast_path: bool = True,
+    use_cache: bool = True,
+    engine: str = "llm"
+) -> List[Dict[str, Any]]:
+    """
+    Batch Middleware Function: sanitize_context for many sessions, results in input order.
+    Failed items are returned with 'status': 'error' instead of failing the whole batch.
+    """
+    results = dict(iter_sanitize_context_batch(
+        items,
+        llm=llm,
+        prompt_type=prompt_type,
+        max_concurrency=max_concurrency,
+        max_token_threshold=max_token_threshold,
+        fast_path=fast_path,
+        use_cache=use_cache,
+        engine=engine
+    ))
+    return [results[index] for index in range(len(results))]
+
+def apply_firewall(result: HygieneOutput) -> Dict[str, Any]:
+    """
+    Turns a HygieneOutput into the middleware's pass/halt decision.
+    """
     if result.hitl_required:
         return {
             "status": "halt",
@@ -40,7 +165,7 @@ def sanitize_context(
             "metadata": result.model_dump()
         }
     
-    # 4. Success Case
+    # Success Case
     return {
         "status": "pass",
         "content": result.optimized_context,
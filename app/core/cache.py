@@ -0,0 +1,168 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from app.core.models import HygieneOutput
+
+def cache_key(
+    raw_context: List[str],
+    new_query: str,
+    prompt_type: str,
+    max_token_threshold: int,
+    model: str,
+    previous_version_id: Optional[str] = None
+) -> str:
+    """Canonical SHA256 of every input that can change the optimization result."""
+    payload = json.dumps(
+        {
+            "raw_context": list(raw_context),
+            "new_query": new_query,
+            "prompt_type": prompt_type,
+            "max_token_threshold": max_token_threshold,
+            "model": model,
+            "previous_version_id": previous_version_id
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class SQLiteResultStore:
+    """
+    Persistent cache tier in a SQLite file. Reads go through SQLite's memory-mapped I/O.
+    """
+
+    def __init__(self, path: str = "hygiene_cache.db", mmap_size: int = 256 * 1024 * 1024):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            payload, expires_at = row
+            if expires_at is not None and expires_at < time.time():
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return payload
+
+    def put(self, key: str, payload: str, expires_at: Optional[float]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, payload, expires_at) VALUES (?, ?, ?)",
+                (key, payload, expires_at)
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        """Deletes expired rows. Returns the number removed."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM results WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class ResultCache:
+    """
+    Content-addressed cache of HygieneOutputs in front of the LLM call.
+
+    Tier 1 is an in-memory LRU bounded by size and TTL. The optional tier 2
+    (SQLiteResultStore) survives restarts and is shared between processes;
+    tier 2 hits are promoted into memory.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = 3600, persistent: SQLiteResultStore = None):
+        """
+        Args:
+            max_entries: Maximum results kept in memory.
+            ttl_seconds: Lifetime of an entry (None = no expiry).
+            persistent: Optional persistent tier.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persistent = persistent
+        self._entries: "OrderedDict[str, Tuple[HygieneOutput, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "persistent_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def get(self, key: str) -> Optional[HygieneOutput]:
+        """Returns a private copy of the cached result, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                result, expires_at = entry
+                if expires_at is not None and expires_at < now:
+                    del self._entries[key]
+                    self.counters["expirations"] += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return result.model_copy(deep=True)
+
+        if self.persistent is not None:
+            payload = self.persistent.get(key)
+            if payload is not None:
+                result = HygieneOutput.model_validate_json(payload)
+                self._remember(key, result)
+                self._count("persistent_hits")
+                return result.model_copy(deep=True)
+
+        self._count("misses")
+        return None
+
+    def _remember(self, key: str, result: HygieneOutput) -> Optional[float]:
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds is not None else None
+        with self._lock:
+            self._entries[key] = (result, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+        return expires_at
+
+    def put(self, key: str, result: HygieneOutput):
+        """Stores a copy of the result in every tier."""
+        result = result.model_copy(deep=True)
+        expires_at = self._remember(key, result)
+        if self.persistent is not None:
+            self.persistent.put(key, result.model_dump_json(), expires_at)
+
+    def clear(self):
+        """Drops the in-memory tier (the persistent tier is left untouched)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss/eviction counters, current size and hit rate."""
+        with self._lock:
+            stats = dict(self.counters)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["persistent_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["persistent_hits"]) / lookups if lookups else 0.0
+        return stats
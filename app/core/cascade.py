@@ -0,0 +1,230 @@
+import copy
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from langchain_core.callbacks import get_usage_metadata_callback
+from langchain_core.exceptions import OutputParserException
+from pydantic import ValidationError
+from app.core.hygiene import ContextHygieneController
+from app.core.models import HygieneOutput
+from app.core.tokens import DEFAULT_MAX_TOKEN_THRESHOLD, estimate_tokens
+
+# Tiers whose results came from a model and are therefore subject to escalation.
+# Local/relevance decisions are deterministic and accepted as they are.
+MODEL_TIERS = ("llm", "incremental", "cache")
+
+DEGRADATION_ORDER = ("none", "mild", "moderate", "severe")
+
+# Failures that mean "this model could not produce a valid answer": try the next tier
+ESCALATION_ERRORS = (OutputParserException, ValidationError)
+
+@dataclass
+class CascadeTier:
+    """
+    One step of a cascade: a configured controller plus its price (USD per 1K tokens,
+    used for cost accounting only).
+    """
+    name: str
+    controller: ContextHygieneController
+    input_cost_per_1k: float = 0.0
+    output_cost_per_1k: float = 0.0
+
+class CascadeController:
+    """
+    Confidence-based model cascade.
+
+    Tiers are tried cheapest first (e.g. a small model, or the opensource prompt on a
+    local model, then gemini-2.5-flash, then a stronger model). A result is accepted
+    unless it escalates:
+    - `confidence` is below `min_confidence`,
+    - `degradation_level` is worse than `max_degradation`,
+    - the output failed parsing/validation, or `validator` rejected it.
+    The last tier's answer is always returned; if it fails, its error is raised.
+
+    All tiers share the first tier's context store, so a `context_version_id` returned
+    by any tier works for the next incremental call. Later tiers run on shallow copies of
+    their controllers, so pooled controllers passed in keep their own store.
+
+    Token and cost accounting uses the provider's `usage_metadata` for every model call a
+    tier made (retries included). Models that report no usage are estimated locally:
+    system prompt plus history in, the JSON reply out.
+
+    Exposes optimize_context/aoptimize_context, so it can be used wherever a
+    ContextHygieneController is expected (e.g. build_graph(controller=...)).
+    """
+
+    def __init__(
+        self,
+        tiers: List[CascadeTier],
+        min_confidence: float = 0.7,
+        max_degradation: str = "moderate",
+        validator: Optional[Callable[[HygieneOutput, List[str]], bool]] = None
+    ):
+        """
+        Args:
+            tiers: Cascade steps, cheapest first.
+            min_confidence: Results below this confidence escalate.
+            max_degradation: Worst acceptable degradation_level ("none" ... "severe").
+            validator: Optional extra check `validator(result, raw_context) -> bool`;
+                       False escalates.
+        """
+        if not tiers:
+            raise ValueError("A cascade needs at least one tier.")
+        if max_degradation not in DEGRADATION_ORDER:
+            raise ValueError(f"Unknown degradation level '{max_degradation}'.")
+        self.tiers = [tiers[0]] + [replace(tier, controller=self._sharing_store(tier.controller, tiers[0].controller.context_store)) for tier in tiers[1:]]
+        self.min_confidence = min_confidence
+        self.max_degradation = max_degradation
+        self.validator = validator
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[str, float]] = {
+            tier.name: {"calls": 0, "accepted": 0, "escalated": 0, "errors": 0, "seconds": 0.0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0}
+            for tier in tiers
+        }
+        self.escalation_reasons: Dict[str, int] = {}
+
+    @staticmethod
+    def _sharing_store(controller: ContextHygieneController, store) -> ContextHygieneController:
+        """A shallow copy of `controller` that stores versions in `store`; everything else is shared."""
+        shared = copy.copy(controller)
+        shared.context_store = store
+        return shared
+
+    def escalation_reason(self, result: HygieneOutput, raw_context: List[str]) -> Optional[str]:
+        """Why `result` should go to the next tier, or None to accept it."""
+        if result.decision_tier not in MODEL_TIERS:
+            return None
+        if result.confidence < self.min_confidence:
+            return "low_confidence"
+        degradation = result.degradation_level or "none"
+        if DEGRADATION_ORDER.index(degradation) > DEGRADATION_ORDER.index(self.max_degradation):
+            return "degradation"
+        if raw_context and not result.optimized_context.strip():
+            return "empty_context"
+        if self.validator is not None and not self.validator(result, raw_context):
+            return "validator"
+        return None
+
+    @staticmethod
+    def _usage(tier: CascadeTier, result: Optional[HygieneOutput], usage: Optional[Dict[str, Any]]) -> Tuple[int, int]:
+        """(input, output) tokens of one tier attempt."""
+        if usage:
+            return sum(u.get("input_tokens", 0) for u in usage.values()), sum(u.get("output_tokens", 0) for u in usage.values())
+        # Only model calls cost money; local and cache decisions are free
+        if result is None or result.decision_tier not in ("llm", "incremental"):
+            return 0, 0
+        controller = tier.controller
+        prompt_tokens = controller.token_monitor.count(controller.system_prompt) if controller.system_prompt else 0
+        return prompt_tokens + result.tokens_before, estimate_tokens(result.model_dump_json())
+
+    def _account(self, tier: CascadeTier, seconds: float, result: HygieneOutput = None, outcome: str = "accepted", reason: str = None, usage: Dict[str, Any] = None):
+        input_tokens, output_tokens = self._usage(tier, result, usage)
+        with self._lock:
+            counters = self.counters[tier.name]
+            counters["calls"] += 1
+            counters[outcome] += 1
+            counters["seconds"] += seconds
+            counters["input_tokens"] += input_tokens
+            counters["output_tokens"] += output_tokens
+            counters["cost"] += (input_tokens * tier.input_cost_per_1k + output_tokens * tier.output_cost_per_1k) / 1000
+            if reason:
+                self.escalation_reasons[reason] = self.escalation_reasons.get(reason, 0) + 1
+
+    def _settle(self, index: int, tier: CascadeTier, start: float, raw_context: List[str], result: HygieneOutput = None, error: BaseException = None, usage: Dict[str, Any] = None) -> bool:
+        """Records one tier attempt. Returns True when the cascade should stop here."""
+        seconds = time.perf_counter() - start
+        last = index == len(self.tiers) - 1
+        if error is not None:
+            self._account(tier, seconds, outcome="errors", reason=None if last else "invalid_output", usage=usage)
+            if last:
+                raise error
+            return False
+        reason = self.escalation_reason(result, raw_context)
+        if reason is None or last:
+            self._account(tier, seconds, result, usage=usage)
+            return True
+        self._account(tier, seconds, result, outcome="escalated", reason=reason, usage=usage)
+        return False
+
+    def optimize_context(
+        self,
+        raw_context: list[str],
+        new_query: str,
+        max_token_threshold: int = DEFAULT_MAX_TOKEN_THRESHOLD,
+        fast_path: bool = True,
+        previous_version_id: str = None,
+        use_cache: bool = True
+    ) -> HygieneOutput:
+        """
+        Runs the cascade. Arguments and return value as in
+        ContextHygieneController.optimize_context; the result's `cascade_tier` names the
+        tier that answered.
+        """
+        for index, tier in enumerate(self.tiers):
+            start = time.perf_counter()
+            with get_usage_metadata_callback() as usage:
+                try:
+                    # Only the first tier tries the local fast path; it already declined for the rest
+                    result = tier.controller.optimize_context(
+                        raw_context, new_query, max_token_threshold,
+                        fast_path=fast_path and index == 0,
+                        previous_version_id=previous_version_id,
+                        use_cache=use_cache
+                    )
+                except ESCALATION_ERRORS as e:
+                    self._settle(index, tier, start, raw_context, error=e, usage=usage.usage_metadata)
+                    continue
+            if self._settle(index, tier, start, raw_context, result, usage=usage.usage_metadata):
+                result.cascade_tier = tier.name
+                return result
+
+    async def aoptimize_context(
+        self,
+        raw_context: list[str],
+        new_query: str,
+        max_token_threshold: int = DEFAULT_MAX_TOKEN_THRESHOLD,
+        fast_path: bool = True,
+        previous_version_id: str = None,
+        use_cache: bool = True,
+        timeout: float = None
+    ) -> HygieneOutput:
+        """
+        Async counterpart of optimize_context. `timeout` applies to each tier's LLM call.
+        """
+        for index, tier in enumerate(self.tiers):
+            start = time.perf_counter()
+            with get_usage_metadata_callback() as usage:
+                try:
+                    result = await tier.controller.aoptimize_context(
+                        raw_context, new_query, max_token_threshold,
+                        fast_path=fast_path and index == 0,
+                        previous_version_id=previous_version_id,
+                        use_cache=use_cache,
+                        timeout=timeout
+                    )
+                except ESCALATION_ERRORS as e:
+                    self._settle(index, tier, start, raw_context, error=e, usage=usage.usage_metadata)
+                    continue
+            if self._settle(index, tier, start, raw_context, result, usage=usage.usage_metadata):
+                result.cascade_tier = tier.name
+                return result
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Per-tier accounting (calls, accepted, escalated, errors, latency, tokens, cost),
+        escalation reasons and the share of requests answered by the first tier.
+        """
+        with self._lock:
+            tiers = {name: dict(counters) for name, counters in self.counters.items()}
+            reasons = dict(self.escalation_reasons)
+        for counters in tiers.values():
+            counters["mean_seconds"] = counters["seconds"] / counters["calls"] if counters["calls"] else 0.0
+        requests = tiers[self.tiers[0].name]["calls"]
+        return {
+            "tiers": tiers,
+            "escalation_reasons": reasons,
+            "requests": requests,
+            "first_tier_rate": tiers[self.tiers[0].name]["accepted"] / requests if requests else 0.0,
+            "total_cost": sum(counters["cost"] for counters in tiers.values())
+        }
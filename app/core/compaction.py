@@ -0,0 +1,215 @@
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.messages import SystemMessage
+from langchain_core.output_parsers import StrOutputParser
+from app.core.protection import ProtectionIndex, default_protection_index
+from app.core.scheduler import LLMScheduler
+from app.core.tokens import TokenMonitor, default_token_monitor
+
+COMPACTION_SYSTEM_PROMPT = """SYSTEM: CONTEXT WINDOW COMPACTOR
+ROLE: Compress ONE window of a longer conversation for the Context Hygiene Controller.
+
+RULES:
+- Summarize the messages concisely. KEEP speaker roles (e.g. "User:", "AI:").
+- Copy every line under PROTECTED ITEMS verbatim.
+- Keep user goals, constraints and decisions. Drop chit-chat and repetition.
+- NO answering the conversation. NO commentary.
+
+OUTPUT: The compacted messages only, one per line."""
+
+COMPACTION_HUMAN_TEMPLATE = "PROTECTED ITEMS:\n{protected}\n\nMESSAGES:\n{messages}\n\nTarget Size: at most {target_tokens} tokens."
+
+class WindowedCompactor:
+    """
+    Hierarchical map-reduce compaction for histories larger than the model's input window.
+
+    The history is split into token-bounded windows, windows are compacted in parallel,
+    and the reduced history is re-windowed until it fits `trigger_tokens`. Each window's
+    output is memoized by content hash; windows are cut greedily from the start, so the
+    old windows of a growing conversation hit the memo and are never reprocessed.
+    Protected items (IDs, names, constraints) are re-appended verbatim if a window drops them.
+
+    With a `scheduler`, every window call goes through it (quotas, adaptive concurrency,
+    throttling retries), at the priority passed to compact/acompact.
+    """
+
+    def __init__(
+        self,
+        llm,
+        token_monitor: TokenMonitor = None,
+        trigger_tokens: int = 8000,
+        window_tokens: int = 1500,
+        max_concurrency: int = 4,
+        max_levels: int = 3,
+        memo_size: int = 4096,
+        protection: ProtectionIndex = None,
+        scheduler: LLMScheduler = None
+    ):
+        """
+        Args:
+            llm: LangChain ChatModel used for the window summaries.
+            token_monitor: Token counter. Defaults to the shared default_token_monitor.
+            trigger_tokens: Histories above this size are compacted before the hygiene pass.
+            window_tokens: Maximum size of one window.
+            max_concurrency: Windows compacted in parallel.
+            max_levels: Maximum reduce levels.
+            memo_size: Maximum memoized window outputs.
+            protection: Protected-entity index. Defaults to the shared default_protection_index.
+            scheduler: Optional LLMScheduler in front of the window calls. A controller with
+                       a scheduler uses it for its compactor when none is set here.
+        """
+        self.protection = protection or default_protection_index
+        self.token_monitor = token_monitor or default_token_monitor
+        self.trigger_tokens = trigger_tokens
+        self.window_tokens = window_tokens
+        self.max_concurrency = max_concurrency
+        self.max_levels = max_levels
+        self.memo_size = memo_size
+        self._memo: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"compactions": 0, "levels": 0, "windows": 0, "memo_hits": 0, "protected_restored": 0}
+
+        self.llm = llm
+        self.prompt = ChatPromptTemplate.from_messages([
+            SystemMessage(content=COMPACTION_SYSTEM_PROMPT),
+            ("human", COMPACTION_HUMAN_TEMPLATE)
+        ])
+        self.scheduler = scheduler
+        self.chain = self._build_chain()
+
+    def _build_chain(self):
+        llm = self.scheduler.wrap(self.llm) if self.scheduler is not None else self.llm
+        return self.prompt | llm | StrOutputParser()
+
+    def with_scheduler(self, scheduler: LLMScheduler) -> "WindowedCompactor":
+        """A copy whose window calls go through `scheduler`; memo and counters stay shared."""
+        scheduled = copy.copy(self)
+        scheduled.scheduler = scheduler
+        scheduled.chain = scheduled._build_chain()
+        return scheduled
+
+    def needs_compaction(self, messages: List[str]) -> bool:
+        return self.token_monitor.count_messages(messages) > self.trigger_tokens
+
+    def split_windows(self, messages: List[str]) -> List[List[str]]:
+        """Greedy, start-anchored split into windows of at most `window_tokens`."""
+        windows, current, size = [], [], 0
+        for message in messages:
+            tokens = self.token_monitor.count(message)
+            if current and size + tokens > self.window_tokens:
+                windows.append(current)
+                current, size = [], 0
+            current.append(message)
+            size += tokens
+        if current:
+            windows.append(current)
+        return windows
+
+    @staticmethod
+    def _window_key(window: List[str]) -> str:
+        return hashlib.sha256("\x1e".join(window).encode("utf-8")).hexdigest()
+
+    def _window_inputs(self, window: List[str]) -> Dict[str, object]:
+        protected = [entity.text for entity in self.protection.scan(window)]
+        return {
+            "protected": "\n".join(protected) or "(none)",
+            "messages": "\n".join(window),
+            "target_tokens": max(1, self.window_tokens // 4)
+        }
+
+    def _collect(self, window: List[str], output: str) -> List[str]:
+        """Splits a window summary into messages and restores any dropped protected item."""
+        compacted = [line.strip() for line in output.splitlines() if line.strip()]
+        dropped = self.protection.missing(self.protection.scan(window), "\n".join(compacted))
+        compacted.extend(f"[Protected] {entity.text}" for entity in dropped)
+        if dropped:
+            with self._lock:
+                self.counters["protected_restored"] += len(dropped)
+        return compacted
+
+    def _plan_level(self, messages: List[str]):
+        """Splits a level into windows, resolving memoized ones. Returns (windows, outputs, misses)."""
+        windows = self.split_windows(messages)
+        outputs: List[List[str]] = [None] * len(windows)
+        misses = []
+        with self._lock:
+            self.counters["levels"] += 1
+            self.counters["windows"] += len(windows)
+            for i, window in enumerate(windows):
+                key = self._window_key(window)
+                memo = self._memo.get(key)
+                if memo is not None:
+                    self._memo.move_to_end(key)
+                    self.counters["memo_hits"] += 1
+                    outputs[i] = memo
+                elif len(window) == 1 and self.token_monitor.count(window[0]) <= self.window_tokens // 4:
+                    # Too small to be worth an LLM call
+                    outputs[i] = list(window)
+                else:
+                    misses.append((i, key))
+        return windows, outputs, misses
+
+    def _store(self, windows, outputs, misses, results) -> List[str]:
+        for (i, _), output in zip(misses, results):
+            outputs[i] = self._collect(windows[i], output)
+        with self._lock:
+            for i, key in misses:
+                self._memo[key] = outputs[i]
+                self._memo.move_to_end(key)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return [message for output in outputs for message in output]
+
+    def _done(self, before: List[str], after: List[str]) -> bool:
+        size = self.token_monitor.count_messages(after)
+        return size <= self.trigger_tokens or size >= self.token_monitor.count_messages(before)
+
+    def _config(self, priority: str) -> Dict[str, object]:
+        return {"max_concurrency": self.max_concurrency, "metadata": {"priority": priority}}
+
+    def compact(self, messages: List[str], priority: str = "interactive") -> List[str]:
+        """
+        Reduces `messages` until they fit `trigger_tokens` (or `max_levels` is reached).
+        `priority` is the scheduler priority of the window calls.
+        """
+        with self._lock:
+            self.counters["compactions"] += 1
+        for _ in range(self.max_levels):
+            windows, outputs, misses = self._plan_level(messages)
+            results = self.chain.batch(
+                [self._window_inputs(windows[i]) for i, _ in misses],
+                config=self._config(priority)
+            ) if misses else []
+            reduced = self._store(windows, outputs, misses, results)
+            done = self._done(messages, reduced)
+            messages = reduced
+            if done:
+                break
+        return messages
+
+    async def acompact(self, messages: List[str], priority: str = "interactive") -> List[str]:
+        """Async counterpart of compact (windows run concurrently via `abatch`)."""
+        with self._lock:
+            self.counters["compactions"] += 1
+        for _ in range(self.max_levels):
+            windows, outputs, misses = self._plan_level(messages)
+            results = await self.chain.abatch(
+                [self._window_inputs(windows[i]) for i, _ in misses],
+                config=self._config(priority)
+            ) if misses else []
+            reduced = self._store(windows, outputs, misses, results)
+            done = self._done(messages, reduced)
+            messages = reduced
+            if done:
+                break
+        return messages
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats["memo_size"] = len(self._memo)
+        return stats
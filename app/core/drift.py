@@ -0,0 +1,200 @@
+import re
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Tuple
+import numpy as np
+from app.core.prescreen import STOPWORDS, is_clarification
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Inflectional suffixes removed by stem(), longest first
+SUFFIXES = ("ations", "ation", "ings", "ing", "ies", "ied", "ers", "er", "ed", "es", "ly", "s")
+
+# Queries that change the goal rather than the topic
+TASK_MODIFICATION_RE = re.compile(
+    r"\b(instead|actually|rather|change (it|that|the)|switch (to|it)|modify|update (it|that|the)|"
+    r"rewrite|make it|no,? (use|do|make))\b",
+    re.IGNORECASE
+)
+
+@lru_cache(maxsize=16384)
+def stem(word: str) -> str:
+    """
+    Light suffix stripping, so inflections share a feature ("decays"/"decaying" -> "decay",
+    "optimizers" -> "optimiz", "weights" -> "weight"). Keeps a stem of at least 3 letters.
+    """
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            if suffix in ("ies", "ied"):
+                return word[:-3] + "y"
+            if suffix in ("s", "es") and word.endswith("ss"):
+                return word
+            return word[:-len(suffix)]
+    return word
+
+@lru_cache(maxsize=16384)
+def stemmed_words(text: str) -> Tuple[str, ...]:
+    """Stemmed content words of one message, in order."""
+    return tuple(stem(w) for w in WORD_RE.findall(text.lower()) if w not in STOPWORDS and len(w) > 2)
+
+@lru_cache(maxsize=16384)
+def hashed_features(text: str, n_features: int) -> Tuple[int, ...]:
+    """
+    Stable hashed feature ids (stemmed unigrams + bigrams) for one message. Cached per
+    message, so re-scoring a growing history only hashes the new messages.
+    """
+    words = stemmed_words(text)
+    grams = list(words) + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return tuple(zlib.crc32(g.encode("utf-8")) % n_features for g in grams)
+
+@dataclass
+class DriftEstimate:
+    """Local drift verdict for one query."""
+    similarity: float                 # Continuity score (0-1), see DriftDetector.detect
+    query_intent: str                 # One of the HygieneOutput.query_intent literals
+    drift_detected: bool
+    confidence: float
+    message_similarities: np.ndarray  # Query vs. each history message
+
+    def hint(self) -> str:
+        """Compact pre-filter hint for the LLM prompt."""
+        return (
+            f"\n\nLocal Drift Hint (offline vector estimate, verify): similarity={self.similarity:.2f}, "
+            f"suggested query_intent={self.query_intent}, drift_detected={self.drift_detected}"
+        )
+
+class DriftDetector:
+    """
+    Offline drift and intent detector (NumPy only; no network, no GPU).
+
+    Messages are embedded with a hashing TF-IDF vectorizer. Similarity between the
+    new query and a recency-weighted centroid of the history is computed for the
+    whole history in one matrix product, then mapped to the existing intent literals.
+
+    Cosine similarity is diluted by query words the history never used ("How does momentum
+    help?" against a long answer that mentions momentum once), so the share of the query's
+    words grounded in the recent turns also counts: half the words grounded scores exactly
+    follow_up_threshold, all of them twice that.
+
+    `confidence` is calibrated on the drift decision boundary (follow_up_threshold): 0.5 at
+    the boundary, rising linearly to `max_confidence` at similarity 0 or at twice the
+    threshold. Lexical similarity cannot see synonyms, so it never reports certainty.
+    """
+
+    def __init__(
+        self,
+        n_features: int = 2 ** 14,
+        recency_decay: float = 0.85,
+        follow_up_threshold: float = 0.1,
+        unrelated_threshold: float = 0.02,
+        grounding_window: int = 8,
+        max_confidence: float = 0.95
+    ):
+        """
+        Args:
+            n_features: Hashing space size.
+            recency_decay: Weight multiplier per message of age (1.0 = no decay).
+            follow_up_threshold: Similarity at or above which the query continues the topic.
+            unrelated_threshold: Similarity below which the query is unrelated (not just a shift).
+            grounding_window: Number of most recent messages checked for the query's words.
+            max_confidence: Upper bound of the reported confidence.
+        """
+        self.n_features = n_features
+        self.recency_decay = recency_decay
+        self.follow_up_threshold = follow_up_threshold
+        self.unrelated_threshold = unrelated_threshold
+        self.grounding_window = grounding_window
+        self.max_confidence = max_confidence
+
+    def vectorize(self, texts: List[str]) -> np.ndarray:
+        """
+        L2-normalized TF-IDF matrix (len(texts) x features seen). Columns are compacted to
+        the hashed features that actually occur, so memory scales with the vocabulary.
+        """
+        rows, cols = [], []
+        for row, text in enumerate(texts):
+            features = hashed_features(text, self.n_features)
+            rows.extend([row] * len(features))
+            cols.extend(features)
+
+        columns, inverse = np.unique(np.asarray(cols, dtype=np.int64), return_inverse=True)
+        counts = np.zeros((len(texts), max(len(columns), 1)), dtype=np.float32)
+        if cols:
+            np.add.at(counts, (np.asarray(rows), inverse), 1.0)
+
+        # Sublinear TF, smoothed IDF over the texts being compared
+        tf = np.log1p(counts)
+        df = np.count_nonzero(counts, axis=0)
+        idf = np.log((1.0 + len(texts)) / (1.0 + df)) + 1.0
+        matrix = tf * idf.astype(np.float32)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def detect(self, raw_context: List[str], new_query: str) -> Optional[DriftEstimate]:
+        """
+        Scores the query against the history.
+
+        Returns:
+            DriftEstimate, or None when there is no history, or the query has no content
+            words and is not a recognizable clarification.
+        """
+        clarification = is_clarification(raw_context, new_query)
+        if not raw_context or not (clarification or hashed_features(new_query, self.n_features)):
+            return None
+
+        matrix = self.vectorize(list(raw_context) + [new_query])
+        history, query = matrix[:-1], matrix[-1]
+
+        # Whole-history scoring in one product
+        message_similarities = history @ query
+
+        weights = self.recency_decay ** np.arange(len(raw_context) - 1, -1, -1, dtype=np.float32)
+        centroid = weights @ history
+        norm = np.linalg.norm(centroid)
+        similarity = float(centroid @ query / norm) if norm else 0.0
+        # A strong match with any recent message also counts as continuity
+        similarity = max(similarity, float(message_similarities[-3:].max()))
+        similarity = max(similarity, self.grounding(raw_context, new_query) * 2 * self.follow_up_threshold)
+
+        if clarification:
+            intent = "clarification"
+        elif similarity >= self.follow_up_threshold:
+            intent = "task_modification" if TASK_MODIFICATION_RE.search(new_query) else "follow_up"
+        elif similarity >= self.unrelated_threshold:
+            intent = "topic_shift"
+        else:
+            intent = "unrelated"
+
+        drift = intent in ("topic_shift", "unrelated")
+        confidence = self.confidence(similarity, clarification)
+
+        return DriftEstimate(
+            similarity=round(similarity, 4),
+            query_intent=intent,
+            drift_detected=drift,
+            confidence=confidence,
+            message_similarities=message_similarities
+        )
+
+    def grounding(self, raw_context: List[str], new_query: str) -> float:
+        """Share of the query's stemmed words that occur in the recent history."""
+        words = set(stemmed_words(new_query))
+        if not words:
+            return 0.0
+        seen = set()
+        for message in raw_context[-self.grounding_window:]:
+            seen.update(stemmed_words(message))
+        return len(words & seen) / len(words)
+
+    def confidence(self, similarity: float, clarification: bool = False) -> float:
+        """Confidence of the drift verdict for a similarity (see the class docstring)."""
+        threshold = self.follow_up_threshold
+        distance = min(1.0, abs(similarity - threshold) / threshold)
+        confidence = 0.5 + (self.max_confidence - 0.5) * distance
+        if clarification and similarity < threshold:
+            # Recognized from the query's form, not from the similarity
+            confidence = 0.8
+        return round(min(self.max_confidence, confidence), 2)
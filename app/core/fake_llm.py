@@ -0,0 +1,187 @@
+import asyncio
+import json
+from collections import deque
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.output_parsers import PydanticOutputParser
+from pydantic import PrivateAttr
+
+class FakeRateLimitError(Exception):
+    """Provider-style throttling error (HTTP 429) raised by FakeHygieneLLM."""
+    status_code = 429
+
+RAW_CONTEXT_RE = re.compile(r"Raw Context[^:]*:\s(.*?)\n\nNew Query: (.*?)\n\n", re.DOTALL)
+
+class FakeHygieneLLM(BaseChatModel):
+    """
+    Deterministic, offline stand-in for the hygiene LLM (benchmarks and local verification).
+
+    Replies with a valid HygieneOutput JSON built from the prompt: the raw context is
+    echoed back as `optimized_context`, so output size tracks input size like a real
+    model. `malformed=True` replies with truncated JSON (a parser failure); `malformed_first`
+    does so only for the first N calls. `off_schema=True` replies like a small open model:
+    fenced JSON with prose, a trailing comma, a Python literal, a percent confidence,
+    off-vocabulary enums and no metrics block (all repairable locally). Latency is
+    simulated with `latency` seconds per call plus `latency_per_kb` per KB of prompt,
+    using sleep (sync) or asyncio.sleep (async). Streaming yields the reply in 32-character
+    chunks with the latency spread across them.
+
+    Throttling is simulated with `max_concurrent` (in-flight calls) and
+    `requests_per_minute` (sliding 60 s window): calls over either limit raise
+    FakeRateLimitError, like a provider's 429.
+    """
+
+    latency: float = 0.0
+    latency_per_kb: float = 0.0
+    confidence: float = 0.9
+    drift_detected: bool = False
+    hitl_required: bool = False
+    degradation_level: str = "none"
+    malformed: bool = False
+    malformed_first: int = 0
+    off_schema: bool = False
+    max_concurrent: Optional[int] = None
+    requests_per_minute: Optional[int] = None
+    model: str = "fake-hygiene"
+
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _stats: Dict[str, int] = PrivateAttr(default_factory=lambda: {"calls": 0, "prompt_bytes": 0, "response_bytes": 0, "throttled": 0})
+    _in_flight: int = PrivateAttr(default=0)
+    _recent: Any = PrivateAttr(default_factory=deque)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-hygiene"
+
+    def with_structured_output(self, schema, **kwargs):
+        # Parse the JSON reply into the schema, like a provider's JSON mode
+        return self | PydanticOutputParser(pydantic_object=schema)
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        prompt = "".join(str(message.content) for message in messages)
+        match = RAW_CONTEXT_RE.search(str(messages[-1].content))
+        context = match.group(1) if match else ""
+        tokens = max(1, len(prompt) // 4)
+        payload = {
+            "query_intent": "topic_shift" if self.drift_detected else "follow_up",
+            "drift_detected": self.drift_detected,
+            "hitl_required": self.hitl_required,
+            "protected_items_count": 0,
+            "confidence": self.confidence,
+            "requires_reasoning_caution": False,
+            "degradation_level": self.degradation_level,
+            "optimized_context": context,
+            "tokens_before": tokens,
+            "tokens_after": max(1, len(context) // 4),
+            "compression_level": "light",
+            "context_change_magnitude": 0.1,
+            "fragmentation_score": 0.0,
+            "metrics": {
+                "relevance_retention_score": 0.95,
+                "context_reduction_ratio": 0.9,
+                "semantic_coherence_score": 0.95
+            }
+        }
+        if self.off_schema:
+            del payload["metrics"]
+            payload.update(confidence=round(self.confidence * 100), degradation_level="Medium", query_intent="Follow-up")
+            body = json.dumps(payload, indent=2).replace('"requires_reasoning_caution": false', '"requires_reasoning_caution": False')
+            reply = f"Here is the result:\n```json\n{body[:-2]},\n}}\n```"
+        else:
+            reply = json.dumps(payload)
+        with self._lock:
+            if self.malformed or self._stats["calls"] < self.malformed_first:
+                reply = reply[:len(reply) // 2]
+            self._stats["calls"] += 1
+            self._stats["prompt_bytes"] += len(prompt.encode("utf-8"))
+            self._stats["response_bytes"] += len(reply.encode("utf-8"))
+        return reply
+
+    def _admit(self):
+        """Enters a call or raises FakeRateLimitError when over the simulated quota."""
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            if (self.max_concurrent is not None and self._in_flight >= self.max_concurrent) or \
+                    (self.requests_per_minute is not None and len(self._recent) >= self.requests_per_minute):
+                self._stats["throttled"] += 1
+                raise FakeRateLimitError("429 RESOURCE_EXHAUSTED: simulated rate limit")
+            self._in_flight += 1
+            self._recent.append(now)
+
+    def _leave(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _delay(self, messages: List[BaseMessage]) -> float:
+        size = sum(len(str(message.content)) for message in messages)
+        return self.latency + self.latency_per_kb * size / 1024
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        delay = self._delay(messages)
+        self._admit()
+        try:
+            if delay:
+                time.sleep(delay)
+            return self._result(messages)
+        finally:
+            self._leave()
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        delay = self._delay(messages)
+        self._admit()
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            return self._result(messages)
+        finally:
+            self._leave()
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        """The reply with provider-style usage metadata (about 4 characters per token)."""
+        reply = self._reply(messages)
+        input_tokens = max(1, sum(len(str(message.content)) for message in messages) // 4)
+        output_tokens = max(1, len(reply) // 4)
+        message = AIMessage(
+            content=reply,
+            usage_metadata={"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens},
+            response_metadata={"model_name": self.model}
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, messages: List[BaseMessage]) -> List[str]:
+        reply = self._reply(messages)
+        return [reply[i:i + 32] for i in range(0, len(reply), 32)]
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        delay = self._delay(messages)
+        chunks = self._chunks(messages)
+        for chunk in chunks:
+            if delay:
+                time.sleep(delay / len(chunks))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        delay = self._delay(messages)
+        chunks = self._chunks(messages)
+        for chunk in chunks:
+            if delay:
+                await asyncio.sleep(delay / len(chunks))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+
+    def stats(self) -> Dict[str, int]:
+        """Calls made and bytes exchanged."""
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            for key in self._stats:
+                self._stats[key] = 0
+            self._recent.clear()
@@ -1,90 +1,702 @@
+import asyncio
+import logging
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
+import threading
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+from functools import lru_cache
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import SystemMessage
+from langchain_core.exceptions import OutputParserException
 from app.core.models import HygieneOutput
-from dotenv import load_dotenv
+from app.core.prescreen import LocalPrescreen
+from app.core.tokens import TokenMonitor, default_token_monitor, DEFAULT_MAX_TOKEN_THRESHOLD
+from app.core.store import ContextStore, InMemoryContextStore
+from app.core.versioning import compute_version_id
+from app.core.cache import ResultCache, cache_key
+from app.core.compaction import WindowedCompactor
+from app.core.drift import DriftDetector
+from app.core.protection import ProtectionIndex, default_protection_index
+from app.core.relevance import LocalRelevanceOptimizer
+from app.core.instrumentation import Instrumentation, default_instrumentation
+from app.core.serialization import HistorySerializer, SerializedHistory
+from app.core.scheduler import LLMScheduler
+from app.core.repair import HygieneOutputParser, default_output_parser
+from app.core.streaming import HygieneEvent, HygieneStreamParser, decided_events, chunk_text
 from pathlib import Path
 
-# Load environment variables
+# Environment file read on first use of the default Gemini client (not at import time)
 env_path = Path(__file__).parent.parent.parent / ".env"
-load_dotenv(dotenv_path=env_path, override=True)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_NAME = "gemini-2.5-flash"
+
+# Select prompt file
+PROMPT_FILES = {
+    "standard": "context_hygiene_controller.txt",
+    "optimized": "context_hygiene_optimized.txt",
+    "opensource": "context_hygiene_opensource.txt"
+}
+
+# Hygiene engines: the LLM pipeline, or the LLM-free BM25 + recency optimizer
+ENGINES = ("llm", "local")
+
+# Layout: system prompt, then the history, then the per-turn values. Appending messages only
+# appends history lines, so consecutive turns share a byte-identical prompt prefix.
+RAW_CONTEXT_LABEL = "Raw Context (one message per line; indented lines continue the message above)"
+
+HUMAN_TEMPLATE = "Here is the input:\n\n" + RAW_CONTEXT_LABEL + ":\n{raw_context}\n\nNew Query: {new_query}\n\nMax Token Threshold: {max_token_threshold}{drift_hint}"
+
+# Incremental mode: the model only merges the delta into an already-cleaned context
+INCREMENTAL_HUMAN_TEMPLATE = (
+    "Here is the input (incremental update):\n\n"
+    "Previous Optimized Context (already cleaned; keep it unless the budget or drift requires pruning):\n{previous_context}\n\n"
+    "Raw Context (only messages appended since the previous version; one message per line):\n{raw_context}\n\n"
+    "New Query: {new_query}\n\nMax Token Threshold: {max_token_threshold}\n\n"
+    "Return the merged result as optimized_context.{drift_hint}"
+)
+
+@dataclass
+class PreparedRequest:
+    """
+    A hygiene request after the local stages. Either `result` is already decided
+    (local/cache tier) or `chain` must be run on `inputs` and passed to `finalize`.
+    """
+    raw_context: List[str]
+    new_query: str
+    max_token_threshold: int
+    full_context: List[str]
+    tier: Optional[str] = None
+    result: Optional[HygieneOutput] = None
+    chain: Any = None
+    inputs: Optional[Dict[str, Any]] = None
+    cache_key: Optional[str] = None
+    needs_compaction: bool = False
+    history: Optional[SerializedHistory] = None
+
+@dataclass
+class BatchResult:
+    """Outcome of one item in a batch: its input position plus a result or the error it raised."""
+    index: int
+    result: Optional[HygieneOutput] = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+@lru_cache(maxsize=None)
+def load_prompt(prompt_type: str) -> str:
+    """
+    Reads a governance prompt from disk. Cached, so each file is read once per process.
+    """
+    filename = PROMPT_FILES.get(prompt_type, "context_hygiene_controller.txt")
+    prompt_path = Path(__file__).parent.parent.parent / "prompts" / filename
+    with open(prompt_path, "r", encoding="utf-8") as f:
+        return f.read()
+
+@lru_cache(maxsize=None)
+def load_env() -> bool:
+    """
+    Loads the project's .env file once per process. Deferred until a default client is
+    built, so importing the package stays cheap and side-effect free.
+    """
+    from dotenv import load_dotenv
+    return load_dotenv(dotenv_path=env_path, override=True)
+
+def build_default_llm(model_name: str = DEFAULT_MODEL_NAME):
+    """
+    Creates the default internal Gemini client from GOOGLE_API_KEY.
+    The provider package is imported here, on first use, not when this module is imported.
+    """
+    load_env()
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        logger.debug("Environment file looked for at %s (cwd: %s)", env_path, os.getcwd())
+        raise ValueError("GOOGLE_API_KEY not found in environment variables.")
+
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(
+        model=model_name,
+        google_api_key=api_key.strip(),
+        temperature=0.0  # Deterministic behavior
+    )
 
 class ContextHygieneController:
-    def __init__(self, llm=None, model_name: str = "gemini-2.5-flash", prompt_type: str = "standard"):
+    def __init__(
+        self,
+        llm=None,
+        model_name: str = DEFAULT_MODEL_NAME,
+        prompt_type: str = "standard",
+        prescreen: LocalPrescreen = None,
+        token_monitor: TokenMonitor = None,
+        context_store: ContextStore = None,
+        result_cache: ResultCache = None,
+        compactor: WindowedCompactor = None,
+        drift_detector: DriftDetector = None,
+        protection: ProtectionIndex = None,
+        engine: str = "llm",
+        local_optimizer: LocalRelevanceOptimizer = None,
+        instrumentation: Instrumentation = None,
+        serializer: HistorySerializer = None,
+        scheduler: LLMScheduler = None,
+        local_parsing: Optional[bool] = None,
+        output_parser: HygieneOutputParser = None,
+        parse_retries: int = 1
+    ):
         """
         Initialize the Context Hygiene Controller.
-        
+
         Args:
             llm: Optional LangChain ChatModel instance.
             model_name: Default Gemini model.
             prompt_type: "standard" (Master), "optimized" (API), or "opensource" (Llama/Mistral).
+            prescreen: Optional local fast-path screen. Defaults to LocalPrescreen().
+            token_monitor: Local token counter. Defaults to the shared default_token_monitor.
+            context_store: Store of optimized contexts by version id (incremental mode).
+                           Defaults to an in-memory LRU.
+            result_cache: Content-addressed cache of LLM results. Defaults to an in-memory
+                          LRU/TTL ResultCache; pass ResultCache(persistent=SQLiteResultStore(...))
+                          for a disk tier.
+            compactor: Optional WindowedCompactor. Histories above its `trigger_tokens` are
+                       map-reduce compacted before the final hygiene pass.
+            drift_detector: Optional offline DriftDetector. Its estimate is added to the
+                            LLM prompt as a hint.
+            protection: Deterministic protected-entity index (Protection stage). Defaults to
+                        the shared default_protection_index.
+            engine: "llm" (default) or "local" (BM25 + recency LocalRelevanceOptimizer; no model
+                    call, prompt_type independent, no LLM/API key required).
+            local_optimizer: Optional configured LocalRelevanceOptimizer for engine="local".
+            instrumentation: Spans/metrics surface. Defaults to the shared (disabled)
+                             default_instrumentation.
+            serializer: Wire format for the history sent to the LLM. Defaults to the compact,
+                        prefix-stable HistorySerializer(); HistorySerializer(compact=False)
+                        sends the plain list repr.
+            scheduler: Optional LLMScheduler (rate limits, adaptive concurrency, priorities,
+                       retry on throttling) in front of the LLM calls. Share one per
+                       provider/model, e.g. get_scheduler(model_id, requests_per_minute=...).
+                       Also used for the compactor's window calls unless it has its own.
+                       Streamed calls bypass it.
+            local_parsing: Parse the model's raw JSON locally (tolerant extraction and
+                           deterministic repair) instead of the provider's structured-output
+                           mode. Defaults to True for the "opensource" prompt, False otherwise.
+            output_parser: HygieneOutputParser used for local parsing and for streamed
+                           replies. Defaults to the shared default_output_parser.
+            parse_retries: Model re-invocations when a locally parsed reply cannot be repaired.
         """
-        # Select prompt file
-        prompt_map = {
-            "standard": "context_hygiene_controller.txt",
-            "optimized": "context_hygiene_optimized.txt",
-            "opensource": "context_hygiene_opensource.txt"
-        }
-        filename = prompt_map.get(prompt_type, "context_hygiene_controller.txt")
-        
-        prompt_path = Path(__file__).parent.parent.parent / "prompts" / filename
-        with open(prompt_path, "r", encoding="utf-8") as f:
-            self.system_prompt = f.read()
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}'. Use 'llm' or 'local'.")
+        self.engine = engine
+        self.instrumentation = instrumentation or default_instrumentation
+        self.serializer = serializer or HistorySerializer()
+        self.output_parser = output_parser or default_output_parser
+        self.protection = protection or default_protection_index
+        self.drift_detector = drift_detector
+        self.compactor = compactor
+        self.result_cache = result_cache or ResultCache()
+        self.context_store = context_store or InMemoryContextStore()
+        self.token_monitor = token_monitor or default_token_monitor
+        self.prescreen = prescreen or LocalPrescreen(token_monitor=self.token_monitor, protection=self.protection)
+        self._stats_lock = threading.Lock()
+        self.tier_counts = {"local": 0, "cache": 0, "relevance": 0, "incremental": 0, "llm": 0}
+        self.model_name = model_name
+        self.prompt_type = prompt_type
 
-        print(f"Debug: Loaded Governance Prompt Strategy: {prompt_type}")
+        self.local_optimizer = None
+        if engine == "local":
+            self.local_optimizer = local_optimizer or LocalRelevanceOptimizer(
+                token_monitor=self.token_monitor,
+                protection=self.protection,
+                drift_detector=drift_detector
+            )
+
+        if engine == "local" and not llm:
+            # LLM-free engine: nothing to connect to
+            self.llm = None
+            self.model_id = "local"
+            self.system_prompt = None
+            self.scheduler = None
+            self.local_parsing = False
+            self.chain = self.incremental_chain = None
+            self.stream_chains = {}
+            return
 
         if llm:
             self.llm = llm
-            print(f"Debug: Using provided external LLM: {type(llm).__name__}")
-            return
+            logger.debug("Using provided external LLM: %s", type(llm).__name__)
+            # Stable identity for cache keys (shared across processes via the disk tier)
+            self.model_id = getattr(llm, "model", None) or getattr(llm, "model_name", None) or type(llm).__name__
+        else:
+            # Fallback to default internal Gemini setup
+            self.llm = build_default_llm(model_name)
+            self.model_id = model_name
 
-        # Fallback to default internal Gemini setup
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            print(f"Debug: Environment file looked for at {env_path}")
-            print(f"Debug: Current working directory: {os.getcwd()}")
-            raise ValueError("GOOGLE_API_KEY not found in environment variables.")
-            
-        api_key = api_key.strip()
-        
-        try:
-            self.llm = ChatGoogleGenerativeAI(
-                model=model_name,
-                google_api_key=api_key,
-                temperature=0.0  # Deterministic behavior
+        # Prompt text is read on first use and shared by every controller of this type
+        self.system_prompt = load_prompt(prompt_type)
+        logger.debug("Loaded Governance Prompt Strategy: %s", prompt_type)
+
+        # Construct the prompt and chain once; they are stateless and safe to share across calls.
+        # We use SystemMessage for the system prompt to avoid template parsing of the JSON examples
+        self.prompt = ChatPromptTemplate.from_messages([
+            SystemMessage(content=self.system_prompt),
+            ("human", HUMAN_TEMPLATE)
+        ])
+        self.incremental_prompt = ChatPromptTemplate.from_messages([
+            SystemMessage(content=self.system_prompt),
+            ("human", INCREMENTAL_HUMAN_TEMPLATE)
+        ])
+        self.local_parsing = prompt_type == "opensource" if local_parsing is None else local_parsing
+        if self.local_parsing:
+            # Repair locally and re-invoke the model only when repair fails
+            structured_llm = (self.llm | self.output_parser.as_runnable()).with_retry(
+                retry_if_exception_type=(OutputParserException,),
+                stop_after_attempt=parse_retries + 1,
+                wait_exponential_jitter=False
             )
-        except Exception:
-            raise
+        else:
+            structured_llm = self.llm.with_structured_output(HygieneOutput)
+        self.scheduler = scheduler
+        if scheduler is not None:
+            structured_llm = scheduler.wrap(structured_llm)
+            if self.compactor is not None and self.compactor.scheduler is None:
+                # Window summaries count against the same quotas as the hygiene calls
+                self.compactor = self.compactor.with_scheduler(scheduler)
+        self.chain = self.prompt | structured_llm
+        self.incremental_chain = self.incremental_prompt | structured_llm
+        # Streaming mode parses the raw JSON text itself, so these chains end at the model
+        self.stream_chains = {"llm": self.prompt | self.llm, "incremental": self.incremental_prompt | self.llm}
+
+    def _record_tier(self, tier: str):
+        with self._stats_lock:
+            self.tier_counts[tier] = self.tier_counts.get(tier, 0) + 1
+        self.instrumentation.increment(f"hygiene.tier.{tier}")
+
+    def _run_config(self, config: dict = None) -> Optional[dict]:
+        """Adds the instrumentation callbacks to a chain run config (unchanged while disabled)."""
+        callbacks = self.instrumentation.callbacks()
+        if callbacks is None:
+            return config
+        return {**(config or {}), "callbacks": callbacks}
+
+    def _serialize_history(self, request: PreparedRequest, messages: List[str]):
+        """
+        Renders history in the serializer's wire format into the request's inputs. The bytes
+        saved are only measured while instrumentation is enabled.
+        """
+        serialized = self.serializer.serialize(messages, measure=self.instrumentation.enabled)
+        if serialized.bytes_saved is not None:
+            self.instrumentation.increment("hygiene.serialization.bytes_saved", serialized.bytes_saved)
+            self.instrumentation.increment("hygiene.serialization.tokens_saved", serialized.tokens_saved)
+        request.history = serialized
+        request.inputs["raw_context"] = serialized.text
+
+    def stats(self) -> dict:
+        """
+        Returns how many requests each pipeline tier decided, the LLM-call avoidance
+        rate and the result cache counters.
+        """
+        with self._stats_lock:
+            counts = dict(self.tier_counts)
+        total = sum(counts.values())
+        llm_calls = counts.get("llm", 0) + counts.get("incremental", 0)
+        return {
+            "tiers": counts,
+            "total": total,
+            "llm_avoidance_rate": (total - llm_calls) / total if total else 0.0,
+            "cache": self.result_cache.stats(),
+            "serialization": self.serializer.stats(),
+            "output_parser": self.output_parser.stats()
+        }
+
+    def prepare(
+        self,
+        raw_context: list[str],
+        new_query: str,
+        max_token_threshold: int = DEFAULT_MAX_TOKEN_THRESHOLD,
+        fast_path: bool = True,
+        previous_version_id: str = None,
+        use_cache: bool = True
+    ) -> PreparedRequest:
+        """
+        Runs the local stages (store lookup, pre-screen, cache) and selects the chain
+        for the LLM tier. Shared by the sync, async and batch entry points.
+        Raises UnknownContextVersion when `previous_version_id` is not stored.
+        """
+        previous_context = None
+        if previous_version_id:
+            # A miss is an error: raw_context is only the delta, never a full history
+            previous_context = self.context_store.require(previous_version_id)
 
-    def optimize_context(self, raw_context: list[str], new_query: str, max_token_threshold: int = 2000) -> HygieneOutput:
+        # The context the result must cover: the stored version plus the delta
+        full_context = [previous_context] + list(raw_context) if previous_context else raw_context
+        request = PreparedRequest(raw_context, new_query, max_token_threshold, full_context)
+        span = self.instrumentation.span
+
+        # Tier 0: deterministic local screen (no network call)
+        if fast_path:
+            with span("hygiene.prescreen"):
+                request.result = self.prescreen.screen(full_context, new_query, max_token_threshold)
+            if request.result is not None:
+                request.tier = "local"
+                return request
+
+        if self.engine == "local":
+            # LLM-free engine: BM25 + recency pruning over the full context
+            with span("hygiene.relevance", messages=len(full_context)):
+                request.result = self.local_optimizer.optimize(full_context, new_query, max_token_threshold)
+            request.tier = "relevance"
+            return request
+
+        request.cache_key = cache_key(
+            raw_context, new_query, self.prompt_type, max_token_threshold, self.model_id,
+            previous_version_id
+        )
+        if use_cache:
+            with span("hygiene.cache_lookup"):
+                request.result = self.result_cache.get(request.cache_key)
+            if request.result is not None:
+                request.tier = "cache"
+                return request
+
+        drift_hint = ""
+        if self.drift_detector is not None:
+            with span("hygiene.drift"):
+                estimate = self.drift_detector.detect(full_context, new_query)
+            if estimate is not None:
+                drift_hint = estimate.hint()
+
+        if previous_context is not None:
+            # Tier 1a: merge only the delta into the stored context
+            request.tier = "incremental"
+            request.chain = self.incremental_chain
+            request.inputs = {
+                "previous_context": previous_context,
+                "raw_context": raw_context,
+                "new_query": new_query,
+                "max_token_threshold": max_token_threshold,
+                "drift_hint": drift_hint
+            }
+        else:
+            # Tier 1b: execute the pre-compiled chain over the whole history
+            request.tier = "llm"
+            request.chain = self.chain
+            request.inputs = {
+                "raw_context": raw_context,
+                "new_query": new_query,
+                "max_token_threshold": max_token_threshold,
+                "drift_hint": drift_hint
+            }
+            # Too large for one prompt: compact windows first (done by the caller, sync or async)
+            request.needs_compaction = self.compactor is not None and self.compactor.needs_compaction(raw_context)
+
+        if not request.needs_compaction:
+            self._serialize_history(request, raw_context)
+        return request
+
+    def finalize(self, request: PreparedRequest, result: HygieneOutput = None) -> HygieneOutput:
+        """
+        Completes a prepared request: applies local token counts to a fresh LLM result,
+        caches it, records the deciding tier and stores the new context version.
+        """
+        if result is not None:
+            span = self.instrumentation.span
+            if request.history is not None:
+                # Back-references the model copied from the wire format
+                result.optimized_context = request.history.expand(result.optimized_context)
+            # Restore protected spans the model dropped and apply Smart Autonomy locally
+            with span("hygiene.protection"):
+                self.protection.enforce(result, request.full_context)
+            # Replace the model's token guesses with local counts and check the budget
+            with span("hygiene.token_monitor") as timing:
+                self.token_monitor.apply(result, request.full_context, request.max_token_threshold)
+                timing.set(tokens_before=result.tokens_before, tokens_after=result.tokens_after)
+            result.context_version_id = compute_version_id(result.optimized_context)
+            self.result_cache.put(request.cache_key, result)
+        else:
+            result = request.result
+
+        result.decision_tier = request.tier
+        self._record_tier(request.tier)
+
+        # Remember this version so the next turn can send only its delta
+        if result.context_version_id is None:
+            result.context_version_id = compute_version_id(result.optimized_context)
+        self.context_store.put(result.context_version_id, result.optimized_context)
+
+        return result
+
+    def optimize_context(
+        self,
+        raw_context: list[str],
+        new_query: str,
+        max_token_threshold: int = DEFAULT_MAX_TOKEN_THRESHOLD,
+        fast_path: bool = True,
+        previous_version_id: str = None,
+        use_cache: bool = True
+    ) -> HygieneOutput:
         """
         Optimizes the given context based on the user query and token threshold.
 
         Args:
             raw_context: List of strings representing the conversation history.
+                         In incremental mode, only the messages appended since `previous_version_id`.
             new_query: The new user query.
             max_token_threshold: The maximum allowed token count.
+            fast_path: Try the local pre-screen before calling the LLM.
+            previous_version_id: Opt-in incremental mode. The `context_version_id` of the
+                                 previous result. On a store miss UnknownContextVersion is
+                                 raised; resend the full history without it.
+            use_cache: Serve identical requests from the result cache. False bypasses the
+                       lookup (the fresh result still refreshes the cache).
 
         Returns:
-            HygieneOutput: The structured optimization result.
+            HygieneOutput: The structured optimization result. `decision_tier` records
+            which tier decided ("local", "cache", "incremental" or "llm"). Token counts are
+            measured locally, `within_budget` reports whether the budget was met, and
+            `context_version_id` identifies the result for the next incremental call.
         """
-        
-        # Construct the full prompt
-        # We use SystemMessage for the system prompt to avoid template parsing of the JSON examples
-        prompt = ChatPromptTemplate.from_messages([
-            SystemMessage(content=self.system_prompt),
-            ("human", "Here is the input:\n\nRaw Context: {raw_context}\n\nNew Query: {new_query}\n\nMax Token Threshold: {max_token_threshold}")
-        ])
-        
-        # Create the chain with structured output
-        chain = prompt | self.llm.with_structured_output(HygieneOutput)
-        
-        # Execute the chain
-        result = chain.invoke({
-            "raw_context": raw_context,
-            "new_query": new_query,
-            "max_token_threshold": max_token_threshold
-        })
-        
-        return result
+        request = self.prepare(raw_context, new_query, max_token_threshold, fast_path, previous_version_id, use_cache)
+        return self.complete(request)
+
+    def complete(self, request: PreparedRequest) -> HygieneOutput:
+        """Runs a prepared request's LLM tier (compaction, chain) if it has one, then finalizes it."""
+        if request.chain is None:
+            return self.finalize(request)
+
+        if request.needs_compaction:
+            with self.instrumentation.span("hygiene.compaction"):
+                self._serialize_history(request, self.compactor.compact(request.raw_context))
+
+        with self.instrumentation.span("hygiene.chain", tier=request.tier):
+            result = request.chain.invoke(request.inputs, config=self._run_config())
+        return self.finalize(request, result)
+
+    async def aoptimize_context(
+        self,
+        raw_context: list[str],
+        new_query: str,
+        max_token_threshold: int = DEFAULT_MAX_TOKEN_THRESHOLD,
+        fast_path: bool = True,
+        previous_version_id: str = None,
+        use_cache: bool = True,
+        timeout: float = None
+    ) -> HygieneOutput:
+        """
+        Async counterpart of optimize_context, built on the chain's native `ainvoke`.
+
+        Args:
+            timeout: Optional limit in seconds for the LLM call. On expiry the in-flight
+                     call is cancelled and asyncio.TimeoutError is raised. Cancelling the
+                     awaiting task cancels the LLM call as well.
+
+        See optimize_context for the remaining arguments and the return value.
+        """
+        request = self.prepare(raw_context, new_query, max_token_threshold, fast_path, previous_version_id, use_cache)
+        return await self.acomplete(request, timeout=timeout)
+
+    async def acomplete(self, request: PreparedRequest, timeout: float = None) -> HygieneOutput:
+        """Async counterpart of complete; `timeout` as in aoptimize_context."""
+        if request.chain is None:
+            return self.finalize(request)
+
+        if request.needs_compaction:
+            with self.instrumentation.span("hygiene.compaction"):
+                self._serialize_history(request, await self.compactor.acompact(request.raw_context))
+
+        with self.instrumentation.span("hygiene.chain", tier=request.tier):
+            result = await asyncio.wait_for(request.chain.ainvoke(request.inputs, config=self._run_config()), timeout=timeout)
+        return self.finalize(request, result)
+
+    def _stream_parser(self, request: PreparedRequest) -> HygieneStreamParser:
+        """
+        Parser for a streamed reply. Protected entities are scanned up front for the early
+        decision; history back-references are expanded in the streamed pieces as in finalize.
+        """
+        return HygieneStreamParser(
+            protected=bool(self.protection.scan(request.full_context)),
+            repair=self.output_parser,
+            expand=request.history.expand if request.history is not None else None
+        )
+
+    def _complete_stream(self, request: PreparedRequest, parser: HygieneStreamParser) -> List[HygieneEvent]:
+        """Validates and finalizes a fully streamed reply; returns the closing events."""
+        events, output = parser.close()
+        result = self.finalize(request, output)
+        # The Protection stage may append restored spans: stream them as a last context piece
+        if result.optimized_context.startswith(parser.context) and len(result.optimized_context) > len(parser.context):
+            events.append(HygieneEvent("context", "optimized_context", result.optimized_context[len(parser.context):]))
+        events.append(HygieneEvent("result", value=result))
+        return events
+
+    def stream_optimize_context(
+        self,
+        raw_context: list[str],
+        new_query: str,
+        max_token_threshold: int = DEFAULT_MAX_TOKEN_THRESHOLD,
+        fast_path: bool = True,
+        previous_version_id: str = None,
+        use_cache: bool = True
+    ) -> Iterator[HygieneEvent]:
+        """
+        Streaming counterpart of optimize_context. Parses the model's JSON as it arrives
+        and yields HygieneEvents: "field" per completed output field, one "decision" as soon
+        as query_intent/drift_detected/hitl_required are known, "context" pieces of
+        optimized_context while it streams, and finally "result" (the same HygieneOutput
+        optimize_context returns). Local and cache tiers yield decision, context and result
+        at once.
+
+        Closing the generator early (e.g. after a halting decision) stops the model call;
+        the partial result is then neither cached nor stored. Streamed calls do not go
+        through the controller's scheduler.
+
+        See optimize_context for the arguments.
+        """
+        request = self.prepare(raw_context, new_query, max_token_threshold, fast_path, previous_version_id, use_cache)
+        if request.chain is None:
+            yield from decided_events(self.finalize(request))
+            return
+
+        if request.needs_compaction:
+            with self.instrumentation.span("hygiene.compaction"):
+                self._serialize_history(request, self.compactor.compact(request.raw_context))
+
+        parser = self._stream_parser(request)
+        completed = False
+        try:
+            with self.instrumentation.span("hygiene.chain", tier=request.tier):
+                for chunk in self.stream_chains[request.tier].stream(request.inputs, config=self._run_config()):
+                    yield from parser.feed(chunk_text(chunk))
+            yield from self._complete_stream(request, parser)
+            completed = True
+        finally:
+            if not completed:
+                self.instrumentation.increment("hygiene.stream.abandoned")
+
+    async def astream_optimize_context(
+        self,
+        raw_context: list[str],
+        new_query: str,
+        max_token_threshold: int = DEFAULT_MAX_TOKEN_THRESHOLD,
+        fast_path: bool = True,
+        previous_version_id: str = None,
+        use_cache: bool = True
+    ) -> AsyncIterator[HygieneEvent]:
+        """
+        Async counterpart of stream_optimize_context, built on the chain's native `astream`.
+        Closing the generator (`aclose()`) or cancelling the consuming task cancels the model call.
+        """
+        request = self.prepare(raw_context, new_query, max_token_threshold, fast_path, previous_version_id, use_cache)
+        if request.chain is None:
+            for event in decided_events(self.finalize(request)):
+                yield event
+            return
+
+        if request.needs_compaction:
+            with self.instrumentation.span("hygiene.compaction"):
+                self._serialize_history(request, await self.compactor.acompact(request.raw_context))
+
+        parser = self._stream_parser(request)
+        completed = False
+        try:
+            with self.instrumentation.span("hygiene.chain", tier=request.tier):
+                async for chunk in self.stream_chains[request.tier].astream(request.inputs, config=self._run_config()):
+                    for event in parser.feed(chunk_text(chunk)):
+                        yield event
+            for event in self._complete_stream(request, parser):
+                yield event
+            completed = True
+        finally:
+            if not completed:
+                self.instrumentation.increment("hygiene.stream.abandoned")
+
+    def iter_optimize_context_batch(
+        self,
+        items: Iterable[Tuple[List[str], str]],
+        max_token_threshold: int = DEFAULT_MAX_TOKEN_THRESHOLD,
+        max_concurrency: int = 8,
+        chunk_size: int = None,
+        fast_path: bool = True,
+        use_cache: bool = True
+    ) -> Iterator[BatchResult]:
+        """
+        Optimizes many (history, query) pairs, yielding each BatchResult as soon as it completes.
+
+        Items are consumed lazily in chunks, so memory stays flat for arbitrarily large sweeps.
+        Local/cached items are yielded immediately; the rest go through the chain's
+        `batch_as_completed` with at most `max_concurrency` LLM calls in flight. A failing
+        item yields a BatchResult with `error` set instead of aborting the batch.
+
+        Args:
+            items: Iterable of (raw_context, new_query) pairs.
+            max_token_threshold: The maximum allowed token count (per item).
+            max_concurrency: Maximum concurrent LLM calls.
+            chunk_size: Items read ahead per round (default 4 x max_concurrency).
+            fast_path: Try the local pre-screen before calling the LLM.
+            use_cache: Serve identical requests from the result cache.
+        """
+        chunk_size = chunk_size or max_concurrency * 4
+        iterator = iter(items)
+        offset = 0
+
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                return
+
+            pending = []
+            for position, (raw_context, new_query) in enumerate(chunk, start=offset):
+                try:
+                    request = self.prepare(raw_context, new_query, max_token_threshold, fast_path, None, use_cache)
+                    if request.chain is None:
+                        yield BatchResult(position, self.finalize(request))
+                    else:
+                        if request.needs_compaction:
+                            self._serialize_history(request, self.compactor.compact(request.raw_context, priority="batch"))
+                        pending.append((position, request))
+                except Exception as e:
+                    yield BatchResult(position, error=e)
+            offset += len(chunk)
+
+            if not pending:
+                continue
+
+            # Batch mode never uses previous versions, so every pending request shares self.chain
+            completed = self.chain.batch_as_completed(
+                [request.inputs for _, request in pending],
+                # Sweeps yield to interactive calls when a scheduler is configured
+                config=self._run_config({"max_concurrency": max_concurrency, "metadata": {"priority": "batch"}}),
+                return_exceptions=True
+            )
+            for slot, output in completed:
+                position, request = pending[slot]
+                if isinstance(output, Exception):
+                    yield BatchResult(position, error=output)
+                    continue
+                try:
+                    yield BatchResult(position, self.finalize(request, output))
+                except Exception as e:
+                    yield BatchResult(position, error=e)
+
+    def optimize_context_batch(
+        self,
+        items: Iterable[Tuple[List[str], str]],
+        max_token_threshold: int = DEFAULT_MAX_TOKEN_THRESHOLD,
+        max_concurrency: int = 8,
+        fast_path: bool = True,
+        use_cache: bool = True
+    ) -> List[BatchResult]:
+        """
+        Batch counterpart of optimize_context. Returns one BatchResult per item, in input order.
+        See iter_optimize_context_batch for streaming and the argument details.
+        """
+        results = list(self.iter_optimize_context_batch(
+            items,
+            max_token_threshold=max_token_threshold,
+            max_concurrency=max_concurrency,
+            fast_path=fast_path,
+            use_cache=use_cache
+        ))
+        results.sort(key=lambda item: item.index)
+        return results
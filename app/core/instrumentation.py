@@ -0,0 +1,295 @@
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds: durations in seconds, sizes in bytes/tokens
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = tuple(2 ** i for i in range(4, 25))
+
+class Histogram:
+    """Fixed-bucket histogram. Quantiles are estimated as the upper bound of the bucket."""
+
+    def __init__(self, buckets: Sequence[float] = DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                # The overflow bucket has no upper bound; report the observed max
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99)
+        }
+
+class MetricsRegistry:
+    """Thread-safe in-process store of named counters and histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+
+    def increment(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = DURATION_BUCKETS):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {name: histogram.snapshot() for name, histogram in self.histograms.items()}
+            }
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+class MetricsExporter:
+    """Exporter interface: receives MetricsRegistry snapshots (Prometheus, StatsD, files...)."""
+
+    def export(self, snapshot: Dict[str, Any]):
+        raise NotImplementedError
+
+class LoggingExporter(MetricsExporter):
+    """Logs one line per metric."""
+
+    def __init__(self, level: int = logging.INFO):
+        self.level = level
+
+    def export(self, snapshot: Dict[str, Any]):
+        for name, value in sorted(snapshot["counters"].items()):
+            logger.log(self.level, "counter %s=%s", name, value)
+        for name, stats in sorted(snapshot["histograms"].items()):
+            logger.log(self.level, "histogram %s count=%s p50=%s p95=%s p99=%s", name, stats["count"], stats["p50"], stats["p95"], stats["p99"])
+
+class JSONLinesExporter(MetricsExporter):
+    """Appends each snapshot as one JSON line (with a timestamp) to `path`."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, snapshot: Dict[str, Any]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"timestamp": time.time(), **snapshot}) + "\n")
+
+class _NoopSpan:
+    """Shared span returned while instrumentation is disabled."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+class Span:
+    """
+    Times a block. Numeric attributes (set at creation or via `set`) are recorded as
+    histograms named "<span>.<attr>", the duration as "<span>.seconds".
+    """
+    __slots__ = ("instrumentation", "name", "attrs", "start")
+
+    def __init__(self, instrumentation: "Instrumentation", name: str, attrs: Dict[str, Any]):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.instrumentation.record(self.name, time.perf_counter() - self.start, self.attrs, error=exc_type is not None)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+class Instrumentation:
+    """
+    Pluggable instrumentation surface for the controller, its chains and the graph nodes.
+
+    Disabled by default. While disabled, `span()` returns a shared no-op and `callbacks()`
+    returns None, so instrumented code pays a single attribute check and LangChain runs
+    without any callback handler attached.
+
+    When enabled, spans and chain steps are recorded into `registry` and passed to every
+    hook as `hook(name, seconds, attrs)`. `export()` pushes a snapshot to the exporters.
+    """
+
+    def __init__(self, registry: MetricsRegistry = None, enabled: bool = False):
+        self.registry = registry or MetricsRegistry()
+        self.enabled = enabled
+        self.hooks: List[Callable[[str, float, Dict[str, Any]], None]] = []
+        self.exporters: List[MetricsExporter] = []
+        self._handler = ChainTimingHandler(self)
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def add_hook(self, hook: Callable[[str, float, Dict[str, Any]], None]):
+        self.hooks.append(hook)
+
+    def add_exporter(self, exporter: MetricsExporter):
+        self.exporters.append(exporter)
+
+    def span(self, name: str, **attrs):
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attrs)
+
+    def increment(self, name: str, value: float = 1):
+        if self.enabled:
+            self.registry.increment(name, value)
+
+    def callbacks(self) -> Optional[list]:
+        """LangChain callbacks to pass in the run config (None while disabled)."""
+        return [self._handler] if self.enabled else None
+
+    def record(self, name: str, seconds: float, attrs: Dict[str, Any], error: bool = False):
+        self.registry.observe(f"{name}.seconds", seconds)
+        self.registry.increment(f"{name}.calls")
+        if error:
+            self.registry.increment(f"{name}.errors")
+        for key, value in attrs.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.registry.observe(f"{name}.{key}", value, SIZE_BUCKETS)
+        for hook in self.hooks:
+            try:
+                hook(name, seconds, attrs)
+            except Exception:
+                logger.exception("Instrumentation hook failed for %s", name)
+
+    def export(self) -> Dict[str, Any]:
+        """Sends a snapshot of the registry to every exporter and returns it."""
+        snapshot = self.registry.snapshot()
+        for exporter in self.exporters:
+            exporter.export(snapshot)
+        return snapshot
+
+class ChainTimingHandler(BaseCallbackHandler):
+    """
+    LangChain callback handler that times the steps of a hygiene chain:
+    "chain.prompt" (prompt construction), "chain.llm_call" (with prompt/response bytes
+    and token usage when the provider reports it) and "chain.parse" (structured output).
+    """
+
+    # Cheap and thread-safe: run in the caller's thread/loop instead of an executor
+    run_inline = True
+
+    def __init__(self, instrumentation: Instrumentation):
+        self.instrumentation = instrumentation
+        self._lock = threading.Lock()
+        self._runs: Dict[UUID, Tuple[str, float, Dict[str, Any]]] = {}
+
+    @staticmethod
+    def _stage(name: str) -> Optional[str]:
+        if "Prompt" in name:
+            return "chain.prompt"
+        if "Parser" in name:
+            return "chain.parse"
+        return None
+
+    def _start(self, run_id: UUID, stage: str, attrs: Dict[str, Any]):
+        with self._lock:
+            self._runs[run_id] = (stage, time.perf_counter(), attrs)
+
+    def _end(self, run_id: UUID, error: bool = False, **attrs):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        stage, start, started_attrs = run
+        started_attrs.update(attrs)
+        self.instrumentation.record(stage, time.perf_counter() - start, started_attrs, error=error)
+
+    def on_chain_start(self, serialized, inputs, *, run_id: UUID, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name") or ""
+        stage = self._stage(name)
+        if stage:
+            self._start(run_id, stage, {})
+
+    def on_chain_end(self, outputs, *, run_id: UUID, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id: UUID, **kwargs):
+        self._end(run_id, error=True)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        prompt_bytes = sum(len(str(message.content).encode("utf-8")) for batch in messages for message in batch)
+        self._start(run_id, "chain.llm_call", {"prompt_bytes": prompt_bytes})
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        attrs = {}
+        generations = [generation for batch in response.generations for generation in batch]
+        attrs["response_bytes"] = sum(len(generation.text.encode("utf-8")) for generation in generations)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        input_tokens = usage.get("prompt_tokens") or usage.get("input_tokens")
+        output_tokens = usage.get("completion_tokens") or usage.get("output_tokens")
+        if input_tokens is None:
+            # Chat models report usage on the message instead
+            for generation in generations:
+                metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if metadata:
+                    input_tokens = (input_tokens or 0) + metadata.get("input_tokens", 0)
+                    output_tokens = (output_tokens or 0) + metadata.get("output_tokens", 0)
+        if input_tokens is not None:
+            attrs["input_tokens"] = input_tokens
+            attrs["output_tokens"] = output_tokens or 0
+        self._end(run_id, **attrs)
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        self._end(run_id, error=True)
+
+# Process-wide instrumentation used by the controller, versioning and the graph nodes
+default_instrumentation = Instrumentation()
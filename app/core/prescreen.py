@@ -0,0 +1,137 @@
+import re
+from typing import List, Optional
+from app.core.models import HygieneOutput, HygieneMetrics
+from app.core.tokens import TokenMonitor, default_token_monitor
+from app.core.protection import ProtectionIndex, default_protection_index
+
+# Words that carry no topical signal for the overlap estimate
+STOPWORDS = frozenset("""
+a an the and or but if then so of to in on at by for with from as is are was were be been being
+it its this that these those i you he she we they me my your our their what which who whom how why
+when where do does did can could should would will shall may might must not no yes ok okay please
+tell more about also just than too very ai user
+""".split())
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Openings of follow-ups that only make sense relative to the existing context. The
+# opening alone is not enough: see is_clarification.
+CLARIFICATION_RE = re.compile(
+    r"^\s*(why|how so|what do you mean|explain|elaborate|can you (explain|clarify|elaborate)|"
+    r"could you (explain|clarify|elaborate)|go on|continue|example|for example|and then)\b",
+    re.IGNORECASE
+)
+
+def content_words(text: str) -> set:
+    """Lowercased topical words of a message."""
+    return {w for w in WORD_RE.findall(text.lower()) if w not in STOPWORDS and len(w) > 2}
+
+def word_overlap(words: set, messages: List[str]) -> float:
+    """Share of `words` that occur in `messages`."""
+    history_words = set()
+    for message in messages:
+        history_words |= content_words(message)
+    return len(words & history_words) / len(words)
+
+def is_clarification(raw_context: List[str], new_query: str, recent_window: int = 6, min_overlap: float = 0.34) -> bool:
+    """
+    True when the query asks about the current conversation: it opens like a clarification
+    ("why", "explain", ...) and the rest either only points back at it ("why is that?",
+    "explain it") or shares words with the recent turns. "Why is the sky blue?" after an
+    unrelated history is a new topic, not a clarification.
+    """
+    match = CLARIFICATION_RE.match(new_query)
+    if match is None or not raw_context:
+        return False
+    words = content_words(new_query[match.end():])
+    if not words:
+        return True
+    return word_overlap(words, raw_context[-recent_window:]) >= min_overlap
+
+class LocalPrescreen:
+    """
+    Tier 0 of the hygiene pipeline: a deterministic, network-free check.
+
+    When the history is well under budget and the query clearly continues the
+    conversation, there is nothing to prune and no drift to govern, so the
+    screen returns a complete "compression_level=none" HygieneOutput. Any doubt
+    returns None and the request escalates to the LLM.
+    """
+
+    def __init__(self, budget_ratio: float = 0.5, min_overlap: float = 0.34, recent_window: int = 6, token_monitor: TokenMonitor = None, protection: ProtectionIndex = None):
+        """
+        Args:
+            budget_ratio: Fraction of max_token_threshold the history must stay under.
+            min_overlap: Minimum share of query content words found in recent history.
+            recent_window: Number of most recent messages used for the drift estimate.
+            token_monitor: Token counter. Defaults to the shared default_token_monitor.
+            protection: Protected-entity index. Defaults to the shared default_protection_index.
+        """
+        self.token_monitor = token_monitor or default_token_monitor
+        self.protection = protection or default_protection_index
+        self.budget_ratio = budget_ratio
+        self.min_overlap = min_overlap
+        self.recent_window = recent_window
+
+    def drift_overlap(self, raw_context: List[str], new_query: str) -> Optional[float]:
+        """
+        Lexical drift estimate: share of the query's content words present in recent history.
+        Returns None when the query has no content words to compare.
+        """
+        query_words = content_words(new_query)
+        if not query_words:
+            return None
+        return word_overlap(query_words, raw_context[-self.recent_window:])
+
+    def screen(self, raw_context: List[str], new_query: str, max_token_threshold: int) -> Optional[HygieneOutput]:
+        """
+        Decides the request locally if it is obviously safe.
+
+        Returns:
+            HygieneOutput when confident, otherwise None (escalate to the LLM).
+        """
+        tokens = self.token_monitor.count_messages(raw_context)
+
+        # 1. Token Monitor: anything near the budget needs real compression
+        if tokens > max_token_threshold * self.budget_ratio:
+            return None
+
+        # 2. Protection: nothing is pruned, so protected items only need counting
+        protected = self.protection.count(raw_context)
+
+        # 3. Drift & Intent
+        if not raw_context:
+            intent, overlap = None, 1.0
+        elif is_clarification(raw_context, new_query, self.recent_window, self.min_overlap):
+            # A misread clarification skips the HITL firewall, so protected histories escalate
+            if protected:
+                return None
+            intent, overlap = "clarification", 1.0
+        else:
+            overlap = self.drift_overlap(raw_context, new_query)
+            if overlap is None or overlap < self.min_overlap:
+                return None
+            intent = "follow_up"
+
+        return HygieneOutput(
+            optimized_context="\n".join(raw_context),
+            tokens_before=tokens,
+            tokens_after=tokens,
+            compression_level="none",
+            drift_detected=False,
+            protected_items_count=protected,
+            hitl_required=False,
+            confidence=round(min(0.99, 0.8 + 0.2 * overlap), 2),
+            context_change_magnitude=0.0,
+            degradation_level="none",
+            query_intent=intent,
+            fragmentation_score=0.0,
+            requires_reasoning_caution=False,
+            metrics=HygieneMetrics(
+                relevance_retention_score=1.0,
+                context_reduction_ratio=1.0,
+                semantic_coherence_score=1.0
+            ),
+            decision_tier="local",
+            within_budget=True
+        )
@@ -0,0 +1,220 @@
+import re
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.core.models import HygieneOutput
+
+# Entity patterns the Protection stage must never prune. Combined into one regex,
+# so a message is scanned in a single pass; `lastgroup` names the kind.
+PROTECTED_PATTERNS = {
+    "ssn": r"\b\d{3}-\d{2}-\d{4}\b",
+    "card": r"\b(?:\d{4}[ -]){3}\d{4}\b",
+    "email": r"\b[\w.+-]+@[\w-]+\.[\w.]+\b",
+    "api_key": r"\b(?:sk|pk|api|key|tok)[-_][A-Za-z0-9_-]{8,}\b",
+    "identifier": r"\b(?:id|account|order|ticket|invoice|case)\s*(?:#|no\.?|number|:)\s*[A-Za-z0-9-]{3,}\b",
+    "phone": r"(?<![\w-])\+\d[\d -]{7,}\d\b",
+    "name": r"(?:(?<=my name is )|(?<=call me ))(?-i:[A-Z][\w'-]+(?: [A-Z][\w'-]+)?)"
+}
+
+# Start of a clause: start of the message or line, or after a sentence/speaker-tag break
+CLAUSE_START = r"(?:(?<=^)|(?<=\n)|(?<=[.!?;:])|(?<=[.!?;:] ))"
+
+# Instructions and goals the user states. Only user turns are scanned for these: the same
+# words in an assistant reply ("You should always normalize inputs") are advice, not a
+# constraint. Constraints must be imperative at the start of a clause or addressed to the
+# assistant; goals must be in the first person.
+DIRECTIVE_PATTERNS = {
+    "constraint": (
+        CLAUSE_START + r"(?:please )?(?:never|always|don'?t|do not)\b[^.!?;\n]*"
+        r"|\byou (?:must|should|need to)(?: not|n'?t)?(?: always| never)? [^.!?;\n]*"
+        r"|\b(?:reply|respond|answer|write) (?:only )?in\b[^.!?;\n]*"
+    ),
+    "goal": (
+        r"\b(?:my goal is|i want to|i need to|i'm trying to|i am trying to)\b[^.!?;\n]*"
+        r"|" + CLAUSE_START + r"(?:please )?remember(?: that)?\b[^.!?;\n]*"
+    )
+}
+
+PROTECTED_RE = re.compile(
+    "|".join(f"(?P<{kind}>{pattern})" for kind, pattern in PROTECTED_PATTERNS.items()),
+    re.IGNORECASE
+)
+
+DIRECTIVE_RE = re.compile(
+    "|".join(f"(?P<{kind}>{pattern})" for kind, pattern in DIRECTIVE_PATTERNS.items()),
+    re.IGNORECASE
+)
+
+# Speaker tags of turns that are not the user's
+NON_USER_TAG_RE = re.compile(r"^\s*(?:ai|assistant|bot|model|system|tool)\s*:", re.IGNORECASE)
+
+def is_user_turn(message: str) -> bool:
+    """True unless the message carries a non-user speaker tag ("AI:", "Assistant:", ...)."""
+    return NON_USER_TAG_RE.match(message) is None
+
+@dataclass(frozen=True)
+class ProtectedEntity:
+    kind: str
+    text: str
+
+class MultiPatternMatcher:
+    """
+    Aho-Corasick automaton for a configurable dictionary of protected terms
+    (customer names, project codes, ...). Finds all terms in one pass over the
+    text, case-insensitively and on word boundaries.
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[str]] = [[]]
+        for term in terms:
+            if term and term.strip():
+                self._add(term.strip())
+        self._build()
+
+    def _add(self, term: str):
+        state = 0
+        for char in term.lower():
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(term)
+
+    def _build(self):
+        # Breadth-first failure links; depth-1 states fail to the root
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def __bool__(self) -> bool:
+        return len(self._goto) > 1
+
+    def find(self, text: str) -> List[str]:
+        """Returns the dictionary terms found in `text` (as written in the text)."""
+        found, state, lowered = [], 0, text.lower()
+        for end, char in enumerate(lowered):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for term in self._out[state]:
+                start = end - len(term) + 1
+                before = lowered[start - 1] if start > 0 else " "
+                after = lowered[end + 1] if end + 1 < len(lowered) else " "
+                if not before.isalnum() and not after.isalnum():
+                    found.append(text[start:end + 1])
+        return found
+
+class ProtectionIndex:
+    """
+    Deterministic Protection stage.
+
+    Scans history for protected entities (one regex pass + dictionary matcher per message,
+    plus the user's constraints and goals on user turns; cached per message), verifies that the LLM's `optimized_context` still contains every
+    protected span, restores dropped spans verbatim, and applies the Smart Autonomy rule:
+    drift + protected items => HITL; drift + nothing protected => auto-prune (unless the
+    model raised HITL itself; this stage never clears it).
+    """
+
+    def __init__(self, dictionary: Iterable[str] = (), cache_size: int = 8192):
+        """
+        Args:
+            dictionary: Extra protected terms (names, project codes, ...).
+            cache_size: Maximum number of per-message scan results kept.
+        """
+        self.matcher = MultiPatternMatcher(dictionary)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Tuple[ProtectedEntity, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"scans": 0, "cache_hits": 0, "restored": 0, "hitl_set": 0}
+
+    def scan_message(self, message: str) -> Tuple[ProtectedEntity, ...]:
+        """Protected entities in one message (cached by content)."""
+        with self._lock:
+            cached = self._cache.get(message)
+            if cached is not None:
+                self._cache.move_to_end(message)
+                self.counters["cache_hits"] += 1
+                return cached
+
+        entities = [ProtectedEntity(m.lastgroup, m.group(0).strip()) for m in PROTECTED_RE.finditer(message)]
+        if is_user_turn(message):
+            entities.extend(ProtectedEntity(m.lastgroup, m.group(0).strip()) for m in DIRECTIVE_RE.finditer(message))
+        if self.matcher:
+            entities.extend(ProtectedEntity("dictionary", term) for term in self.matcher.find(message))
+        entities = tuple(e for e in entities if e.text)
+
+        with self._lock:
+            self.counters["scans"] += 1
+            self._cache[message] = entities
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return entities
+
+    def scan(self, messages: List[str]) -> List[ProtectedEntity]:
+        """Distinct protected entities across the history, in order of appearance."""
+        seen, entities = set(), []
+        for message in messages:
+            for entity in self.scan_message(message):
+                if entity.text not in seen:
+                    seen.add(entity.text)
+                    entities.append(entity)
+        return entities
+
+    def count(self, messages: List[str]) -> int:
+        return len(self.scan(messages))
+
+    @staticmethod
+    def missing(entities: List[ProtectedEntity], text: str) -> List[ProtectedEntity]:
+        """Entities whose span no longer appears in `text`."""
+        return [entity for entity in entities if entity.text not in text]
+
+    def enforce(self, result: HygieneOutput, raw_context: List[str], entities: Optional[List[ProtectedEntity]] = None) -> HygieneOutput:
+        """
+        Post-LLM Protection check. Restores dropped spans, sets `protected_items_count`
+        and applies the Smart Autonomy rule: drift with protected entities sets
+        `hitl_required`; it is never cleared here.
+        """
+        if entities is None:
+            entities = self.scan(raw_context)
+
+        dropped = self.missing(entities, result.optimized_context)
+        if dropped:
+            restored = "\n".join(f"[Protected] {entity.text}" for entity in dropped)
+            result.optimized_context = f"{result.optimized_context}\n{restored}" if result.optimized_context else restored
+
+        result.protected_items_count = len(entities)
+
+        # Smart Autonomy only ever raises HITL: the model's own flag (ambiguity, low
+        # confidence) is kept even when nothing protected was found
+        hitl = result.hitl_required or (result.drift_detected and bool(entities))
+
+        with self._lock:
+            self.counters["restored"] += len(dropped)
+            if hitl and not result.hitl_required:
+                self.counters["hitl_set"] += 1
+        result.hitl_required = hitl
+
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats["cache_size"] = len(self._cache)
+        return stats
+
+# Shared index with the built-in patterns only
+default_protection_index = ProtectionIndex()
@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from app.core.hygiene import ContextHygieneController, DEFAULT_MODEL_NAME, build_default_llm
+
+class ControllerRegistry:
+    """
+    Thread-safe pool of ready-to-use ContextHygieneControllers.
+
+    Controllers are keyed by (llm identity, model_name, prompt_type, engine), so the prompt,
+    the structured-output chain and the underlying HTTP client are built once and
+    reused by every request that shares the same configuration.
+
+    The pool is an LRU bounded by `max_size`: each controller owns its own result cache and
+    context store, so callers that build a fresh LLM per request must not grow it forever.
+    """
+
+    def __init__(self, max_size: int = 32):
+        self._lock = threading.Lock()
+        self.max_size = max_size
+        self._controllers: "OrderedDict[Tuple[Optional[int], str, str, str], ContextHygieneController]" = OrderedDict()
+        # Default Gemini clients, shared across prompt types of the same model
+        self._default_llms: Dict[str, Any] = {}
+        self._hits = 0
+        self._builds = 0
+        self._evictions = 0
+
+    def get(self, llm=None, model_name: str = DEFAULT_MODEL_NAME, prompt_type: str = "standard", engine: str = "llm") -> ContextHygieneController:
+        """
+        Returns a pooled controller for the given configuration, building it on first use.
+
+        Args:
+            llm: Optional LangChain ChatModel instance. Keyed by identity; the pooled
+                 controller keeps a reference, so the id cannot be reused while the
+                 entry is pooled.
+            model_name: Default Gemini model (used when llm is None).
+            prompt_type: "standard", "optimized", or "opensource".
+            engine: "llm" or "local" (LLM-free relevance engine).
+        """
+        key = (id(llm) if llm is not None else None, model_name, prompt_type, engine)
+
+        with self._lock:
+            controller = self._controllers.get(key)
+            if controller is not None and (llm is None or controller.llm is llm):
+                self._controllers.move_to_end(key)
+                self._hits += 1
+                return controller
+
+            if llm is None and engine == "llm":
+                llm = self._default_llms.get(model_name)
+                if llm is None:
+                    llm = build_default_llm(model_name)
+                    self._default_llms[model_name] = llm
+
+            controller = ContextHygieneController(llm=llm, model_name=model_name, prompt_type=prompt_type, engine=engine)
+            self._controllers[key] = controller
+            self._controllers.move_to_end(key)
+            self._builds += 1
+            while len(self._controllers) > self.max_size:
+                self._controllers.popitem(last=False)
+                self._evictions += 1
+            return controller
+
+    def stats(self) -> Dict[str, int]:
+        """Returns pool counters: hits, builds, evictions and the number of live controllers."""
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "builds": self._builds,
+                "evictions": self._evictions,
+                "size": len(self._controllers),
+                "max_size": self.max_size
+            }
+
+    def clear(self):
+        """Drops all pooled controllers and clients (e.g. after rotating API keys)."""
+        with self._lock:
+            self._controllers.clear()
+            self._default_llms.clear()
+            self._hits = 0
+            self._builds = 0
+            self._evictions = 0
+
+# Process-wide default pool used by sanitize_context and the graph nodes
+default_registry = ControllerRegistry()
+
+def get_controller(llm=None, model_name: str = DEFAULT_MODEL_NAME, prompt_type: str = "standard", engine: str = "llm") -> ContextHygieneController:
+    """Shortcut for default_registry.get(...)."""
+    return default_registry.get(llm=llm, model_name=model_name, prompt_type=prompt_type, engine=engine)
@@ -0,0 +1,253 @@
+import hashlib
+import math
+import re
+import threading
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from app.core.models import HygieneOutput, HygieneMetrics
+from app.core.prescreen import STOPWORDS
+from app.core.tokens import TokenMonitor, default_token_monitor
+from app.core.protection import ProtectionIndex, default_protection_index
+from app.core.drift import DriftDetector
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+def terms(text: str) -> List[str]:
+    return [w for w in WORD_RE.findall(text.lower()) if w not in STOPWORDS and len(w) > 1]
+
+class BM25Index:
+    """
+    Append-only inverted index with Okapi BM25 scoring.
+    Adding a message costs O(its terms); scoring touches only the query terms' postings.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.doc_lengths: List[int] = []
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, text: str) -> int:
+        doc_id = len(self.doc_lengths)
+        tokens = terms(text)
+        counts: Dict[str, int] = defaultdict(int)
+        for token in tokens:
+            counts[token] += 1
+        for token, tf in counts.items():
+            self.postings[token].append((doc_id, tf))
+        self.doc_lengths.append(len(tokens))
+        self.total_length += len(tokens)
+        return doc_id
+
+    def scores(self, query: str) -> List[float]:
+        """BM25 score of every indexed message against `query`."""
+        n = len(self.doc_lengths)
+        scores = [0.0] * n
+        if not n:
+            return scores
+        avgdl = (self.total_length / n) or 1.0
+        for token in set(terms(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1.0 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings:
+                norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths[doc_id] / avgdl)
+                scores[doc_id] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+        return scores
+
+def compression_level(ratio: float) -> str:
+    """Maps tokens_after / tokens_before to HygieneOutput.compression_level."""
+    if ratio >= 0.95:
+        return "none"
+    if ratio >= 0.7:
+        return "light"
+    if ratio >= 0.4:
+        return "moderate"
+    return "aggressive"
+
+def degradation_level(retention: float) -> str:
+    """Maps the share of relevance retained to HygieneOutput.degradation_level."""
+    if retention >= 0.9:
+        return "none"
+    if retention >= 0.7:
+        return "mild"
+    if retention >= 0.4:
+        return "moderate"
+    return "severe"
+
+@dataclass
+class Selection:
+    """Outcome of the pruning step: the kept messages and the numbers the metrics derive from."""
+    optimized_context: str
+    kept: List[int]
+    tokens_before: int
+    tokens_after: int
+    retention: float
+    coherence: float
+
+    @property
+    def ratio(self) -> float:
+        return self.tokens_after / self.tokens_before if self.tokens_before else 1.0
+
+    def metrics(self) -> HygieneMetrics:
+        return HygieneMetrics(
+            relevance_retention_score=round(self.retention, 4),
+            context_reduction_ratio=round(self.ratio, 4),
+            semantic_coherence_score=round(self.coherence, 4)
+        )
+
+class LocalRelevanceOptimizer:
+    """
+    LLM-free optimizer engine (the Relevance stage computed locally).
+
+    Each message is scored against the query with BM25 and multiplied by a recency
+    decay. Protected messages and the most recent turns are always kept. The rest are
+    greedily packed by score under `max_token_threshold` in their original order, so
+    speaker roles and message structure are preserved. Every HygieneOutput field,
+    including the metrics, is filled deterministically.
+
+    The inverted index is incremental: when a history extends one seen before, only
+    the appended messages are indexed.
+    """
+
+    def __init__(
+        self,
+        half_life: float = 8.0,
+        min_relevance: float = 0.05,
+        keep_recent: int = 2,
+        token_monitor: TokenMonitor = None,
+        protection: ProtectionIndex = None,
+        drift_detector: DriftDetector = None,
+        max_indexes: int = 256
+    ):
+        """
+        Args:
+            half_life: Message age (in messages) at which the recency weight halves.
+            min_relevance: Messages scoring below this (0-1, after decay) are pruned.
+            keep_recent: Number of most recent messages always kept.
+            token_monitor: Token counter. Defaults to the shared default_token_monitor.
+            protection: Protected-entity index. Defaults to the shared default_protection_index.
+            drift_detector: Drift/intent estimator. Defaults to DriftDetector().
+            max_indexes: Maximum number of conversation indexes kept for reuse.
+        """
+        self.half_life = half_life
+        self.min_relevance = min_relevance
+        self.keep_recent = keep_recent
+        self.token_monitor = token_monitor or default_token_monitor
+        self.protection = protection or default_protection_index
+        self.drift_detector = drift_detector or DriftDetector()
+        self.max_indexes = max_indexes
+        # Rolling hash of a history prefix -> index over exactly that prefix
+        self._indexes: "OrderedDict[bytes, BM25Index]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _index_for(self, messages: List[str]) -> BM25Index:
+        """Returns an index over `messages`, extending the longest indexed prefix."""
+        prefix_keys, digest = [], b""
+        for message in messages:
+            digest = hashlib.blake2b(digest + message.encode("utf-8"), digest_size=16).digest()
+            prefix_keys.append(digest)
+
+        index = None
+        with self._lock:
+            for length in range(len(prefix_keys), 0, -1):
+                index = self._indexes.pop(prefix_keys[length - 1], None)
+                if index is not None:
+                    break
+
+        if index is None:
+            index = BM25Index()
+        for message in messages[len(index):]:
+            index.add(message)
+
+        if prefix_keys:
+            with self._lock:
+                self._indexes[prefix_keys[-1]] = index
+                while len(self._indexes) > self.max_indexes:
+                    self._indexes.popitem(last=False)
+        return index
+
+    def score(self, raw_context: List[str], new_query: str) -> List[float]:
+        """Relevance (0-1) per message: normalized BM25 x recency decay."""
+        if not raw_context:
+            return []
+        bm25 = self._index_for(raw_context).scores(new_query)
+        top = max(bm25) or 1.0
+        n = len(raw_context)
+        return [
+            (score / top) * 0.5 ** ((n - 1 - i) / self.half_life)
+            for i, score in enumerate(bm25)
+        ]
+
+    def select(self, raw_context: List[str], new_query: str, max_token_threshold: int) -> Selection:
+        """
+        The pruning step alone: keeps protected and recent messages, then packs the rest by
+        relevance under `max_token_threshold`, in original order.
+        """
+        n = len(raw_context)
+        relevance = self.score(raw_context, new_query)
+        sizes = [self.token_monitor.count(message) for message in raw_context]
+        tokens_before = sum(sizes)
+
+        protected = {i for i, message in enumerate(raw_context) if self.protection.scan_message(message)}
+        mandatory = protected | set(range(max(0, n - self.keep_recent), n))
+
+        # Greedy packing: mandatory messages first, then by relevance
+        keep, used = set(), 0
+        for i in sorted(mandatory, reverse=True):
+            keep.add(i)
+            used += sizes[i]
+        for i in sorted(range(n), key=lambda i: relevance[i], reverse=True):
+            if i in keep or relevance[i] < self.min_relevance:
+                continue
+            if used + sizes[i] <= max_token_threshold:
+                keep.add(i)
+                used += sizes[i]
+
+        kept = sorted(keep)
+        optimized_context = "\n".join(raw_context[i] for i in kept)
+        tokens_after = self.token_monitor.count(optimized_context)
+
+        total_relevance = sum(relevance)
+        retention = sum(relevance[i] for i in kept) / total_relevance if total_relevance else 1.0
+        # Coherence: share of kept messages whose predecessor was also kept
+        contiguous = sum(1 for i in kept[1:] if i - 1 in keep)
+        coherence = contiguous / (len(kept) - 1) if len(kept) > 1 else 1.0
+
+        return Selection(optimized_context, kept, tokens_before, tokens_after, retention, coherence)
+
+    def optimize(self, raw_context: List[str], new_query: str, max_token_threshold: int) -> HygieneOutput:
+        """Builds a complete HygieneOutput without calling a model."""
+        selection = self.select(raw_context, new_query, max_token_threshold)
+        entities = self.protection.scan(raw_context)
+        ratio = selection.ratio
+
+        estimate = self.drift_detector.detect(raw_context, new_query)
+        drift = estimate.drift_detected if estimate else False
+        intent = estimate.query_intent if estimate else None
+        degradation = degradation_level(selection.retention)
+
+        return HygieneOutput(
+            optimized_context=selection.optimized_context,
+            tokens_before=selection.tokens_before,
+            tokens_after=selection.tokens_after,
+            compression_level=compression_level(ratio),
+            drift_detected=drift,
+            protected_items_count=len(entities),
+            # Smart Autonomy: drift + protected => ask the user
+            hitl_required=drift and bool(entities),
+            confidence=estimate.confidence if estimate else 0.8,
+            context_change_magnitude=round(1.0 - min(ratio, 1.0), 4),
+            degradation_level=degradation,
+            query_intent=intent,
+            fragmentation_score=round(1.0 - selection.coherence, 4),
+            requires_reasoning_caution=degradation == "severe",
+            metrics=selection.metrics(),
+            within_budget=selection.tokens_after <= max_token_threshold
+        )
@@ -0,0 +1,295 @@
+import json
+import re
+import threading
+from typing import Any, Dict, List, Optional
+from langchain_core.exceptions import OutputParserException
+from langchain_core.runnables import RunnableLambda
+from pydantic import ValidationError
+from app.core.models import HygieneOutput
+from app.core.tokens import estimate_tokens
+
+TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+# Python literals in value position only (after ':', '[' or ','), not inside message text
+PYTHON_LITERAL_RE = re.compile(r"([:\[,]\s*)(True|False|None)(?=\s*[,}\]])")
+ENUM_SEPARATOR_RE = re.compile(r"[\s\-]+")
+
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+ENUM_VALUES = {
+    "compression_level": ("none", "light", "moderate", "aggressive"),
+    "degradation_level": ("none", "mild", "moderate", "severe"),
+    "query_intent": ("follow_up", "clarification", "topic_shift", "task_modification", "unrelated")
+}
+
+# Off-vocabulary labels small models commonly produce (normalized form -> schema value)
+ENUM_SYNONYMS = {
+    "compression_level": {"no": "none", "minimal": "light", "low": "light", "medium": "moderate", "high": "aggressive", "heavy": "aggressive", "strong": "aggressive"},
+    "degradation_level": {"no": "none", "low": "mild", "minor": "mild", "slight": "mild", "medium": "moderate", "high": "severe", "major": "severe", "significant": "severe"},
+    "query_intent": {
+        "followup": "follow_up", "follow": "follow_up", "clarify": "clarification", "clarifying": "clarification",
+        "shift": "topic_shift", "new_topic": "topic_shift", "topic_change": "topic_shift",
+        "modification": "task_modification", "task_change": "task_modification", "off_topic": "unrelated", "irrelevant": "unrelated"
+    }
+}
+
+BOOL_FIELDS = ("drift_detected", "hitl_required", "requires_reasoning_caution")
+INT_FIELDS = ("tokens_before", "tokens_after", "protected_items_count")
+UNIT_FIELDS = ("confidence", "context_change_magnitude", "fragmentation_score")
+UNIT_METRICS = ("relevance_retention_score", "semantic_coherence_score")
+# Smallest bare number read as a percent; (1, 2) is an overshoot of a 0-1 score
+PERCENT_MIN = 2.0
+TRUE_STRINGS = {"true", "yes", "1"}
+FALSE_STRINGS = {"false", "no", "0"}
+
+REPAIR_RULES = (
+    "extracted_json", "trailing_commas", "python_literals", "coerced_bool", "coerced_int",
+    "coerced_float", "rescaled_percent", "clamped", "enum_normalized", "enum_dropped",
+    "compression_derived", "joined_context", "token_counts", "protected_items",
+    "missing_metrics", "reduction_ratio"
+)
+
+def compression_for_ratio(ratio: float) -> str:
+    """Compression level implied by tokens_after / tokens_before."""
+    if ratio >= 0.9:
+        return "none"
+    if ratio >= 0.6:
+        return "light"
+    if ratio >= 0.3:
+        return "moderate"
+    return "aggressive"
+
+class HygieneOutputParser:
+    """
+    Local parse path for raw HygieneOutput replies (no provider structured-output mode).
+
+    1. Fast path: the reply is validated as-is by HygieneOutput's compiled pydantic
+       validator and checked for in-range values.
+    2. Otherwise the JSON is extracted tolerantly (code fences and surrounding prose,
+       trailing commas, Python literals) and deterministic repair rules are applied:
+       type coercion, percent rescaling and clamping of 0-1 scores, enum normalization,
+       defaults for fields recounted locally later (token counts, protected items) and a
+       missing or invalid `context_reduction_ratio` recomputed from the token counts.
+    3. If the repaired object still does not validate, OutputParserException is raised;
+       the controller then retries the model call.
+
+    Counts fast-path hits, repairs, failures and how often each rule fired.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {"parsed": 0, "fast_path": 0, "repaired": 0, "failed": 0}
+        self.rule_counts: Dict[str, int] = {rule: 0 for rule in REPAIR_RULES}
+
+    # --- Entry points ----------------------------------------------------------------
+
+    def parse(self, text: str) -> HygieneOutput:
+        """Parses a raw reply, repairing it if needed. Raises OutputParserException."""
+        try:
+            output = HygieneOutput.model_validate_json(text)
+            if self.in_range(output):
+                self._record([])
+                return output
+        except ValidationError:
+            pass
+        fired: List[str] = []
+        return self.validate(self.extract(text, fired), text, fired)
+
+    def validate(self, data: Any, text: str = "", fired: Optional[List[str]] = None) -> HygieneOutput:
+        """Repairs and validates an already decoded reply. Raises OutputParserException."""
+        fired = fired if fired is not None else []
+        if not isinstance(data, dict):
+            self._fail(fired)
+            raise OutputParserException(f"Expected a JSON object, got {type(data).__name__}.", llm_output=text)
+        data = self.repair(dict(data), fired)
+        try:
+            output = HygieneOutput.model_validate(data)
+        except ValidationError as e:
+            self._fail(fired)
+            raise OutputParserException(f"Reply does not match HygieneOutput after repair: {e}", llm_output=text) from e
+        self._record(fired)
+        return output
+
+    def as_runnable(self) -> RunnableLambda:
+        """Runnable that parses a chat model's message (`llm | parser.as_runnable()`)."""
+        return RunnableLambda(lambda message: self.parse(message.text if hasattr(message, "text") else str(message)), name="parse_hygiene_output")
+
+    # --- Extraction ------------------------------------------------------------------
+
+    def extract(self, text: str, fired: List[str]) -> Dict[str, Any]:
+        """Finds and decodes the JSON object in a reply, tolerating common formatting slips."""
+        start, end = text.find("{"), text.rfind("}")
+        if start < 0 or end < start:
+            self._fail(fired)
+            raise OutputParserException("No JSON object found in the reply.", llm_output=text)
+        candidate = text[start:end + 1]
+        if text[:start].strip() or text[end + 1:].strip():
+            fired.append("extracted_json")
+
+        for rule, fix in (
+            (None, None),
+            ("trailing_commas", lambda s: TRAILING_COMMA_RE.sub(r"\1", s)),
+            ("python_literals", lambda s: PYTHON_LITERAL_RE.sub(lambda m: m.group(1) + PYTHON_LITERALS[m.group(2)], s))
+        ):
+            if fix is not None:
+                fixed = fix(candidate)
+                if fixed == candidate:
+                    continue
+                candidate = fixed
+                fired.append(rule)
+            try:
+                return json.loads(candidate)
+            except ValueError:
+                continue
+        self._fail(fired)
+        raise OutputParserException("Reply is not valid JSON.", llm_output=text)
+
+    # --- Repair rules ----------------------------------------------------------------
+
+    def repair(self, data: Dict[str, Any], fired: List[str]) -> Dict[str, Any]:
+        """Applies the repair rules in place; appends the names of the rules that fired."""
+        context = data.get("optimized_context")
+        if isinstance(context, list):
+            data["optimized_context"] = "\n".join(str(item) for item in context)
+            fired.append("joined_context")
+
+        for field in BOOL_FIELDS:
+            value = data.get(field)
+            if isinstance(value, (str, int)) and not isinstance(value, bool):
+                normalized = str(value).strip().lower()
+                if normalized in TRUE_STRINGS or normalized in FALSE_STRINGS:
+                    data[field] = normalized in TRUE_STRINGS
+                    fired.append("coerced_bool")
+
+        for field in INT_FIELDS:
+            value = self._number(data.get(field), fired)
+            if value is not None and not isinstance(data.get(field), int):
+                data[field] = int(round(value))
+                fired.append("coerced_int")
+        if not isinstance(data.get("tokens_after"), int) and isinstance(data.get("optimized_context"), str):
+            data["tokens_after"] = estimate_tokens(data["optimized_context"])
+            fired.append("token_counts")
+        if not isinstance(data.get("tokens_before"), int) and isinstance(data.get("tokens_after"), int):
+            data["tokens_before"] = data["tokens_after"]
+            fired.append("token_counts")
+        if not isinstance(data.get("protected_items_count"), int):
+            # Recounted by the Protection stage
+            data["protected_items_count"] = 0
+            fired.append("protected_items")
+
+        for field in UNIT_FIELDS:
+            if field in data and data[field] is not None:
+                data[field] = self._unit(data[field], fired)
+
+        for field in ENUM_VALUES:
+            if data.get(field) is not None:
+                data[field] = self._enum(field, data[field], fired)
+
+        metrics = data.get("metrics")
+        if not isinstance(metrics, dict):
+            metrics = {}
+        data["metrics"] = metrics = dict(metrics)
+        for field in UNIT_METRICS:
+            if metrics.get(field) is None:
+                # Conservative stand-in: the model's own confidence
+                metrics[field] = data.get("confidence") if isinstance(data.get("confidence"), float) else 0.5
+                fired.append("missing_metrics")
+            else:
+                metrics[field] = self._unit(metrics[field], fired)
+
+        ratio = self._expected_ratio(data)
+        if ratio is not None:
+            current = self._number(metrics.get("context_reduction_ratio"), fired)
+            if current is None or current < 0:
+                metrics["context_reduction_ratio"] = ratio
+                fired.append("reduction_ratio")
+            if data.get("compression_level") is None:
+                data["compression_level"] = compression_for_ratio(ratio)
+                fired.append("compression_derived")
+        return data
+
+    @staticmethod
+    def _number(value: Any, fired: List[str]) -> Optional[float]:
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, (int, float)):
+            return float(value)
+        if isinstance(value, str):
+            try:
+                number = float(value.strip().rstrip("%"))
+            except ValueError:
+                return None
+            fired.append("coerced_float")
+            return number
+        return None
+
+    def _unit(self, value: Any, fired: List[str]) -> Any:
+        """
+        A 0-1 score: numeric strings parsed, clear percentages ("85%", or 2-100) rescaled,
+        anything else clamped. A slight overshoot such as 1.05 is a score, not 1.05%.
+        """
+        number = self._number(value, fired)
+        if number is None:
+            return value
+        percent = isinstance(value, str) and value.strip().endswith("%")
+        if 0.0 <= number <= 100.0 and (percent or number >= PERCENT_MIN):
+            number /= 100.0
+            fired.append("rescaled_percent")
+        clamped = min(1.0, max(0.0, number))
+        if clamped != number:
+            fired.append("clamped")
+        return clamped
+
+    def _enum(self, field: str, value: Any, fired: List[str]) -> Optional[str]:
+        allowed = ENUM_VALUES[field]
+        if value in allowed:
+            return value
+        normalized = ENUM_SEPARATOR_RE.sub("_", str(value).strip().lower())
+        normalized = ENUM_SYNONYMS[field].get(normalized, normalized)
+        if normalized in allowed:
+            fired.append("enum_normalized")
+            return normalized
+        # Unknown label: optional fields are dropped; compression_level is derived from the ratio
+        fired.append("enum_dropped")
+        return None
+
+    @staticmethod
+    def _expected_ratio(data: Dict[str, Any]) -> Optional[float]:
+        before, after = data.get("tokens_before"), data.get("tokens_after")
+        if not isinstance(before, int) or not isinstance(after, int):
+            return None
+        return round(after / before, 4) if before > 0 else 1.0
+
+    @staticmethod
+    def in_range(output: HygieneOutput) -> bool:
+        """Checks the constraints the schema does not express (0-1 scores, non-negative ratio)."""
+        for value in (output.confidence, output.context_change_magnitude, output.fragmentation_score,
+                      output.metrics.relevance_retention_score, output.metrics.semantic_coherence_score):
+            if value is not None and not 0.0 <= value <= 1.0:
+                return False
+        return output.metrics.context_reduction_ratio >= 0
+
+    # --- Accounting ------------------------------------------------------------------
+
+    def _record(self, fired: List[str]):
+        with self._lock:
+            self.counters["parsed"] += 1
+            self.counters["repaired" if fired else "fast_path"] += 1
+            for rule in set(fired):
+                self.rule_counts[rule] += 1
+
+    def _fail(self, fired: List[str]):
+        with self._lock:
+            self.counters["failed"] += 1
+            for rule in set(fired):
+                self.rule_counts[rule] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Fast-path, repaired and failed parses, plus how many replies each repair rule fixed."""
+        with self._lock:
+            stats = dict(self.counters)
+            stats["rules"] = {rule: count for rule, count in self.rule_counts.items() if count}
+        stats["repair_rate"] = stats["repaired"] / stats["parsed"] if stats["parsed"] else 0.0
+        return stats
+
+# Shared parser, so repair counters aggregate across controllers
+default_output_parser = HygieneOutputParser()
@@ -0,0 +1,305 @@
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from langchain_core.runnables import RunnableLambda
+from app.core.instrumentation import default_instrumentation
+from app.core.tokens import estimate_tokens
+
+# Lower value = served first
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+def is_throttling_error(error: BaseException) -> bool:
+    """Recognizes provider throttling (HTTP 429 / RESOURCE_EXHAUSTED / rate-limit errors)."""
+    for attr in ("status_code", "code", "http_status"):
+        if getattr(error, attr, None) in (429, "429", "RESOURCE_EXHAUSTED"):
+            return True
+    name = type(error).__name__
+    if "RateLimit" in name or "ResourceExhausted" in name or "TooManyRequests" in name:
+        return True
+    text = str(error)
+    return "429" in text or "RESOURCE_EXHAUSTED" in text or "rate limit" in text.lower()
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute / 60` per second. `reserve` always
+    succeeds and returns how long the caller must wait for its reservation to be covered.
+    """
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+class LLMScheduler:
+    """
+    Scheduler in front of one provider/model's LLM calls.
+
+    - Token buckets cap requests and tokens per minute.
+    - Concurrency adapts (AIMD): throttling errors halve the limit, successes raise it
+      additively up to `max_concurrency`.
+    - Waiting calls are served by priority class ("interactive" before "batch"), FIFO
+      within a class.
+    - Throttled calls are retried with exponential backoff and jitter.
+
+    Works for threads and asyncio tasks alike. `wrap(runnable)` returns a Runnable whose
+    invoke/ainvoke/batch go through the scheduler; the priority is read from the run
+    config's metadata ("priority").
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = None,
+        tokens_per_minute: float = None,
+        max_concurrency: int = 8,
+        min_concurrency: int = 1,
+        backoff_factor: float = 0.5,
+        max_retries: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0
+    ):
+        """
+        Args:
+            requests_per_minute: Request quota (None = unlimited).
+            tokens_per_minute: Input-token quota, estimated locally (None = unlimited).
+            max_concurrency: Upper bound for in-flight calls.
+            min_concurrency: Lower bound the adaptive limit never goes below.
+            backoff_factor: Multiplier applied to the limit on throttling.
+            max_retries: Retries of a throttled call before the error is raised.
+            base_delay: First retry delay in seconds (doubles per retry, with jitter).
+            max_delay: Cap for a single retry delay.
+        """
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.backoff_factor = backoff_factor
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._lock = threading.Lock()
+        self._limit = float(max_concurrency)
+        self._in_flight = 0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self.counters: Dict[str, float] = {
+            "submitted": 0, "completed": 0, "failed": 0, "throttled": 0, "retries": 0,
+            "max_queue_depth": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0
+        }
+        self.wait_by_priority: Dict[str, float] = {name: 0.0 for name in PRIORITIES}
+        self.calls_by_priority: Dict[str, int] = {name: 0 for name in PRIORITIES}
+
+    # --- Slots -----------------------------------------------------------------------
+
+    def _try_acquire(self, priority: str, wake: Callable[[], None]):
+        """Takes a slot now, or queues `wake` and returns the queue entry."""
+        with self._lock:
+            if self._in_flight < int(self._limit) and not self._waiters:
+                self._in_flight += 1
+                return None
+            entry = [PRIORITIES.get(priority, 0), next(self._sequence), wake]
+            heapq.heappush(self._waiters, entry)
+            self.counters["max_queue_depth"] = max(self.counters["max_queue_depth"], len(self._waiters))
+            return entry
+
+    def _dispatch(self):
+        """Hands free slots to the highest-priority waiters. Caller holds the lock."""
+        while self._waiters and self._in_flight < int(self._limit):
+            _, _, wake = heapq.heappop(self._waiters)
+            self._in_flight += 1
+            wake()
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+            self._dispatch()
+
+    def _abandon(self, entry) -> bool:
+        """Removes a queued entry. False if it was already granted a slot."""
+        with self._lock:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                return True
+            return False
+
+    def _acquire(self, priority: str):
+        event = threading.Event()
+        entry = self._try_acquire(priority, event.set)
+        if entry is not None:
+            event.wait()
+
+    async def _aacquire(self, priority: str):
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        entry = self._try_acquire(priority, wake)
+        if entry is None:
+            return
+        try:
+            await granted
+        except asyncio.CancelledError:
+            if not self._abandon(entry):
+                self._release()
+            raise
+
+    # --- Adaptive limit and accounting -----------------------------------------------
+
+    def _on_success(self):
+        with self._lock:
+            self._limit = min(self.max_concurrency, self._limit + 1.0 / max(self._limit, 1.0))
+            self._dispatch()
+
+    def _on_throttle(self):
+        with self._lock:
+            self._limit = max(self.min_concurrency, self._limit * self.backoff_factor)
+            self.counters["throttled"] += 1
+        default_instrumentation.increment("scheduler.throttled")
+
+    def _quota_delay(self, tokens: int) -> float:
+        delay = 0.0
+        if self.request_bucket is not None:
+            delay = max(delay, self.request_bucket.reserve(1))
+        if self.token_bucket is not None and tokens:
+            delay = max(delay, self.token_bucket.reserve(tokens))
+        return delay
+
+    def _retry_delay(self, attempt: int) -> float:
+        return min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def _record_wait(self, priority: str, seconds: float):
+        with self._lock:
+            self.counters["wait_seconds"] += seconds
+            self.counters["max_wait_seconds"] = max(self.counters["max_wait_seconds"], seconds)
+            self.wait_by_priority[priority] = self.wait_by_priority.get(priority, 0.0) + seconds
+            self.calls_by_priority[priority] = self.calls_by_priority.get(priority, 0) + 1
+        default_instrumentation.increment(f"scheduler.wait_seconds.{priority}", seconds)
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counters[key] += 1
+
+    # --- Entry points ----------------------------------------------------------------
+
+    def run(self, call: Callable[[], Any], priority: str = "interactive", tokens: int = 0) -> Any:
+        """Runs `call()` under the limits (blocking), retrying throttled attempts."""
+        self._count("submitted")
+        queued = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            self._acquire(priority)
+            try:
+                delay = self._quota_delay(tokens)
+                if delay:
+                    time.sleep(delay)
+                if attempt == 0:
+                    self._record_wait(priority, time.perf_counter() - queued)
+                result = call()
+            except Exception as e:
+                self._release()
+                if not is_throttling_error(e) or attempt == self.max_retries:
+                    self._count("failed")
+                    raise
+                self._on_throttle()
+                self._count("retries")
+                time.sleep(self._retry_delay(attempt))
+                continue
+            self._release()
+            self._on_success()
+            self._count("completed")
+            return result
+
+    async def arun(self, call: Callable[[], Any], priority: str = "interactive", tokens: int = 0) -> Any:
+        """Async counterpart of run: `call()` returns an awaitable."""
+        self._count("submitted")
+        queued = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            await self._aacquire(priority)
+            try:
+                delay = self._quota_delay(tokens)
+                if delay:
+                    await asyncio.sleep(delay)
+                if attempt == 0:
+                    self._record_wait(priority, time.perf_counter() - queued)
+                result = await call()
+            except Exception as e:
+                self._release()
+                if not is_throttling_error(e) or attempt == self.max_retries:
+                    self._count("failed")
+                    raise
+                self._on_throttle()
+                self._count("retries")
+                await asyncio.sleep(self._retry_delay(attempt))
+                continue
+            except BaseException:
+                # Cancelled while holding a slot
+                self._release()
+                raise
+            self._release()
+            self._on_success()
+            self._count("completed")
+            return result
+
+    def wrap(self, runnable) -> RunnableLambda:
+        """
+        Returns a Runnable that sends every invoke/ainvoke of `runnable` through the
+        scheduler. Priority comes from config["metadata"]["priority"] (default
+        "interactive"); the token estimate from the prompt text.
+        """
+        def settings(value, config):
+            priority = ((config or {}).get("metadata") or {}).get("priority", "interactive")
+            text = value.to_string() if hasattr(value, "to_string") else str(value)
+            return priority, estimate_tokens(text)
+
+        def invoke(value, config):
+            priority, tokens = settings(value, config)
+            return self.run(lambda: runnable.invoke(value, config), priority, tokens)
+
+        async def ainvoke(value, config):
+            priority, tokens = settings(value, config)
+            return await self.arun(lambda: runnable.ainvoke(value, config), priority, tokens)
+
+        return RunnableLambda(invoke, afunc=ainvoke, name="scheduled_llm")
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters, current queue depth/in-flight/limit and mean wait per priority."""
+        with self._lock:
+            stats = dict(self.counters)
+            stats["queue_depth"] = len(self._waiters)
+            stats["in_flight"] = self._in_flight
+            stats["concurrency_limit"] = round(self._limit, 2)
+            stats["mean_wait_seconds"] = {
+                name: self.wait_by_priority[name] / self.calls_by_priority[name]
+                for name in self.calls_by_priority if self.calls_by_priority[name]
+            }
+        return stats
+
+_schedulers: Dict[str, LLMScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+def get_scheduler(model_id: str, **limits) -> LLMScheduler:
+    """
+    Process-wide scheduler per provider/model, created with `limits` on first use.
+    Controllers of the same model share it, so its quotas hold across all of them.
+    """
+    with _schedulers_lock:
+        scheduler = _schedulers.get(model_id)
+        if scheduler is None:
+            scheduler = _schedulers[model_id] = LLMScheduler(**limits)
+        return scheduler
@@ -0,0 +1,127 @@
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from app.core.tokens import estimate_tokens
+
+INLINE_SPACE_RE = re.compile(r"[ \t\f\v]+")
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+# Back-reference to an earlier message: a markup element the model can tell apart from
+# conversation text. Echoes of it in the model's output are expanded by SerializedHistory.
+REF_TEMPLATE = '<ref msg="{}"/>'
+REF_RE = re.compile(r'<ref msg="(\d+)"\s*/>')
+
+def normalize_message(message: str) -> str:
+    """
+    Collapses runs of inline whitespace and blank lines and strips trailing spaces.
+    Leading indentation is kept so code blocks stay readable.
+    """
+    lines = []
+    for line in message.strip().splitlines():
+        body = line.lstrip(" \t")
+        indent = line[:len(line) - len(body)]
+        lines.append(indent + INLINE_SPACE_RE.sub(" ", body).rstrip())
+    return BLANK_LINES_RE.sub("\n\n", "\n".join(lines))
+
+@dataclass
+class SerializedHistory:
+    text: str
+    raw_bytes: Optional[int]      # None when the saving was not measured
+    bytes: int
+    duplicates: int
+    tokens_saved: Optional[int]   # None when the saving was not measured
+    refs: Dict[int, str] = field(default_factory=dict)  # Referenced position -> message
+
+    @property
+    def bytes_saved(self) -> Optional[int]:
+        return None if self.raw_bytes is None else self.raw_bytes - self.bytes
+
+    def expand(self, text: str) -> str:
+        """Replaces back-references the model copied into `text` with the messages they stand for."""
+        if not self.refs or "<ref" not in text:
+            return text
+        return REF_RE.sub(lambda m: self.refs.get(int(m.group(1)), m.group(0)), text)
+
+class HistorySerializer:
+    """
+    Compact, prefix-stable wire format for `raw_context`.
+
+    One message per line (speaker tags such as "User:" are kept as written),
+    whitespace-normalized; continuation lines of multi-line messages are indented by two
+    spaces. A message that repeats an earlier one is sent as `<ref msg="<n>"/>` (1-based
+    position of its first occurrence); `SerializedHistory.expand` restores the message if
+    the model copies the reference into its output.
+
+    Appending messages only appends lines, so the system prompt plus the history of one
+    turn is a byte-identical prefix of the next turn's prompt (provider prompt caching).
+
+    The saving against Python's list repr (the previous format) costs a second rendering
+    of the history, so it is only measured when `measure` is set, per serializer or per call.
+    """
+
+    def __init__(self, compact: bool = True, dedupe: bool = True, min_dedupe_chars: int = 32, measure: bool = False):
+        """
+        Args:
+            compact: False sends the plain list repr (for A/B comparison).
+            dedupe: Replace repeated messages with a back-reference.
+            min_dedupe_chars: Shorter messages are always sent verbatim.
+            measure: Always measure the bytes and tokens saved.
+        """
+        self.compact = compact
+        self.dedupe = dedupe
+        self.min_dedupe_chars = min_dedupe_chars
+        self.measure = measure
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "measured": 0, "raw_bytes": 0, "bytes": 0, "duplicates": 0, "bytes_saved": 0, "tokens_saved": 0}
+
+    def serialize(self, messages: List[str], measure: bool = False) -> SerializedHistory:
+        measure = measure or self.measure
+        if not self.compact:
+            raw = repr(list(messages))
+            raw_bytes = len(raw.encode("utf-8"))
+            return self._record(SerializedHistory(raw, raw_bytes, raw_bytes, 0, 0))
+
+        lines, first_seen, refs, duplicates = [], {}, {}, 0
+        for index, message in enumerate(messages):
+            text = normalize_message(message)
+            if self.dedupe and len(text) >= self.min_dedupe_chars:
+                first = first_seen.setdefault(text, index)
+                if first != index:
+                    lines.append(REF_TEMPLATE.format(first + 1))
+                    refs[first + 1] = text
+                    duplicates += 1
+                    continue
+            lines.append("\n".join(f"  {line}" if line and i else line for i, line in enumerate(text.split("\n"))))
+
+        text = "\n".join(lines)
+        raw_bytes = tokens_saved = None
+        if measure:
+            raw = repr(list(messages))
+            raw_bytes = len(raw.encode("utf-8"))
+            tokens_saved = max(0, estimate_tokens(raw) - estimate_tokens(text))
+        return self._record(SerializedHistory(text, raw_bytes, len(text.encode("utf-8")), duplicates, tokens_saved, refs))
+
+    def _record(self, serialized: SerializedHistory) -> SerializedHistory:
+        with self._lock:
+            self.counters["requests"] += 1
+            self.counters["bytes"] += serialized.bytes
+            self.counters["duplicates"] += serialized.duplicates
+            if serialized.raw_bytes is not None:
+                self.counters["measured"] += 1
+                self.counters["raw_bytes"] += serialized.raw_bytes
+                self.counters["bytes_saved"] += serialized.bytes_saved
+                self.counters["tokens_saved"] += serialized.tokens_saved
+        return serialized
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Totals across requests. The savings (bytes_saved, *_per_request) cover the measured
+        requests only.
+        """
+        with self._lock:
+            stats = dict(self.counters)
+        measured = stats["measured"]
+        stats["bytes_saved_per_request"] = stats["bytes_saved"] / measured if measured else 0.0
+        stats["tokens_saved_per_request"] = stats["tokens_saved"] / measured if measured else 0.0
+        return stats
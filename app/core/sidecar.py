@@ -0,0 +1,442 @@
+"""
+Standalone hygiene sidecar: an asyncio HTTP/1.1 service in front of sanitize_context and
+the compiled build_graph() app, shared by several agent processes.
+
+    python -m app.core.sidecar --host 0.0.0.0 --port 8421 --workers 4
+
+Endpoints (JSON in, JSON out):
+    POST /v1/sanitize   {"history": [...], "query": "...", ...sanitize_context options}
+    POST /v1/graph      initial AgentState ({"raw_messages": [...], "current_query": "..."})
+    GET  /healthz
+    GET  /stats
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import signal
+import socket
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from pydantic import BaseModel
+from app.core.api import asanitize_context
+from app.core.hygiene import ENGINES, PROMPT_FILES
+from app.core.instrumentation import default_instrumentation
+from app.core.registry import default_registry, get_controller
+from app.core.store import UnknownContextVersion
+from app.core.tokens import DEFAULT_MAX_TOKEN_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8421
+
+# Request fields forwarded to asanitize_context (name -> default)
+SANITIZE_OPTIONS = {
+    "prompt_type": "optimized",
+    "fast_path": True,
+    "max_token_threshold": DEFAULT_MAX_TOKEN_THRESHOLD,
+    "previous_version_id": None,
+    "use_cache": True,
+    "engine": "llm",
+    "timeout": None
+}
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+    504: "Gateway Timeout"
+}
+
+class HTTPError(Exception):
+    """Ends a request with the given status and a JSON {"error": message} body."""
+
+    def __init__(self, status: int, message: str, headers: Dict[str, str] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+class Overloaded(Exception):
+    """Raised by SingleFlight.run when the pending-work bound is reached."""
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def sanitize_options(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The asanitize_context options of a /v1/sanitize body, with defaults filled in.
+    Values are checked here because they select pooled controllers: an unchecked
+    prompt_type would build a new controller per distinct string. Raises HTTPError(400).
+    """
+    options = {name: body.get(name, default) for name, default in SANITIZE_OPTIONS.items()}
+    if not isinstance(options["prompt_type"], str) or options["prompt_type"] not in PROMPT_FILES:
+        raise HTTPError(400, f"'prompt_type' must be one of {sorted(PROMPT_FILES)}.")
+    if not isinstance(options["engine"], str) or options["engine"] not in ENGINES:
+        raise HTTPError(400, f"'engine' must be one of {list(ENGINES)}.")
+    for name in ("fast_path", "use_cache"):
+        if not isinstance(options[name], bool):
+            raise HTTPError(400, f"'{name}' must be a boolean.")
+    threshold = options["max_token_threshold"]
+    if not isinstance(threshold, int) or isinstance(threshold, bool) or threshold <= 0:
+        raise HTTPError(400, "'max_token_threshold' must be a positive integer.")
+    if options["previous_version_id"] is not None and not isinstance(options["previous_version_id"], str):
+        raise HTTPError(400, "'previous_version_id' must be a string.")
+    if options["timeout"] is not None and (not _is_number(options["timeout"]) or options["timeout"] <= 0):
+        raise HTTPError(400, "'timeout' must be a positive number of seconds.")
+    return options
+
+def request_key(kind: str, payload: Dict[str, Any]) -> str:
+    """Canonical hash of a request: identical (history, query, config) -> identical key."""
+    canonical = json.dumps([kind, payload], sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def to_json(value: Any) -> Any:
+    """json.dumps default: pydantic models (e.g. HygieneMetrics in graph state) as dicts."""
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    return str(value)
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls and bounds the pending work.
+
+    The first caller for a key starts the call as its own task; callers arriving while it
+    runs await the same task (a disconnecting caller does not cancel it for the others).
+    At most `max_concurrency` calls run at once and at most `max_queue` more wait for a
+    slot; a new call beyond that raises Overloaded. Joining a running call is always
+    admitted, since it adds no load.
+    """
+
+    def __init__(self, max_concurrency: int = 32, max_queue: int = 128):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._flights: Dict[str, asyncio.Task] = {}
+        self._pending = 0
+        self.counters = {"calls": 0, "coalesced": 0, "rejected": 0, "max_pending": 0}
+
+    async def run(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.counters["coalesced"] += 1
+            default_instrumentation.increment("sidecar.coalesced")
+            return await asyncio.shield(flight)
+
+        if self._pending >= self.max_concurrency + self.max_queue:
+            self.counters["rejected"] += 1
+            default_instrumentation.increment("sidecar.rejected")
+            raise Overloaded(f"{self._pending} calls pending")
+
+        self._pending += 1
+        self.counters["calls"] += 1
+        self.counters["max_pending"] = max(self.counters["max_pending"], self._pending)
+        flight = asyncio.ensure_future(self._execute(call))
+        self._flights[key] = flight
+        flight.add_done_callback(lambda done: self._settle(key, done))
+        return await asyncio.shield(flight)
+
+    async def _execute(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            async with self._slots:
+                return await call()
+        finally:
+            self._pending -= 1
+
+    def _settle(self, key: str, flight: asyncio.Task):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Mark the error as retrieved when every caller has gone away
+        if not flight.cancelled():
+            flight.exception()
+
+    def stats(self) -> Dict[str, int]:
+        stats = dict(self.counters)
+        stats["pending"] = self._pending
+        stats["in_flight"] = len(self._flights)
+        return stats
+
+class HygieneSidecar:
+    """
+    HTTP front end for the hygiene layer.
+
+    One process serves many agents from a single controller pool (default_registry), so
+    the prompt, chain, result cache and provider client (with its connection pool) are
+    built once per configuration instead of once per agent process. Requests go through
+    SingleFlight: concurrent identical requests share one execution, and a full queue
+    answers 503 with Retry-After instead of queueing without bound.
+    """
+
+    def __init__(
+        self,
+        llm=None,
+        graph_prompt_type: str = "optimized",
+        max_concurrency: int = 32,
+        max_queue: int = 128,
+        request_timeout: Optional[float] = None,
+        max_body_bytes: int = 4 * 1024 * 1024,
+        retry_after: int = 1
+    ):
+        """
+        Args:
+            llm: Optional LangChain ChatModel for every request (default: the pooled Gemini client).
+            graph_prompt_type: Prompt type of the controller behind /v1/graph.
+            max_concurrency: Hygiene calls executing at once.
+            max_queue: Further calls allowed to wait for a slot before answering 503.
+            request_timeout: Seconds a request may wait for its result before 504.
+            max_body_bytes: Larger request bodies are answered with 413.
+            retry_after: Retry-After seconds sent with 503.
+        """
+        self.llm = llm
+        self.graph_prompt_type = graph_prompt_type
+        self.request_timeout = request_timeout
+        self.max_body_bytes = max_body_bytes
+        self.retry_after = retry_after
+        self.flights = SingleFlight(max_concurrency, max_queue)
+        self._graph = None
+        self._server = None
+        self.started = time.time()
+        self.counters: Dict[str, int] = {"requests": 0, "connections": 0}
+        self.responses: Dict[int, int] = {}
+        self.routes: Dict[Tuple[str, str], Callable[[Dict[str, Any]], Awaitable[Any]]] = {
+            ("POST", "/v1/sanitize"): self.handle_sanitize,
+            ("POST", "/v1/graph"): self.handle_graph,
+            ("GET", "/healthz"): self.handle_health,
+            ("GET", "/stats"): self.handle_stats
+        }
+
+    @property
+    def graph(self):
+        """The compiled build_graph() app, built on the first /v1/graph request."""
+        if self._graph is None:
+            from app.graph.workflow import build_graph
+            controller = get_controller(llm=self.llm, prompt_type=self.graph_prompt_type) if self.llm is not None else None
+            self._graph = build_graph(controller=controller)
+        return self._graph
+
+    # --- Handlers --------------------------------------------------------------------
+
+    async def handle_sanitize(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        history, query = body.get("history"), body.get("query")
+        if not isinstance(history, list) or not all(isinstance(m, str) for m in history) or not isinstance(query, str):
+            raise HTTPError(400, "'history' (list of strings) and 'query' (string) are required.")
+        unknown = set(body) - set(SANITIZE_OPTIONS) - {"history", "query"}
+        if unknown:
+            raise HTTPError(400, f"Unknown fields: {sorted(unknown)}")
+        options = sanitize_options(body)
+        key = request_key("sanitize", {"history": history, "query": query, **options})
+        return await self._coalesced(key, lambda: asanitize_context(history, query, llm=self.llm, **options))
+
+    async def handle_graph(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        if not isinstance(body.get("current_query"), str) or (body.get("raw_messages") is None and body.get("raw_message_refs") is None):
+            raise HTTPError(400, "'current_query' and 'raw_messages' (or 'raw_message_refs') are required.")
+        graph = self.graph
+        return await self._coalesced(request_key("graph", body), lambda: graph.ainvoke(dict(body)))
+
+    async def handle_health(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        return {"status": "ok"}
+
+    async def handle_stats(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "uptime_seconds": time.time() - self.started,
+            "requests": self.counters["requests"],
+            "connections": self.counters["connections"],
+            "responses": {str(status): count for status, count in sorted(self.responses.items())},
+            "flights": self.flights.stats(),
+            "controllers": default_registry.stats()
+        }
+
+    async def _coalesced(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            return await asyncio.wait_for(self.flights.run(key, call), self.request_timeout)
+        except Overloaded:
+            raise HTTPError(503, "Hygiene sidecar overloaded, retry later.", {"Retry-After": str(self.retry_after)})
+        except asyncio.TimeoutError:
+            raise HTTPError(504, f"No result within {self.request_timeout}s.")
+        except UnknownContextVersion as e:
+            # Each worker has its own store: the client resends the full history
+            raise HTTPError(409, str(e))
+
+    # --- HTTP/1.1 --------------------------------------------------------------------
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        """Returns (method, path, headers, body), or None when the client closed the connection."""
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line.")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HTTPError(400, "Content-Length must be a non-negative integer.")
+        if length > self.max_body_bytes:
+            raise HTTPError(413, f"Body exceeds {self.max_body_bytes} bytes.")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target.split("?", 1)[0], headers, body
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> Any:
+        handler = self.routes.get((method, path))
+        if handler is None:
+            known = [route_method for route_method, route_path in self.routes if route_path == path]
+            raise HTTPError(405 if known else 404, f"No route for {method} {path}.")
+        try:
+            payload = json.loads(body) if body else {}
+        except ValueError as e:
+            raise HTTPError(400, f"Invalid JSON: {e}")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "The body must be a JSON object.")
+        return await handler(payload)
+
+    def _write_response(self, writer: asyncio.StreamWriter, status: int, payload: Any, headers: Dict[str, str] = None, keep_alive: bool = True):
+        body = json.dumps(payload, default=to_json).encode("utf-8")
+        lines = [
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"
+        ]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        self.responses[status] = self.responses.get(status, 0) + 1
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.counters["connections"] += 1
+        try:
+            while True:
+                keep_alive = True
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, body = request
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    self.counters["requests"] += 1
+                    with default_instrumentation.span("sidecar.request", path=path):
+                        status, payload, extra = 200, await self._dispatch(method, path, body), None
+                except HTTPError as e:
+                    status, payload, extra = e.status, {"error": str(e)}, e.headers
+                    keep_alive = keep_alive and e.status not in (400, 413)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    logger.exception("Sidecar request failed")
+                    status, payload, extra = 500, {"error": f"{type(e).__name__}: {e}"}, None
+                self._write_response(writer, status, payload, extra, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT, reuse_port: bool = False):
+        """Starts listening (port 0 picks a free port; see `port`) and returns the server."""
+        self._server = await asyncio.start_server(self.handle_connection, host, port, reuse_port=reuse_port or None)
+        return self._server
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+async def _serve_forever(sidecar: HygieneSidecar, host: str, port: int, reuse_port: bool):
+    server = await sidecar.start(host, port, reuse_port=reuse_port)
+    loop = asyncio.get_running_loop()
+    stop = loop.create_future()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: stop.done() or stop.set_result(None))
+    logger.info("Hygiene sidecar listening on %s:%d", host, sidecar.port)
+    async with server:
+        await stop
+    await sidecar.close()
+
+def build_sidecar(options: Dict[str, Any]) -> HygieneSidecar:
+    """Builds a sidecar from CLI options (also used inside each worker process)."""
+    llm = None
+    if options.get("fake_llm_latency") is not None:
+        from app.core.fake_llm import FakeHygieneLLM
+        llm = FakeHygieneLLM(latency=options["fake_llm_latency"])
+    return HygieneSidecar(
+        llm=llm,
+        max_concurrency=options["max_concurrency"],
+        max_queue=options["max_queue"],
+        request_timeout=options.get("request_timeout")
+    )
+
+def run_worker(host: str, port: int, options: Dict[str, Any], reuse_port: bool = False):
+    """Entry point of one serving process."""
+    logging.basicConfig(level=options.get("log_level", "INFO"))
+    asyncio.run(_serve_forever(build_sidecar(options), host, port, reuse_port))
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def serve(host: str = "127.0.0.1", port: int = DEFAULT_PORT, workers: int = 1, **options):
+    """
+    Runs the sidecar until SIGINT/SIGTERM. With workers > 1, starts that many processes
+    sharing the port through SO_REUSEPORT (the kernel balances connections); each worker
+    has its own controller pool, result cache and in-flight coalescing.
+    """
+    if workers <= 1:
+        run_worker(host, port, options)
+        return
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise ValueError("Multi-worker mode needs SO_REUSEPORT (Linux/BSD/macOS).")
+
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=run_worker, args=(host, port, options, True), daemon=True) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    # SIGTERM on the supervisor stops the workers too, instead of orphaning them
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the context hygiene sidecar service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=1, help="Serving processes sharing the port (SO_REUSEPORT).")
+    parser.add_argument("--max-concurrency", type=int, default=32, help="Hygiene calls executing at once per worker.")
+    parser.add_argument("--max-queue", type=int, default=128, help="Calls waiting for a slot before 503 (per worker).")
+    parser.add_argument("--request-timeout", type=float, default=None, help="Seconds before a request answers 504.")
+    parser.add_argument("--fake-llm-latency", type=float, default=None, help="Serve with FakeHygieneLLM (offline testing).")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+    serve(
+        args.host, args.port, args.workers,
+        max_concurrency=args.max_concurrency,
+        max_queue=args.max_queue,
+        request_timeout=args.request_timeout,
+        fake_llm_latency=args.fake_llm_latency,
+        log_level=args.log_level
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+from app.core.versioning import message_hash
+
+class UnknownContextVersion(LookupError):
+    """
+    Raised by incremental mode when `previous_version_id` is not in the context store
+    (evicted, another process, or never stored). The request only carries the delta, so
+    the caller must resend the full history without a previous version.
+    """
+
+    def __init__(self, version_id: str):
+        super().__init__(f"Context version {version_id} is not stored; resend the full history without previous_version_id.")
+        self.version_id = version_id
+
+class ContextStore:
+    """
+    Interface for looking up previously optimized contexts by `context_version_id`.
+    Used by incremental hygiene mode so callers only send messages appended since.
+    """
+
+    def get(self, version_id: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def put(self, version_id: str, optimized_context: str):
+        raise NotImplementedError
+
+    def require(self, version_id: str) -> str:
+        """The stored context for an incremental request. Raises UnknownContextVersion on a miss."""
+        context = self.get(version_id)
+        if context is None:
+            raise UnknownContextVersion(version_id)
+        return context
+
+class InMemoryContextStore(ContextStore):
+    """Bounded, thread-safe LRU store (per process)."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version_id: str) -> Optional[str]:
+        with self._lock:
+            context = self._entries.get(version_id)
+            if context is not None:
+                self._entries.move_to_end(version_id)
+            return context
+
+    def put(self, version_id: str, optimized_context: str):
+        with self._lock:
+            self._entries[version_id] = optimized_context
+            self._entries.move_to_end(version_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+class SQLiteContextStore(ContextStore):
+    """
+    Persistent store backed by a SQLite file, shareable across processes and restarts.
+    """
+
+    def __init__(self, path: str = "context_store.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS contexts ("
+            "version_id TEXT PRIMARY KEY, optimized_context TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, version_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT optimized_context FROM contexts WHERE version_id = ?", (version_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, version_id: str, optimized_context: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO contexts (version_id, optimized_context, created_at) VALUES (?, ?, ?)",
+                (version_id, optimized_context, time.time())
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class MessageStore:
+    """
+    Content-addressed message store: each distinct message is kept once under its
+    `message_hash`, so graph state and checkpoints can hold short references and
+    share unchanged messages across turns and sessions.
+    """
+
+    def get_many(self, refs: List[str]) -> Dict[str, str]:
+        raise NotImplementedError
+
+    def put_many(self, messages: Iterable[str]) -> List[str]:
+        raise NotImplementedError
+
+    def put(self, message: str) -> str:
+        return self.put_many([message])[0]
+
+    def get(self, ref: str) -> Optional[str]:
+        return self.get_many([ref]).get(ref)
+
+    def materialize(self, refs: List[str]) -> List[str]:
+        """
+        Resolves references back to messages, in order. Raises KeyError on an unknown
+        (never stored or evicted) ref instead of returning a partial history.
+        """
+        found = self.get_many(refs)
+        missing = [ref for ref in refs if ref not in found]
+        if missing:
+            raise KeyError(f"Unknown message refs: {missing[:5]}")
+        return [found[ref] for ref in refs]
+
+class InMemoryMessageStore(MessageStore):
+    """
+    Thread-safe in-process message store (messages are shared, not copied). Bounded LRU:
+    reading or storing a message refreshes it, and beyond `max_entries` the least recently
+    used messages are evicted. State that still refers to an evicted message cannot be
+    materialized (KeyError), so size the bound to cover the checkpoints you resume, or use
+    SQLiteMessageStore. `max_entries=None` never evicts.
+    """
+
+    def __init__(self, max_entries: Optional[int] = 100_000):
+        self.max_entries = max_entries
+        self._messages: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get_many(self, refs: List[str]) -> Dict[str, str]:
+        found = {}
+        with self._lock:
+            for ref in refs:
+                message = self._messages.get(ref)
+                if message is not None:
+                    self._messages.move_to_end(ref)
+                    found[ref] = message
+        return found
+
+    def put_many(self, messages: Iterable[str]) -> List[str]:
+        refs = []
+        with self._lock:
+            for message in messages:
+                ref = message_hash(message)
+                self._messages.setdefault(ref, message)
+                self._messages.move_to_end(ref)
+                refs.append(ref)
+            if self.max_entries is not None:
+                while len(self._messages) > self.max_entries:
+                    self._messages.popitem(last=False)
+                    self.evictions += 1
+        return refs
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+class SQLiteMessageStore(MessageStore):
+    """
+    Persistent message store backed by a SQLite file, shareable across processes
+    (e.g. next to a LangGraph SQLite checkpointer).
+    """
+
+    def __init__(self, path: str = "message_store.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS messages (ref TEXT PRIMARY KEY, message TEXT NOT NULL)")
+        self._conn.commit()
+
+    def get_many(self, refs: List[str]) -> Dict[str, str]:
+        found = {}
+        unique = list(dict.fromkeys(refs))
+        with self._lock:
+            # Chunked to stay under SQLite's bound-parameter limit
+            for i in range(0, len(unique), 500):
+                chunk = unique[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT ref, message FROM messages WHERE ref IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def put_many(self, messages: Iterable[str]) -> List[str]:
+        messages = list(messages)
+        refs = [message_hash(message) for message in messages]
+        with self._lock:
+            self._conn.executemany("INSERT OR IGNORE INTO messages (ref, message) VALUES (?, ?)", zip(refs, messages))
+            self._conn.commit()
+        return refs
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# Process-wide message store used by the graph nodes for reference-based state (bounded LRU)
+default_message_store = InMemoryMessageStore()
@@ -0,0 +1,323 @@
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from langchain_core.exceptions import OutputParserException
+from pydantic import ValidationError
+from app.core.models import HygieneOutput
+
+# Fields that decide pass/halt; the prompts ask for them first so they arrive early
+DECISION_FIELDS = ("query_intent", "drift_detected", "hitl_required")
+
+# Top-level string fields whose text is emitted while it streams
+STREAMED_FIELDS = ("optimized_context",)
+
+ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+# Longest tail of a context piece held back while it may still become a back-reference
+# (<ref msg="N"/>, see serialization.REF_TEMPLATE)
+MAX_REF_CHARS = 32
+STRING_SPECIAL_RE = re.compile(r'["\\]')
+
+@dataclass
+class HygieneEvent:
+    """
+    One event of a streamed hygiene run.
+
+    - "field":    a top-level output field completed (`field`, `value`).
+    - "decision": pass/halt is known. `value` holds query_intent, drift_detected and
+                  hitl_required (Smart Autonomy already applied, as in the final result).
+    - "context":  the next piece of optimized_context (`value` is text). The pieces
+                  concatenate to the final result's optimized_context.
+    - "result":   the finalized HygieneOutput (`value`); always the last event.
+    """
+    type: str
+    field: Optional[str] = None
+    value: Any = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        value = self.value.model_dump() if isinstance(self.value, HygieneOutput) else self.value
+        return {"type": self.type, "field": self.field, "value": value}
+
+class IncrementalJSONParser:
+    """
+    Parses one JSON object fed in arbitrary chunks, without re-parsing what it has seen.
+
+    `feed(chunk)` returns ("field", key, value) for each top-level member as soon as its
+    value is complete, and ("chunk", key, text) for decoded pieces of the members named in
+    `stream_fields` while their string value is still open. Text before the opening brace
+    (e.g. a ```json fence) is skipped.
+    """
+
+    def __init__(self, stream_fields=STREAMED_FIELDS):
+        self.stream_fields = set(stream_fields)
+        self.value: Dict[str, Any] = {}
+        self.done = False
+        self._state = "start"   # start | key | colon | value | raw | string | next
+        self._key = None
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = None
+        self._high_surrogate = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, str, Any]]:
+        events = []
+        i, n = 0, len(chunk)
+        while i < n and not self.done:
+            state = self._state
+            if state == "string":
+                i = self._feed_string(chunk, i, events)
+                continue
+            c = chunk[i]
+            if state == "raw":
+                i = self._feed_raw(chunk, i, events)
+                continue
+            i += 1
+            if state == "start":
+                if c == "{":
+                    self._state = "key"
+            elif state == "key":
+                if c == '"':
+                    self._state, self._key, self._buffer = "string", None, []
+                elif c == "}":
+                    self.done = True
+            elif state == "colon":
+                if c == ":":
+                    self._state = "value"
+            elif state == "value":
+                if c.isspace():
+                    continue
+                if c == '"' and self._key in self.stream_fields:
+                    self._state, self._buffer = "string", []
+                    self.value[self._key] = ""
+                else:
+                    self._state, self._buffer, self._depth, self._in_string = "raw", [], 0, False
+                    i -= 1
+            elif state == "next":
+                if c == ",":
+                    self._state = "key"
+                elif c == "}":
+                    self.done = True
+        return events
+
+    def _feed_string(self, chunk: str, i: int, events: list) -> int:
+        """Decodes a key, or a streamed value, up to the end of `chunk` or the closing quote."""
+        n = len(chunk)
+        out = []
+        while i < n:
+            if self._escape is not None:
+                self._escape += chunk[i]
+                i += 1
+                self._decode_escape(out)
+                continue
+            match = STRING_SPECIAL_RE.search(chunk, i)
+            end = match.start() if match else n
+            if end > i:
+                out.append(chunk[i:end])
+            i = end
+            if match is None:
+                break
+            i += 1
+            if match.group() == "\\":
+                self._escape = ""
+                continue
+            # Closing quote
+            self._close_string(out, events)
+            return i
+        self._emit_text(out, events)
+        return i
+
+    def _decode_escape(self, out: list):
+        escape = self._escape
+        if escape[0] != "u":
+            out.append(ESCAPES.get(escape, escape))
+            self._escape = None
+            return
+        if len(escape) < 5:
+            return
+        code = int(escape[1:], 16)
+        self._escape = None
+        if 0xD800 <= code < 0xDC00:
+            self._high_surrogate = code
+            return
+        if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        out.append(chr(code))
+
+    def _emit_text(self, out: list, events: list):
+        if not out:
+            return
+        text = "".join(out)
+        if self._key is None:
+            self._buffer.append(text)
+        else:
+            self.value[self._key] += text
+            events.append(("chunk", self._key, text))
+
+    def _close_string(self, out: list, events: list):
+        if self._key is None:
+            self._buffer.extend(out)
+            self._key = "".join(self._buffer)
+            self._state = "colon"
+            return
+        self._emit_text(out, events)
+        events.append(("field", self._key, self.value[self._key]))
+        self._state = "next"
+
+    def _feed_raw(self, chunk: str, i: int, events: list) -> int:
+        """Collects a non-streamed value until the top-level ',' or '}' that ends it."""
+        n = len(chunk)
+        start = i
+        while i < n:
+            c = chunk[i]
+            if self._in_string:
+                if self._escape is not None:
+                    self._escape = None
+                elif c == "\\":
+                    self._escape = ""
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]" and self._depth:
+                self._depth -= 1
+            elif c in ",}" and not self._depth:
+                self._buffer.append(chunk[start:i])
+                raw = "".join(self._buffer).strip()
+                try:
+                    value = json.loads(raw)
+                except ValueError as e:
+                    raise OutputParserException(f"Invalid JSON value for '{self._key}': {raw[:80]}", llm_output=raw) from e
+                self.value[self._key] = value
+                events.append(("field", self._key, value))
+                self._state = "next"
+                return i
+            i += 1
+        self._buffer.append(chunk[start:i])
+        return i
+
+def flag(value: Any) -> bool:
+    """Truth of a streamed boolean field; tolerates "true"/"false" strings."""
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "yes", "1")
+    return bool(value)
+
+class HygieneStreamParser:
+    """
+    Turns a streamed HygieneOutput JSON reply into HygieneEvents.
+
+    The "decision" event is emitted once query_intent, drift_detected and hitl_required
+    have all arrived (or when the object ends). `protected` says whether the context holds
+    protected entities, so the Smart Autonomy rule can be applied to the early decision
+    exactly as the Protection stage applies it to the final result.
+
+    With a `repair` parser (HygieneOutputParser), the complete reply is validated through
+    its repair rules, and text the incremental parser cannot follow (e.g. Python literals)
+    is re-extracted from the full reply at the end instead of failing the stream.
+
+    `expand` (SerializedHistory.expand) replaces the history back-references the model
+    copies into optimized_context before a piece is emitted, as finalize() does for the
+    result. A piece ending in what may be the start of a reference is held back until the
+    reference is complete, so the emitted pieces concatenate to the expanded context.
+    """
+
+    def __init__(self, protected: bool, repair=None, expand: Callable[[str], str] = None):
+        self.protected = protected
+        self.repair = repair
+        self.expand = expand
+        self.failed = False
+        self.parser = IncrementalJSONParser()
+        self.decision: Optional[Dict[str, Any]] = None
+        self.text = []
+        self.context = ""
+        self._pending = ""
+
+    def feed(self, text: str) -> List[HygieneEvent]:
+        self.text.append(text)
+        if self.failed:
+            return []
+        try:
+            parsed = self.parser.feed(text)
+        except OutputParserException:
+            if self.repair is None:
+                raise
+            # Leave the rest to the repair pass over the complete reply
+            self.failed = True
+            return []
+        events = []
+        for kind, key, value in parsed:
+            if kind == "chunk":
+                events.extend(self._decide())
+                events.extend(self._context_piece(value))
+                continue
+            if key in STREAMED_FIELDS:
+                # The string is complete: release the held-back tail
+                events.extend(self._context_piece("", final=True))
+                value = self.context
+            events.append(HygieneEvent("field", key, value))
+            events.extend(self._decide())
+        return events
+
+    def _context_piece(self, text: str, final: bool = False) -> List[HygieneEvent]:
+        """The next optimized_context event, with back-references expanded."""
+        if self.expand is None:
+            ready = text
+        else:
+            pending = self._pending + text
+            cut = pending.rfind("<")
+            if final or cut < 0 or ">" in pending[cut:] or len(pending) - cut >= MAX_REF_CHARS:
+                cut = len(pending)
+            ready, self._pending = self.expand(pending[:cut]), pending[cut:]
+        if not ready:
+            return []
+        self.context += ready
+        return [HygieneEvent("context", STREAMED_FIELDS[0], ready)]
+
+    def _decide(self, final: bool = False) -> List[HygieneEvent]:
+        value = self.parser.value
+        if self.decision is not None or not (final or all(field in value for field in DECISION_FIELDS)):
+            return []
+        drift = flag(value.get("drift_detected"))
+        # Smart Autonomy as in ProtectionIndex.enforce: raises HITL, never clears the model's
+        hitl = flag(value.get("hitl_required")) or (drift and self.protected)
+        self.decision = {"query_intent": value.get("query_intent"), "drift_detected": drift, "hitl_required": hitl}
+        return [HygieneEvent("decision", value=dict(self.decision))]
+
+    def close(self) -> Tuple[List[HygieneEvent], HygieneOutput]:
+        """
+        Ends the stream: the pending decision event (if any), any held-back context piece
+        and the validated output.
+        """
+        raw = "".join(self.text)
+        if self.repair is not None:
+            if self.failed or not self.parser.done:
+                fired = []
+                output = self.repair.validate(self.repair.extract(raw, fired), raw, fired)
+            else:
+                output = self.repair.validate(self.parser.value, raw)
+            self.parser.value.update({field: getattr(output, field) for field in DECISION_FIELDS})
+            return self._decide(final=True) + self._context_piece("", final=True), output
+        if not self.parser.done:
+            raise OutputParserException("Streamed reply ended before the JSON object was complete.", llm_output=raw)
+        try:
+            output = HygieneOutput.model_validate(self.parser.value)
+        except ValidationError as e:
+            raise OutputParserException(f"Streamed reply does not match HygieneOutput: {e}", llm_output=raw) from e
+        return self._decide(final=True) + self._context_piece("", final=True), output
+
+def decided_events(result: HygieneOutput) -> List[HygieneEvent]:
+    """Events for a result decided without streaming (local, relevance or cache tier)."""
+    decision = {field: getattr(result, field) for field in DECISION_FIELDS}
+    events = [HygieneEvent("decision", value=decision)]
+    if result.optimized_context:
+        events.append(HygieneEvent("context", "optimized_context", result.optimized_context))
+    events.append(HygieneEvent("result", value=result))
+    return events
+
+def chunk_text(chunk) -> str:
+    """Text of a streamed message chunk (string or content-block list)."""
+    return chunk.text if hasattr(chunk, "text") else str(chunk)
@@ -0,0 +1,108 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+from app.core.models import HygieneOutput
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_TOKEN_THRESHOLD = 2000
+
+def estimate_tokens(text: str) -> int:
+    """
+    Fast offline token estimate: ~4 characters or ~0.75 words per token, whichever is larger.
+    """
+    if not text:
+        return 0
+    by_chars = (len(text) + 3) // 4
+    by_words = (len(text.split()) * 4 + 2) // 3
+    return max(by_chars, by_words)
+
+def tiktoken_tokenizer(encoding_name: str = "cl100k_base") -> Callable[[str], int]:
+    """
+    Builds a token counter backed by tiktoken (optional dependency).
+    The encoding file must already be in tiktoken's local cache for offline use.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        raise ImportError("tiktoken is not installed. Run `pip install tiktoken` or use the default estimator.")
+
+    encoding = tiktoken.get_encoding(encoding_name)
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+class TokenMonitor:
+    """
+    Local Token Monitor: counts tokens with a pluggable tokenizer and enforces the budget.
+
+    Per-message counts are cached by content hash in a bounded LRU, so re-counting a
+    growing conversation only tokenizes the messages appended since the last turn.
+    """
+
+    def __init__(self, tokenizer: Optional[Callable[[str], int]] = None, cache_size: int = 8192):
+        """
+        Args:
+            tokenizer: Callable returning the token count of a string. Defaults to estimate_tokens.
+            cache_size: Maximum number of per-message counts kept in the LRU.
+        """
+        self.tokenizer = tokenizer or estimate_tokens
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def count(self, text: str) -> int:
+        """Token count of a single message (cached)."""
+        if not text:
+            return 0
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+
+        tokens = self.tokenizer(text)
+
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = tokens
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tokens
+
+    def count_messages(self, messages: List[str]) -> int:
+        """Total token count of a history; unchanged messages are served from the cache."""
+        return sum(self.count(message) for message in messages)
+
+    def apply(self, result: HygieneOutput, raw_context: List[str], max_token_threshold: int) -> HygieneOutput:
+        """
+        Replaces the LLM's token estimates with local counts and validates the budget.
+
+        Sets `within_budget`; an over-budget `optimized_context` also raises
+        `requires_reasoning_caution` so downstream reasoning is warned.
+        """
+        tokens_before = self.count_messages(raw_context)
+        tokens_after = self.count(result.optimized_context)
+
+        result.tokens_before = tokens_before
+        result.tokens_after = tokens_after
+        result.metrics.context_reduction_ratio = round(tokens_after / tokens_before, 4) if tokens_before else 1.0
+        result.within_budget = tokens_after <= max_token_threshold
+
+        if not result.within_budget:
+            logger.debug("Optimized context exceeds budget (%d > %d tokens)", tokens_after, max_token_threshold)
+            result.requires_reasoning_caution = True
+
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        """Cache counters: hits, misses and current size."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._cache)}
+
+# Shared monitor so every controller benefits from the same per-message cache
+default_token_monitor = TokenMonitor()
@@ -0,0 +1,54 @@
+import hashlib
+from typing import Dict, List
+from app.core.instrumentation import default_instrumentation
+
+def message_hash(message: str) -> str:
+    """Content address of one message (or context line)."""
+    return hashlib.sha256(message.encode("utf-8")).hexdigest()[:16]
+
+def merkle_root(hashes: List[str]) -> str:
+    """Binary Merkle root over message hashes (an odd node is promoted to the next level)."""
+    level = list(hashes)
+    while len(level) > 1:
+        paired = [
+            hashlib.sha256((level[i] + level[i + 1]).encode("ascii")).hexdigest()[:16]
+            for i in range(0, len(level) - 1, 2)
+        ]
+        if len(level) % 2:
+            paired.append(level[-1])
+        level = paired
+    return level[0]
+
+def version_id_from_refs(refs: List[str]) -> str:
+    """context_version_id of a context given as message hashes (one per line)."""
+    if not refs:
+        return "v0"
+    return merkle_root(refs)[:12]
+
+def compute_version_id(text: str) -> str:
+    """
+    Computes a deterministic hash for the context version: the Merkle root of its
+    per-line content hashes, so it can be derived from message references alone.
+    """
+    if not text:
+        return "v0"
+    with default_instrumentation.span("hygiene.version_hash", input_bytes=len(text)):
+        return version_id_from_refs([message_hash(line) for line in text.split("\n")])
+
+def diff_refs(old: List[str], new: List[str]) -> Dict[str, object]:
+    """
+    Cheap diff of two versions given as message references: the shared prefix length
+    (append-only turns share everything but the tail) and the added/removed refs.
+    """
+    prefix = 0
+    for a, b in zip(old, new):
+        if a != b:
+            break
+        prefix += 1
+    old_tail, new_tail = old[prefix:], new[prefix:]
+    old_set, new_set = set(old_tail), set(new_tail)
+    return {
+        "common_prefix": prefix,
+        "added": [ref for ref in new_tail if ref not in old_set],
+        "removed": [ref for ref in old_tail if ref not in new_set]
+    }
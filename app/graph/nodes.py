@@ -1,37 +1,81 @@
-import hashlib
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from langgraph.config import get_stream_writer
 from app.graph.state import AgentState
-from app.core.hygiene import ContextHygieneController
+from app.core.versioning import compute_version_id
+from app.core.registry import get_controller
+from app.core.tokens import DEFAULT_MAX_TOKEN_THRESHOLD
+from app.core.instrumentation import default_instrumentation
+from app.core.tokens import TokenMonitor, default_token_monitor
+from app.core.drift import DriftDetector
+from app.core.protection import ProtectionIndex, default_protection_index
+from app.core.relevance import LocalRelevanceOptimizer, degradation_level
+from app.core.store import ContextStore, InMemoryContextStore, MessageStore, default_message_store
 
-# Initialize controller once (or per node execution if needed)
-hygiene_controller = ContextHygieneController()
+logger = logging.getLogger(__name__)
 
-def compute_version_id(text: str) -> str:
-    """Computes a deterministic hash for the context version."""
-    if not text:
-        return "v0"
-    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+# Controller used by the nodes when build_graph() is not given one. Created lazily on the
+# first run (the pooled default from the registry); assign to override process-wide.
+hygiene_controller = None
 
-def hygiene_node(state: AgentState) -> AgentState:
-    """
-    Executes the Context Hygiene Controller to optimize the raw context.
-    """
-    print("--- Hygiene Node: Optimizing Context ---")
-    raw = state["raw_messages"]
-    query = state["current_query"]
-    
-    # Call the tool
-    result = hygiene_controller.optimize_context(
-        raw_context=raw,
-        new_query=query,
-        max_token_threshold=2000 # Configurable
-    )
-    
-    # Compute deterministic version ID
-    version_id = compute_version_id(result.optimized_context)
+def get_hygiene_controller():
+    """Returns the default node controller, building the pooled one on first use."""
+    global hygiene_controller
+    if hygiene_controller is None:
+        hygiene_controller = get_controller()
+    return hygiene_controller
+
+# Content-addressed store behind reference-based state (raw_message_refs /
+# optimized_context_refs); assign a SQLiteMessageStore to share messages across processes
+message_store: MessageStore = default_message_store
+
+def store_messages(messages) -> list:
+    """Stores messages once each and returns their refs (input for `raw_message_refs`)."""
+    return message_store.put_many(messages)
+
+def uses_refs(state: AgentState) -> bool:
+    """True when the state carries message references instead of raw_messages."""
+    return state.get("raw_messages") is None and state.get("raw_message_refs") is not None
+
+def raw_messages_of(state: AgentState) -> list:
+    """The raw history, materialized from `raw_message_refs` when the state holds references."""
+    if uses_refs(state):
+        return message_store.materialize(state["raw_message_refs"])
+    return state["raw_messages"]
+
+def optimized_context_of(state: AgentState):
+    """The optimized context text, materialized from `optimized_context_refs` if needed."""
+    refs = state.get("optimized_context_refs")
+    if state.get("optimized_context") is None and refs is not None:
+        return "\n".join(message_store.materialize(refs))
+    return state.get("optimized_context")
+
+def _context_update(state: AgentState, context: str) -> AgentState:
+    """Writes the optimized context as text, or as line refs when the state is reference-based."""
+    if uses_refs(state):
+        return {"optimized_context": None, "optimized_context_refs": store_messages(context.split("\n")) if context else []}
+    return {"optimized_context": context}
+
+def _hygiene_inputs(state: AgentState) -> dict:
+    """Maps graph state to optimize_context arguments."""
+    return {
+        "raw_context": raw_messages_of(state),
+        "new_query": state["current_query"],
+        "max_token_threshold": state.get("max_token_threshold") or DEFAULT_MAX_TOKEN_THRESHOLD,
+        # Incremental when the previous version is supplied
+        "previous_version_id": state.get("previous_context_version_id")
+    }
+
+def _hygiene_update(result, state: AgentState) -> AgentState:
+    """Maps a HygieneOutput to the state update (ALL governance metadata)."""
+    # Deterministic version ID (computed by the controller)
+    version_id = result.context_version_id or compute_version_id(result.optimized_context)
 
-    # Update State with ALL governance metadata
     return {
-        "optimized_context": result.optimized_context,
+        **_context_update(state, result.optimized_context),
         "hygiene_metrics": result.metrics,
         "drift_detected": result.drift_detected,
         "hitl_required": result.hitl_required,
@@ -42,12 +86,383 @@ def hygiene_node(state: AgentState) -> AgentState:
         "requires_reasoning_caution": result.requires_reasoning_caution
     }
 
+def hygiene_node(state: AgentState, controller=None) -> AgentState:
+    """
+    Executes the Context Hygiene Controller to optimize the raw context.
+    `controller` is bound by build_graph(controller=...); otherwise the default is used.
+    """
+    logger.debug("Hygiene Node: Optimizing Context")
+    controller = controller or get_hygiene_controller()
+    with default_instrumentation.span("node.context_hygiene"):
+        result = controller.optimize_context(**_hygiene_inputs(state))
+        return _hygiene_update(result, state)
+
+async def ahygiene_node(state: AgentState, controller=None) -> AgentState:
+    """
+    Async Hygiene Node (used by `ainvoke`/`astream`). Awaits the LLM natively, so
+    cancelling the graph run cancels the in-flight call.
+    """
+    logger.debug("Hygiene Node: Optimizing Context")
+    controller = controller or get_hygiene_controller()
+    with default_instrumentation.span("node.context_hygiene"):
+        result = await controller.aoptimize_context(**_hygiene_inputs(state))
+        return _hygiene_update(result, state)
+
+def _halted_update(decision: dict) -> AgentState:
+    """State update for a streamed run stopped at a halting decision (no optimized context)."""
+    return {**decision, "optimized_context": None, "optimized_context_refs": None, "hygiene_metrics": None, "context_version_id": None}
+
+def streaming_hygiene_node(state: AgentState, controller=None) -> AgentState:
+    """
+    Streaming Hygiene Node (build_graph(stream_hygiene=True)). Forwards the controller's
+    HygieneEvents to the graph's custom stream (`stream_mode="custom"`), so callers see the
+    decision and optimized_context pieces while the model is still writing. A halting
+    decision stops the model call: the run goes to human review without an optimized context.
+    """
+    logger.debug("Hygiene Node: Streaming Context Optimization")
+    controller = controller or get_hygiene_controller()
+    writer = get_stream_writer()
+    with default_instrumentation.span("node.context_hygiene"):
+        events = controller.stream_optimize_context(**_hygiene_inputs(state))
+        try:
+            for event in events:
+                if event.type == "result":
+                    return _hygiene_update(event.value, state)
+                writer({"hygiene": event.as_dict()})
+                if event.type == "decision" and event.value["hitl_required"]:
+                    return _halted_update(event.value)
+        finally:
+            events.close()
+
+async def astreaming_hygiene_node(state: AgentState, controller=None) -> AgentState:
+    """Async Streaming Hygiene Node (used by `astream`/`ainvoke`)."""
+    logger.debug("Hygiene Node: Streaming Context Optimization")
+    controller = controller or get_hygiene_controller()
+    writer = get_stream_writer()
+    with default_instrumentation.span("node.context_hygiene"):
+        events = controller.astream_optimize_context(**_hygiene_inputs(state))
+        try:
+            async for event in events:
+                if event.type == "result":
+                    return _hygiene_update(event.value, state)
+                writer({"hygiene": event.as_dict()})
+                if event.type == "decision" and event.value["hitl_required"]:
+                    return _halted_update(event.value)
+        finally:
+            await events.aclose()
+
+class ParallelHygieneStages:
+    """
+    Hygiene split into independent local stages for build_parallel_graph(). `input_node`
+    resolves the governed history once (stored previous version + raw_messages) into
+    `hygiene_context`; the token monitor, drift/intent, protection scan and relevance
+    pruning branches then each read it and write their own state keys, and `join_node`
+    merges them into the usual hygiene fields (Smart Autonomy, budget check, version id).
+    """
+
+    def __init__(
+        self,
+        token_monitor: TokenMonitor = None,
+        drift_detector: DriftDetector = None,
+        protection: ProtectionIndex = None,
+        optimizer: LocalRelevanceOptimizer = None,
+        context_store: ContextStore = None
+    ):
+        """
+        Args:
+            token_monitor: Token counter. Defaults to the shared default_token_monitor.
+            drift_detector: Drift/intent estimator. Defaults to DriftDetector().
+            protection: Protected-entity index. Defaults to the shared default_protection_index.
+            optimizer: Relevance pruning engine. Defaults to LocalRelevanceOptimizer().
+            context_store: Store of optimized contexts by version id (incremental mode).
+        """
+        self.token_monitor = token_monitor or default_token_monitor
+        self.drift_detector = drift_detector or DriftDetector()
+        self.protection = protection or default_protection_index
+        self.optimizer = optimizer or LocalRelevanceOptimizer(
+            token_monitor=self.token_monitor,
+            protection=self.protection,
+            drift_detector=self.drift_detector
+        )
+        self.context_store = context_store or InMemoryContextStore()
+
+    def input_node(self, state: AgentState) -> AgentState:
+        """
+        Resolves the history to govern: the stored previous version (if any) plus
+        raw_messages. Raises UnknownContextVersion when the previous version is not stored.
+        """
+        with default_instrumentation.span("node.hygiene_input"):
+            previous_id = state.get("previous_context_version_id")
+            previous = self.context_store.require(previous_id) if previous_id else None
+            messages = raw_messages_of(state)
+            return {"hygiene_context": [previous] + list(messages) if previous else list(messages)}
+
+    @staticmethod
+    def _context(state: AgentState) -> list:
+        return state.get("hygiene_context") or []
+
+    def token_node(self, state: AgentState) -> AgentState:
+        with default_instrumentation.span("node.token_monitor"):
+            return {"tokens_before": self.token_monitor.count_messages(self._context(state))}
+
+    def drift_node(self, state: AgentState) -> AgentState:
+        with default_instrumentation.span("node.drift_intent"):
+            estimate = self.drift_detector.detect(self._context(state), state["current_query"])
+            if estimate is None:
+                return {"drift_detected": False, "query_intent": None, "drift_confidence": None}
+            return {
+                "drift_detected": estimate.drift_detected,
+                "query_intent": estimate.query_intent,
+                "drift_confidence": estimate.confidence
+            }
+
+    def protection_node(self, state: AgentState) -> AgentState:
+        with default_instrumentation.span("node.protection_scan"):
+            return {"protected_items": [entity.text for entity in self.protection.scan(self._context(state))]}
+
+    def relevance_node(self, state: AgentState) -> AgentState:
+        with default_instrumentation.span("node.relevance"):
+            threshold = state.get("max_token_threshold") or DEFAULT_MAX_TOKEN_THRESHOLD
+            selection = self.optimizer.select(self._context(state), state["current_query"], threshold)
+            return {
+                "optimized_context": selection.optimized_context,
+                "hygiene_metrics": selection.metrics(),
+                "degradation_level": degradation_level(selection.retention),
+                "fragmentation_score": round(1.0 - selection.coherence, 4)
+            }
+
+    def join_node(self, state: AgentState) -> AgentState:
+        """Merges the branches: restores protected spans, applies Smart Autonomy and the budget."""
+        with default_instrumentation.span("node.hygiene_join"):
+            context = state["optimized_context"]
+            protected = state.get("protected_items") or []
+            dropped = [item for item in protected if item not in context]
+            if dropped:
+                restored = "\n".join(f"[Protected] {item}" for item in dropped)
+                context = f"{context}\n{restored}" if context else restored
+
+            threshold = state.get("max_token_threshold") or DEFAULT_MAX_TOKEN_THRESHOLD
+            tokens_before = state.get("tokens_before")
+            if tokens_before is not None and tokens_before <= threshold and not dropped:
+                # The whole history fits and pruning only removes text: no recount needed
+                within_budget = True
+            else:
+                within_budget = self.token_monitor.count(context) <= threshold
+            drift = state.get("drift_detected", False)
+            version_id = compute_version_id(context)
+            self.context_store.put(version_id, context)
+
+            return {
+                **_context_update(state, context),
+                # Smart Autonomy: drift + protected => ask the user; drift alone => auto-prune
+                "hitl_required": drift and bool(protected),
+                "requires_reasoning_caution": state.get("degradation_level") == "severe" or not within_budget,
+                "context_version_id": version_id,
+                # Only needed by the branches; keep it out of checkpoints
+                "hygiene_context": None
+            }
+
+def equivalent_contexts(predicted: str, result) -> bool:
+    """True when `result.optimized_context` is the predicted context (same version, or equal up to whitespace)."""
+    if result.context_version_id == compute_version_id(predicted):
+        return True
+    return predicted.split() == result.optimized_context.split()
+
+class SpeculativeHygiene:
+    """
+    Speculative reasoning for build_speculative_graph().
+
+    Reasoning starts on a cheaply pre-trimmed context (the local relevance selection)
+    while the hygiene controller runs. The controller's local stages (store lookup,
+    pre-screen, cache) run once, before the speculation starts: requests they decide are
+    finalized directly and not speculated, and the rest go straight to the LLM tier
+    without screening again. When hygiene returns hitl_required=False, no
+    reasoning caution and an equivalent context, the speculative answer is committed and
+    the graph ends without a second reasoning step. Otherwise the speculation is
+    cancelled (or discarded if already running) and the graph routes as usual.
+    """
+
+    def __init__(
+        self,
+        controller=None,
+        optimizer: LocalRelevanceOptimizer = None,
+        reasoner=None,
+        areasoner=None,
+        max_workers: int = 8
+    ):
+        """
+        Args:
+            controller: Hygiene controller. Defaults to the node default (lazy, pooled).
+            optimizer: Pre-trimming engine for the predicted context. Defaults to
+                       LocalRelevanceOptimizer().
+            reasoner: Sync reasoning step `reasoner(state) -> update`. Defaults to reasoning_node.
+            areasoner: Async reasoning step. Defaults to areasoning_node.
+            max_workers: Threads for sync speculation.
+        """
+        self.controller = controller
+        self.optimizer = optimizer or LocalRelevanceOptimizer()
+        self.reasoner = reasoner or reasoning_node
+        self.areasoner = areasoner or areasoning_node
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculation")
+        self._lock = threading.Lock()
+        self.counters = {"attempts": 0, "hits": 0, "miss_hitl": 0, "miss_caution": 0, "miss_mismatch": 0, "miss_error": 0, "saved_seconds": 0.0, "wasted_seconds": 0.0}
+
+    @staticmethod
+    def _prepare(controller, inputs: dict):
+        """
+        The controller's local stages (store lookup, pre-screen, cache), run once and shared
+        by the prediction and the hygiene call. None for controllers without a prepare
+        stage (e.g. CascadeController), which are called through optimize_context.
+        """
+        prepare = getattr(controller, "prepare", None)
+        return prepare(**inputs) if prepare is not None else None
+
+    def predict(self, inputs: dict, request=None):
+        """
+        The context hygiene is expected to produce, computed locally from the prepared
+        request's full history. None when there is nothing to speculate on: the request was
+        decided locally (fast path, relevance engine or cache), or an incremental request
+        whose stored history this controller cannot resolve up front.
+        """
+        if request is not None:
+            if request.chain is None:
+                return None
+            history = request.full_context
+        elif inputs["previous_version_id"]:
+            return None
+        else:
+            history = inputs["raw_context"]
+        return self.optimizer.select(history, inputs["new_query"], inputs["max_token_threshold"]).optimized_context
+
+    def _miss_reason(self, result, predicted: str):
+        if result.hitl_required:
+            return "miss_hitl"
+        if result.requires_reasoning_caution:
+            return "miss_caution"
+        if not equivalent_contexts(predicted, result):
+            return "miss_mismatch"
+        return None
+
+    def _count(self, key: str, value: float = 1):
+        with self._lock:
+            self.counters[key] += value
+        default_instrumentation.increment(f"speculation.{key}", value)
+
+    def _timed(self, state: AgentState):
+        start = time.perf_counter()
+        update = self.reasoner(state)
+        return update, time.perf_counter() - start
+
+    async def _atimed(self, state: AgentState):
+        start = time.perf_counter()
+        update = await self.areasoner(state)
+        return update, time.perf_counter() - start
+
+    @staticmethod
+    def _speculative_state(state: AgentState, predicted: str) -> AgentState:
+        return {**state, "optimized_context": predicted, "requires_reasoning_caution": False}
+
+    def node(self, state: AgentState) -> AgentState:
+        """Hygiene with reasoning speculated in a worker thread."""
+        controller = self.controller or get_hygiene_controller()
+        inputs = _hygiene_inputs(state)
+        request = self._prepare(controller, inputs)
+        predicted = self.predict(inputs, request)
+        if predicted is None:
+            with default_instrumentation.span("node.context_hygiene"):
+                result = controller.complete(request) if request is not None else controller.optimize_context(**inputs)
+                return _hygiene_update(result, state)
+        self._count("attempts")
+        speculation = self._executor.submit(self._timed, self._speculative_state(state, predicted))
+
+        hygiene_start = time.perf_counter()
+        try:
+            with default_instrumentation.span("node.context_hygiene"):
+                result = controller.complete(request) if request is not None else controller.optimize_context(**inputs)
+        except Exception:
+            self._discard(speculation, "miss_error")
+            raise
+        hygiene_seconds = time.perf_counter() - hygiene_start
+
+        update = _hygiene_update(result, state)
+        reason = self._miss_reason(result, predicted)
+        if reason is None:
+            response, reasoning_seconds = speculation.result()
+            self._count("hits")
+            self._count("saved_seconds", min(hygiene_seconds, reasoning_seconds))
+            update.update(response)
+        else:
+            self._discard(speculation, reason)
+        update["speculation_hit"] = reason is None
+        return update
+
+    def _discard(self, speculation, reason: str):
+        self._count(reason)
+        if not speculation.cancel():
+            # Already running: let it finish and account its time as wasted
+            speculation.add_done_callback(lambda done: self._count("wasted_seconds", done.result()[1]) if not done.exception() else None)
+
+    async def anode(self, state: AgentState) -> AgentState:
+        """Async counterpart: the speculation is a task, cancelled on a miss."""
+        controller = self.controller or get_hygiene_controller()
+        inputs = _hygiene_inputs(state)
+        request = self._prepare(controller, inputs)
+        predicted = self.predict(inputs, request)
+        if predicted is None:
+            with default_instrumentation.span("node.context_hygiene"):
+                result = await controller.acomplete(request) if request is not None else await controller.aoptimize_context(**inputs)
+                return _hygiene_update(result, state)
+        self._count("attempts")
+        speculation_start = time.perf_counter()
+        speculation = asyncio.create_task(self._atimed(self._speculative_state(state, predicted)))
+
+        try:
+            with default_instrumentation.span("node.context_hygiene"):
+                result = await controller.acomplete(request) if request is not None else await controller.aoptimize_context(**inputs)
+        except BaseException:
+            await self._acancel(speculation, speculation_start, "miss_error")
+            raise
+        hygiene_seconds = time.perf_counter() - speculation_start
+
+        update = _hygiene_update(result, state)
+        reason = self._miss_reason(result, predicted)
+        if reason is None:
+            response, reasoning_seconds = await speculation
+            self._count("hits")
+            self._count("saved_seconds", min(hygiene_seconds, reasoning_seconds))
+            update.update(response)
+        else:
+            await self._acancel(speculation, speculation_start, reason)
+        update["speculation_hit"] = reason is None
+        return update
+
+    async def _acancel(self, speculation: asyncio.Task, started: float, reason: str):
+        self._count(reason)
+        if speculation.done():
+            if not speculation.cancelled() and speculation.exception() is None:
+                self._count("wasted_seconds", speculation.result()[1])
+            return
+        speculation.cancel()
+        self._count("wasted_seconds", time.perf_counter() - started)
+        try:
+            await speculation
+        except asyncio.CancelledError:
+            pass
+
+    def stats(self) -> dict:
+        """Attempts, hits, misses by reason, hit rate, and seconds saved/wasted."""
+        with self._lock:
+            stats = dict(self.counters)
+        stats["hit_rate"] = stats["hits"] / stats["attempts"] if stats["attempts"] else 0.0
+        return stats
+
 def human_review_node(state: AgentState) -> AgentState:
     """
     Triggered when hygiene confidence is low or drift is detected.
     Instead of crashing, it asks the user for clarification.
     """
-    print("--- HUMAN REVIEW NODE Triggered ---")
+    logger.debug("Human Review Node triggered")
+    default_instrumentation.increment("node.human_review.calls")
     intent = state.get("query_intent", "unknown")
     drift = state.get("drift_detected", False)
     
@@ -69,16 +484,23 @@ def reasoning_node(state: AgentState) -> AgentState:
     Placeholder for the main Gemini reasoning step.
     Uses the *optimized* context, not the raw one.
     """
-    print("--- Reasoning Node: Generating Response ---")
-    
-    # Check for caution flag
-    if state.get("requires_reasoning_caution"):
-        print("WARNING: Reasoning Caution Flag is active! Entropy or Degradation is high.")
-    
-    context = state["optimized_context"]
-    query = state["current_query"]
-    
-    # In a real impl, this would call Gemini.generate_content(context + query)
-    response = f"[MOCK RESPONSE based on optimized context]: {context[:50]}..."
-    
-    return {"final_response": response}
+    logger.debug("Reasoning Node: Generating Response")
+
+    with default_instrumentation.span("node.reasoning_engine"):
+        # Check for caution flag
+        if state.get("requires_reasoning_caution"):
+            logger.warning("Reasoning Caution Flag is active! Entropy or Degradation is high.")
+
+        context = optimized_context_of(state)
+        query = state["current_query"]
+
+        # In a real impl, this would call Gemini.generate_content(context + query)
+        response = f"[MOCK RESPONSE based on optimized context]: {context[:50]}..."
+
+        return {"final_response": response}
+
+async def areasoning_node(state: AgentState) -> AgentState:
+    """
+    Async Reasoning Node. A real impl would await Gemini's async client here.
+    """
+    return reasoning_node(state)
@@ -7,10 +7,14 @@ class AgentState(TypedDict):
     Represents the state of the Context Governance Agent.
     """
     raw_messages: List[str]  # The raw input conversation
+    raw_message_refs: Optional[List[str]]  # Alternative to raw_messages: message-store refs (see nodes.store_messages)
     current_query: str       # The user's new query
+    max_token_threshold: Optional[int]  # Token budget (defaults to 2000 when unset)
+    previous_context_version_id: Optional[str]  # Incremental mode: raw_messages holds only the delta
     
     # Hygiene Core Outputs
     optimized_context: Optional[str]
+    optimized_context_refs: Optional[List[str]]  # Set instead of optimized_context for reference-based state
     hygiene_metrics: Optional[HygieneMetrics]
     drift_detected: bool
     hitl_required: bool
@@ -23,5 +27,15 @@ class AgentState(TypedDict):
     # Computed Manually (Not from LLM)
     context_version_id: Optional[str]
 
+    # Parallel Hygiene Branches (build_parallel_graph only; merged by the join node)
+    hygiene_context: Optional[List[str]]  # Governed history, resolved once before the fan-out
+    tokens_before: Optional[int]
+    protected_items: Optional[List[str]]
+    drift_confidence: Optional[float]
+    fragmentation_score: Optional[float]
+
+    # Speculative Reasoning (build_speculative_graph only)
+    speculation_hit: Optional[bool]
+
     # Final Output
     final_response: Optional[str]
@@ -1,6 +1,16 @@
-from langgraph.graph import StateGraph, END
+from functools import partial
+from langgraph.graph import StateGraph, START, END
+from langchain_core.runnables import RunnableLambda
 from app.graph.state import AgentState
-from app.graph.nodes import hygiene_node, reasoning_node, human_review_node
+from app.graph.nodes import hygiene_node, ahygiene_node, streaming_hygiene_node, astreaming_hygiene_node, reasoning_node, areasoning_node, human_review_node, ParallelHygieneStages, SpeculativeHygiene
+
+# Independent hygiene branches of the parallel topology (node name -> ParallelHygieneStages method)
+PARALLEL_BRANCHES = {
+    "token_monitor": "token_node",
+    "drift_intent": "drift_node",
+    "protection_scan": "protection_node",
+    "relevance": "relevance_node"
+}
 
 def route_after_hygiene(state: AgentState):
     """
@@ -10,20 +20,45 @@ def route_after_hygiene(state: AgentState):
         return "human_review"
     return "reasoning_engine"
 
-def build_graph(checkpointer=None):
+def route_after_speculation(state: AgentState):
+    """
+    Ends the run when the speculative answer was committed; otherwise routes like
+    route_after_hygiene (the reasoning engine re-runs on the real optimized context).
+    """
+    if state.get("speculation_hit"):
+        return END
+    return route_after_hygiene(state)
+
+def build_graph(checkpointer=None, controller=None, stream_hygiene: bool = False):
     """
     Constructs the LangGraph workflow for the Hybrid Context Governance Agent.
+    The compiled app supports both `invoke`/`stream` and `ainvoke`/`astream`;
+    async runs use the native async nodes.
     
     Args:
         checkpointer: Optional persistence layer (e.g., MemorySaver) for standalone testing.
                       In production, the parent system usually manages persistence.
+        controller: Optional ContextHygieneController for the hygiene node (e.g. one built
+                    around your own LLM). Defaults to the pooled Gemini controller, created
+                    on the first run rather than at import or build time.
+        stream_hygiene: Stream the hygiene LLM call. Its events (decision, optimized_context
+                        pieces) reach `stream(..., stream_mode="custom")`/`astream` as
+                        {"hygiene": event} before the node completes, and a halting decision
+                        ends the call early.
     """
     workflow = StateGraph(AgentState)
-    
+
+    hygiene, ahygiene = hygiene_node, ahygiene_node
+    if stream_hygiene:
+        hygiene, ahygiene = streaming_hygiene_node, astreaming_hygiene_node
+    if controller is not None:
+        hygiene = partial(hygiene, controller=controller)
+        ahygiene = partial(ahygiene, controller=controller)
+
     # Add Nodes
-    workflow.add_node("context_hygiene", hygiene_node)
+    workflow.add_node("context_hygiene", RunnableLambda(hygiene, afunc=ahygiene, name="context_hygiene"))
     workflow.add_node("human_review", human_review_node)
-    workflow.add_node("reasoning_engine", reasoning_node)
+    workflow.add_node("reasoning_engine", RunnableLambda(reasoning_node, afunc=areasoning_node, name="reasoning_engine"))
     
     # Define Edges
     workflow.set_entry_point("context_hygiene")
@@ -43,3 +78,85 @@ def build_graph(checkpointer=None):
     workflow.add_edge("reasoning_engine", END)
     
     return workflow.compile(checkpointer=checkpointer)
+
+def build_parallel_graph(checkpointer=None, stages: ParallelHygieneStages = None):
+    """
+    Alternative topology with the hygiene stages fanned out as parallel branches:
+
+        START -> hygiene_input -> token_monitor | drift_intent | protection_scan | relevance
+              -> hygiene_join -> human_review | reasoning_engine
+
+    `hygiene_input` resolves the governed history once for all branches. Every branch is
+    local (no LLM call) and writes its own state keys. LangGraph runs them
+    concurrently within one superstep, so hygiene latency is that of the slowest branch.
+    The join fills the same AgentState fields as build_graph(), so routing and reasoning
+    are unchanged.
+
+    Args:
+        checkpointer: Optional persistence layer (e.g., MemorySaver).
+        stages: Optional configured ParallelHygieneStages (shared detectors, store, ...).
+    """
+    stages = stages or ParallelHygieneStages()
+    workflow = StateGraph(AgentState)
+
+    # Resolve the input once, fan out to every branch, then join once all have finished
+    workflow.add_node("hygiene_input", stages.input_node)
+    workflow.add_edge(START, "hygiene_input")
+    for name, method in PARALLEL_BRANCHES.items():
+        workflow.add_node(name, getattr(stages, method))
+        workflow.add_edge("hygiene_input", name)
+    workflow.add_node("hygiene_join", stages.join_node)
+    workflow.add_edge(list(PARALLEL_BRANCHES), "hygiene_join")
+
+    workflow.add_node("human_review", human_review_node)
+    workflow.add_node("reasoning_engine", RunnableLambda(reasoning_node, afunc=areasoning_node, name="reasoning_engine"))
+
+    workflow.add_conditional_edges(
+        "hygiene_join",
+        route_after_hygiene,
+        {
+            "human_review": "human_review",
+            "reasoning_engine": "reasoning_engine"
+        }
+    )
+
+    workflow.add_edge("human_review", END)
+    workflow.add_edge("reasoning_engine", END)
+
+    return workflow.compile(checkpointer=checkpointer)
+
+def build_speculative_graph(checkpointer=None, speculation: SpeculativeHygiene = None):
+    """
+    build_graph() with speculative reasoning: the reasoning engine starts on a locally
+    pre-trimmed context while hygiene runs. When hygiene passes without HITL and produces
+    an equivalent context, the speculative answer is used as is, so latency is
+    max(hygiene, reasoning) instead of their sum. Misses are cancelled and fall back to
+    the normal route.
+
+    Args:
+        checkpointer: Optional persistence layer (e.g., MemorySaver).
+        speculation: Optional configured SpeculativeHygiene (controller, reasoner, ...).
+                     Its stats() report the hit rate and the seconds saved/wasted.
+    """
+    speculation = speculation or SpeculativeHygiene()
+    workflow = StateGraph(AgentState)
+
+    workflow.add_node("context_hygiene", RunnableLambda(speculation.node, afunc=speculation.anode, name="context_hygiene"))
+    workflow.add_node("human_review", human_review_node)
+    workflow.add_node("reasoning_engine", RunnableLambda(speculation.reasoner, afunc=speculation.areasoner, name="reasoning_engine"))
+
+    workflow.set_entry_point("context_hygiene")
+    workflow.add_conditional_edges(
+        "context_hygiene",
+        route_after_speculation,
+        {
+            END: END,
+            "human_review": "human_review",
+            "reasoning_engine": "reasoning_engine"
+        }
+    )
+
+    workflow.add_edge("human_review", END)
+    workflow.add_edge("reasoning_engine", END)
+
+    return workflow.compile(checkpointer=checkpointer)
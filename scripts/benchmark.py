@@ -0,0 +1,270 @@
+"""
+Replay benchmark for the Context Hygiene System.
+
+Replays a JSONL corpus ({"id", "history", "query"} per line) through sanitize_context,
+ContextHygieneController.optimize_context and the compiled build_graph() app, using the
+deterministic FakeHygieneLLM (no API key, no network). Reports p50/p95/p99 latency,
+throughput per concurrency level, prompt bytes sent, allocations and cache hit rates,
+and writes machine-readable JSON for regression comparison.
+
+Every concurrency level is measured with the result cache bypassed ("concurrency"), and,
+unless --no-cache is given, again from a cleared cache ("concurrency_cached"), so cache
+hits never hide the cost of the hygiene path.
+
+Usage:
+    python scripts/benchmark.py --latency 0.05 --concurrency 1,4,16 --output bench.json
+    python scripts/benchmark.py --compare bench.json
+"""
+import sys
+import os
+import argparse
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.cache import ResultCache
+from app.core.fake_llm import FakeHygieneLLM
+from app.core.hygiene import ContextHygieneController
+from app.core.registry import get_controller, default_registry
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "bench_corpus.jsonl")
+
+def load_corpus(path):
+    with open(path, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if not records:
+        raise SystemExit(f"Corpus {path} is empty.")
+    return records
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {
+        "p50_ms": round(pick(0.50) * 1000, 3),
+        "p95_ms": round(pick(0.95) * 1000, 3),
+        "p99_ms": round(pick(0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3)
+    }
+
+def run_load(call, records, concurrency, repeat):
+    """Runs every record `repeat` times with `concurrency` workers. Returns latency stats."""
+    workload = [record for _ in range(repeat) for record in records]
+    latencies = []
+
+    def timed(record):
+        start = time.perf_counter()
+        call(record)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(timed, workload))
+    wall = time.perf_counter() - start
+
+    stats = percentiles(latencies)
+    stats["requests"] = len(workload)
+    stats["throughput_rps"] = round(len(workload) / wall, 2) if wall else None
+    return stats
+
+def measure_allocations(call, records):
+    """Peak traced memory per request (tracemalloc), measured serially."""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for record in records:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            call(record)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+    finally:
+        tracemalloc.stop()
+    return {
+        "peak_kb_mean": round(statistics.fmean(peaks) / 1024, 2),
+        "peak_kb_max": round(max(peaks) / 1024, 2)
+    }
+
+def build_targets(args):
+    """
+    Returns {name: (call, llm, controller)} with a separate fake LLM per target, for the
+    targets selected by --only. `call(record, use_cache)` runs one request.
+    Modules are imported only for the targets that run.
+    """
+    targets = {}
+    selected = args.only.split(",") if args.only else None
+
+    def fake():
+        return FakeHygieneLLM(latency=args.latency, latency_per_kb=args.latency_per_kb)
+
+    # 1. Middleware API
+    if selected is None or "sanitize_context" in selected:
+        api_llm = fake()
+        from app.core.api import sanitize_context
+        targets["sanitize_context"] = (
+            lambda r, use_cache: sanitize_context(r["history"], r["query"], llm=api_llm, fast_path=args.fast_path, use_cache=use_cache),
+            api_llm,
+            lambda: get_controller(llm=api_llm, prompt_type="optimized")
+        )
+
+    # 2. Controller
+    if selected is None or "optimize_context" in selected:
+        controller_llm = fake()
+        controller = ContextHygieneController(llm=controller_llm, prompt_type="optimized")
+        targets["optimize_context"] = (
+            lambda r, use_cache: controller.optimize_context(r["history"], r["query"], fast_path=args.fast_path, use_cache=use_cache),
+            controller_llm,
+            lambda: controller
+        )
+
+    # 3. Compiled LangGraph app. The graph nodes take no use_cache flag, so the uncached
+    #    runs go through a second graph whose controller keeps no results.
+    if selected is None or "graph" in selected:
+        graph_llm = fake()
+        graph_controller = ContextHygieneController(llm=graph_llm)
+        uncached_controller = ContextHygieneController(llm=graph_llm, result_cache=ResultCache(max_entries=0))
+        from app.graph.workflow import build_graph
+        graphs = {True: build_graph(controller=graph_controller), False: build_graph(controller=uncached_controller)}
+        targets["graph"] = (
+            lambda r, use_cache: graphs[use_cache].invoke({"raw_messages": r["history"], "current_query": r["query"]}),
+            graph_llm,
+            lambda: graph_controller
+        )
+    return targets
+
+def run_benchmark(args):
+    records = load_corpus(args.corpus)
+    concurrency_levels = [int(level) for level in args.concurrency.split(",")]
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "corpus": os.path.basename(args.corpus),
+            "records": len(records),
+            "latency_s": args.latency,
+            "latency_per_kb_s": args.latency_per_kb,
+            "repeat": args.repeat,
+            "fast_path": args.fast_path,
+            "cache": args.cache
+        },
+        "targets": {}
+    }
+
+    for name, (call, llm, controller) in build_targets(args).items():
+        print(f"\n=== {name} ===")
+        # Report the wire-format saving (measured on demand only)
+        controller().serializer.measure = True
+
+        def uncached(record):
+            return call(record, False)
+
+        def cached(record):
+            return call(record, True)
+
+        # Allocations first (uncached), then load at each concurrency level
+        allocations = measure_allocations(uncached, records)
+        levels, cached_levels = {}, {}
+        for level in concurrency_levels:
+            levels[str(level)] = run_load(uncached, records, level, args.repeat)
+            print_level(level, levels[str(level)], "uncached")
+            if args.cache:
+                # Every level starts cold, so the first replay pays for the misses
+                controller().result_cache.clear()
+                cached_levels[str(level)] = run_load(cached, records, level, args.repeat)
+                print_level(level, cached_levels[str(level)], "cached")
+
+        llm_stats = llm.stats()
+        controller_stats = controller().stats()
+        total_requests = len(records) + sum(level["requests"] for level in list(levels.values()) + list(cached_levels.values()))
+        report["targets"][name] = {
+            "concurrency": levels,
+            "concurrency_cached": cached_levels,
+            "llm_calls": llm_stats["calls"],
+            "llm_call_rate": round(llm_stats["calls"] / total_requests, 4) if total_requests else 0.0,
+            "prompt_bytes_total": llm_stats["prompt_bytes"],
+            "prompt_bytes_per_call": round(llm_stats["prompt_bytes"] / llm_stats["calls"], 1) if llm_stats["calls"] else 0,
+            "allocations": allocations,
+            "tiers": controller_stats["tiers"],
+            "llm_avoidance_rate": round(controller_stats["llm_avoidance_rate"], 4),
+            "cache_hit_rate": round(controller_stats["cache"]["hit_rate"], 4),
+            "history_bytes_saved_per_request": round(controller_stats["serialization"]["bytes_saved_per_request"], 1)
+        }
+        print(f"  llm_calls={llm_stats['calls']} prompt_bytes/call={report['targets'][name]['prompt_bytes_per_call']} "
+              f"cache_hit_rate={report['targets'][name]['cache_hit_rate']} allocations={allocations}")
+
+    report["registry"] = default_registry.stats()
+    return report
+
+def print_level(level, stats, label):
+    print(f"  concurrency={level:<4} {label:<8} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms "
+          f"p99={stats['p99_ms']}ms throughput={stats['throughput_rps']} req/s")
+
+def compare(report, baseline, tolerance, min_delta_ms=1.0):
+    """
+    Prints per-target deltas against a baseline. Returns True if any metric regressed.
+    Latency changes smaller than `min_delta_ms` are treated as noise.
+    """
+    regressed = False
+    print("\n=== Comparison vs baseline ===")
+    for name, current in report["targets"].items():
+        previous = baseline.get("targets", {}).get(name)
+        if not previous:
+            continue
+        runs = [(level, "", stats, previous.get("concurrency", {}).get(level)) for level, stats in current["concurrency"].items()]
+        runs += [(level, " cached", stats, previous.get("concurrency_cached", {}).get(level)) for level, stats in current.get("concurrency_cached", {}).items()]
+        for level, label, stats, old in runs:
+            if not old:
+                continue
+            for metric, higher_is_worse in (("p50_ms", True), ("p95_ms", True), ("p99_ms", True), ("throughput_rps", False)):
+                if not old[metric]:
+                    continue
+                delta = (stats[metric] - old[metric]) / old[metric]
+                if higher_is_worse:
+                    worse = delta > tolerance and stats[metric] - old[metric] > min_delta_ms
+                else:
+                    worse = delta < -tolerance
+                regressed |= worse
+                flag = "REGRESSION" if worse else ""
+                print(f"  {name:<17} c={level + label:<11} {metric:<15} {old[metric]:>10} -> {stats[metric]:>10} ({delta:+.1%}) {flag}")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay benchmark with a fake LLM.")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="JSONL corpus of {history, query} records.")
+    parser.add_argument("--latency", type=float, default=0.02, help="Fake LLM latency per call (seconds).")
+    parser.add_argument("--latency-per-kb", type=float, default=0.0, help="Extra fake latency per KB of prompt.")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels.")
+    parser.add_argument("--repeat", type=int, default=3, help="Replays of the corpus per concurrency level.")
+    parser.add_argument("--only", default=None, help="Comma-separated targets (sanitize_context,optimize_context,graph).")
+    parser.add_argument("--no-fast-path", dest="fast_path", action="store_false", help="Disable the local fast path.")
+    parser.add_argument("--no-cache", dest="cache", action="store_false", help="Skip the cached runs (uncached runs are always measured).")
+    parser.add_argument("--output", default=None, help="Write the JSON report here.")
+    parser.add_argument("--compare", default=None, help="Baseline JSON report to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression (0.2 = 20%%).")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Latency changes below this are noise.")
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {os.path.abspath(args.output)}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.tolerance, args.min_delta_ms):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
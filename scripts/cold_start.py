@@ -0,0 +1,78 @@
+"""
+Cold-start budget check for serverless deployments.
+
+Imports the public entry points (app.core.api, app.graph.workflow) in fresh interpreters
+with GOOGLE_API_KEY unset and checks that:
+  - the import succeeds without credentials,
+  - no provider package (langchain_google_genai) is imported,
+  - no controller is built and no .env file is read,
+  - the median import time stays under the budget.
+
+Usage:
+    python scripts/cold_start.py --budget-ms 1500 --runs 5
+Exits with status 1 when a check fails.
+"""
+import sys
+import os
+import argparse
+import json
+import statistics
+import subprocess
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app.core.api
+import app.graph.workflow
+elapsed = time.perf_counter() - start
+from app.core.registry import default_registry
+from app.core.hygiene import load_env
+print(json.dumps({
+    "import_ms": elapsed * 1000,
+    "provider_loaded": "langchain_google_genai" in sys.modules,
+    "controllers_built": default_registry.stats()["builds"],
+    "env_loaded": load_env.cache_info().currsize > 0
+}))
+"""
+
+def probe() -> dict:
+    env = {key: value for key, value in os.environ.items() if key != "GOOGLE_API_KEY"}
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise SystemExit(f"FAIL: import raised without GOOGLE_API_KEY:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Assert an import-time budget for the package.")
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="Maximum median import time.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to measure.")
+    args = parser.parse_args()
+
+    results = [probe() for _ in range(args.runs)]
+    timings = [result["import_ms"] for result in results]
+    median = statistics.median(timings)
+    print(f"Import time over {args.runs} runs: median={median:.0f}ms min={min(timings):.0f}ms max={max(timings):.0f}ms (budget {args.budget_ms:.0f}ms)")
+
+    failures = []
+    if median > args.budget_ms:
+        failures.append(f"median import time {median:.0f}ms exceeds the {args.budget_ms:.0f}ms budget")
+    if any(result["provider_loaded"] for result in results):
+        failures.append("langchain_google_genai was imported at import time")
+    if any(result["controllers_built"] for result in results):
+        failures.append("a controller was built at import time")
+    if any(result["env_loaded"] for result in results):
+        failures.append(".env was loaded at import time")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("PASS: cold start within budget, no provider import, no controller, no .env read.")
+
+if __name__ == "__main__":
+    main()
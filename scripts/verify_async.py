@@ -0,0 +1,105 @@
+import sys
+import os
+import asyncio
+import time
+
+# Add the project root to python path to allow imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.api import asanitize_context
+from app.core.fake_llm import FakeHygieneLLM
+from app.core.hygiene import ContextHygieneController
+from app.graph.workflow import build_graph
+
+HISTORY = [
+    "User: Explain backpropagation.",
+    "AI: Backpropagation computes the gradient of the loss with respect to the weights."
+]
+QUERY = "How are the weights updated?"
+
+def check(label, condition):
+    print(f"[{'PASS' if condition else 'FAIL'}] {label}")
+    return condition
+
+async def verify():
+    ok = True
+
+    # 1. Same result as the sync path
+    sync_result = ContextHygieneController(llm=FakeHygieneLLM()).optimize_context(HISTORY, QUERY, fast_path=False)
+    async_result = await ContextHygieneController(llm=FakeHygieneLLM()).aoptimize_context(HISTORY, QUERY, fast_path=False)
+    ok &= check(
+        "aoptimize_context matches optimize_context",
+        async_result.decision_tier == "llm" and async_result.optimized_context == sync_result.optimized_context
+        and async_result.context_version_id == sync_result.context_version_id
+    )
+
+    # 2. Concurrent calls overlap on one event loop
+    llm = FakeHygieneLLM(latency=0.2)
+    governor = ContextHygieneController(llm=llm)
+    started = time.perf_counter()
+    await asyncio.gather(*[governor.aoptimize_context(HISTORY, f"Question {i}?", fast_path=False) for i in range(20)])
+    elapsed = time.perf_counter() - started
+    ok &= check(f"20 concurrent calls in {elapsed:.2f}s (0.2s each)", llm.stats()["calls"] == 20 and elapsed < 1.0)
+
+    # 3. A timeout cancels the in-flight call (max_concurrent=1: a leaked call would throttle the next one)
+    llm = FakeHygieneLLM(latency=0.3, max_concurrent=1)
+    governor = ContextHygieneController(llm=llm)
+    try:
+        await governor.aoptimize_context(HISTORY, QUERY, fast_path=False, timeout=0.05)
+        timed_out = False
+    except asyncio.TimeoutError:
+        timed_out = True
+    await asyncio.sleep(0.4)
+    ok &= check("timeout raises asyncio.TimeoutError", timed_out)
+    ok &= check("timed-out call never completes", llm.stats()["calls"] == 0)
+    llm.latency = 0
+    retry = await governor.aoptimize_context(HISTORY, QUERY, fast_path=False)
+    ok &= check("slot released and nothing cached", retry.decision_tier == "llm" and llm.stats()["throttled"] == 0)
+
+    # 4. Cancelling the awaiting task cancels the call
+    llm = FakeHygieneLLM(latency=0.3, max_concurrent=1)
+    governor = ContextHygieneController(llm=llm)
+    task = asyncio.create_task(governor.aoptimize_context(HISTORY, QUERY, fast_path=False))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    try:
+        await task
+        cancelled = False
+    except asyncio.CancelledError:
+        cancelled = True
+    await asyncio.sleep(0.4)
+    llm.latency = 0
+    await governor.aoptimize_context(HISTORY, "Another question?", fast_path=False)
+    ok &= check(
+        "task cancellation cancels the call",
+        cancelled and llm.stats()["calls"] == 1 and llm.stats()["throttled"] == 0
+    )
+
+    # 5. Middleware and graph
+    decision = await asanitize_context(HISTORY, QUERY, llm=FakeHygieneLLM(), fast_path=False)
+    ok &= check("asanitize_context passes", decision["status"] == "pass" and decision["metadata"]["decision_tier"] == "llm")
+
+    llm = FakeHygieneLLM(latency=0.3, max_concurrent=1)
+    graph = build_graph(controller=ContextHygieneController(llm=llm))
+    run = asyncio.create_task(graph.ainvoke({"raw_messages": HISTORY, "current_query": "And the learning rate?"}))
+    await asyncio.sleep(0.05)
+    run.cancel()
+    try:
+        await run
+    except asyncio.CancelledError:
+        pass
+    llm.latency = 0
+    final = await graph.ainvoke({"raw_messages": HISTORY, "current_query": "And the learning rate?"})
+    ok &= check(
+        "graph ainvoke runs; cancelling a run cancels its call",
+        bool(final.get("final_response")) and llm.stats()["calls"] == 1 and llm.stats()["throttled"] == 0
+    )
+    return ok
+
+def run_verification():
+    ok = asyncio.run(verify())
+    print("\nAll async checks passed." if ok else "\nSome async checks FAILED.")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if run_verification() else 1)
@@ -0,0 +1,76 @@
+import sys
+import os
+
+# Add the project root to python path to allow imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.api import sanitize_context_batch
+from app.core.fake_llm import FakeHygieneLLM
+from app.core.hygiene import ContextHygieneController
+
+def session(i):
+    # Later sessions are shorter, so with latency_per_kb they finish first
+    filler = " ".join(["Gradients flow backwards through each layer."] * (12 - i))
+    return [f"User: Session {i}: explain backpropagation.", f"AI: {filler}"], f"Session {i}: how are the weights updated?"
+
+def check(label, condition):
+    print(f"[{'PASS' if condition else 'FAIL'}] {label}")
+    return condition
+
+def run_verification():
+    ok = True
+    items = [session(i) for i in range(12)]
+
+    # 1. Results come back in input order even when they complete out of order
+    governor = ContextHygieneController(llm=FakeHygieneLLM(latency=0.02, latency_per_kb=0.2))
+    completion = [item.index for item in governor.iter_optimize_context_batch(items, fast_path=False, max_concurrency=12)]
+    results = governor.optimize_context_batch(items, fast_path=False, use_cache=False, max_concurrency=12)
+    ok &= check(f"iterator yields as completed ({completion[:4]}...)", sorted(completion) == list(range(12)) and completion != list(range(12)))
+    ok &= check(
+        "batch results are in input order and belong to their item",
+        [item.index for item in results] == list(range(12))
+        and all(item.ok and f"Session {item.index}:" in item.result.optimized_context for item in results)
+    )
+
+    # 2. At most max_concurrency calls in flight (the fake LLM throttles a fifth concurrent call)
+    llm = FakeHygieneLLM(latency=0.05, max_concurrent=4)
+    results = ContextHygieneController(llm=llm).optimize_context_batch(items, fast_path=False, max_concurrency=4)
+    ok &= check(
+        f"max_concurrency=4 respected ({llm.stats()['calls']} calls, {llm.stats()['throttled']} throttled)",
+        all(item.ok for item in results) and llm.stats()["throttled"] == 0
+    )
+
+    # 3. Failures stay per item
+    llm = FakeHygieneLLM(latency=0.2, max_concurrent=4)
+    results = ContextHygieneController(llm=llm).optimize_context_batch(items[:4] + [(None, "broken")] + items[4:8], fast_path=False, max_concurrency=8)
+    failed = [item.index for item in results if not item.ok]
+    ok &= check(
+        f"bad item and throttled calls fail alone (failed {failed})",
+        4 in failed and llm.stats()["throttled"] == len(failed) - 1
+        and all(item.ok for item in results if item.index not in failed) and len(results) == 9
+    )
+
+    # 4. Items are read lazily, one chunk at a time
+    consumed = []
+    def lazy_items():
+        for i in range(40):
+            consumed.append(i)
+            yield session(i % 12)
+    iterator = ContextHygieneController(llm=FakeHygieneLLM()).iter_optimize_context_batch(lazy_items(), fast_path=False, max_concurrency=2)
+    next(iterator)
+    ok &= check(f"first result after reading {len(consumed)} of 40 items", len(consumed) == 8)
+    iterator.close()
+
+    # 5. Middleware: error dicts in place, decisions in input order
+    decisions = sanitize_context_batch([items[0], (None, "broken"), items[1]], llm=FakeHygieneLLM(), fast_path=False)
+    ok &= check(
+        "sanitize_context_batch keeps order with error dicts",
+        [decision["status"] for decision in decisions] == ["pass", "error", "pass"]
+        and "Session 1:" in decisions[2]["content"] and bool(decisions[1]["reason"])
+    )
+
+    print("\nAll batch checks passed." if ok else "\nSome batch checks FAILED.")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if run_verification() else 1)
@@ -0,0 +1,87 @@
+import sys
+import os
+import tempfile
+import time
+
+# Add the project root to python path to allow imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.cache import ResultCache, SQLiteResultStore
+from app.core.fake_llm import FakeHygieneLLM
+from app.core.hygiene import ContextHygieneController
+
+HISTORY = [
+    "User: Explain backpropagation.",
+    "AI: Backpropagation computes the gradient of the loss with respect to the weights."
+]
+QUERY = "How are the weights updated?"
+
+def check(label, condition):
+    print(f"[{'PASS' if condition else 'FAIL'}] {label}")
+    return condition
+
+def run_verification():
+    ok = True
+
+    # 1. An identical request is served from the cache without an LLM call
+    llm = FakeHygieneLLM()
+    governor = ContextHygieneController(llm=llm)
+    first = governor.optimize_context(HISTORY, QUERY, fast_path=False)
+    second = governor.optimize_context(HISTORY, QUERY, fast_path=False)
+    ok &= check(
+        f"repeat request -> decision_tier={second.decision_tier!r}, LLM calls={llm.stats()['calls']}",
+        first.decision_tier == "llm" and second.decision_tier == "cache" and llm.stats()["calls"] == 1
+        and second.optimized_context == first.optimized_context
+    )
+    second.optimized_context = "mutated by the caller"
+    third = governor.optimize_context(HISTORY, QUERY, fast_path=False)
+    ok &= check("callers get private copies", third.optimized_context == first.optimized_context)
+
+    # 2. use_cache=False forces a fresh call; a different threshold is a different key
+    llm.reset_stats()
+    fresh = governor.optimize_context(HISTORY, QUERY, fast_path=False, use_cache=False)
+    other = governor.optimize_context(HISTORY, QUERY, fast_path=False, max_token_threshold=500)
+    ok &= check(
+        "use_cache=False and a new threshold both reach the LLM",
+        fresh.decision_tier == "llm" and other.decision_tier == "llm" and llm.stats()["calls"] == 2
+    )
+
+    # 3. Memory tier is bounded by size and TTL
+    cache = ResultCache(max_entries=2, ttl_seconds=None)
+    governor = ContextHygieneController(llm=FakeHygieneLLM(), result_cache=cache)
+    for i in range(3):
+        governor.optimize_context(HISTORY, f"Question {i}?", fast_path=False)
+    stats = cache.stats()
+    ok &= check(f"LRU keeps 2 entries ({stats['evictions']} eviction)", stats["size"] == 2 and stats["evictions"] == 1)
+    ok &= check("evicted entry is a miss", governor.optimize_context(HISTORY, "Question 0?", fast_path=False).decision_tier == "llm")
+
+    cache = ResultCache(ttl_seconds=0.05)
+    governor = ContextHygieneController(llm=FakeHygieneLLM(), result_cache=cache)
+    governor.optimize_context(HISTORY, QUERY, fast_path=False)
+    time.sleep(0.1)
+    expired = governor.optimize_context(HISTORY, QUERY, fast_path=False)
+    ok &= check("expired entry is a miss", expired.decision_tier == "llm" and cache.stats()["expirations"] == 1)
+
+    # 4. The SQLite tier is shared between controllers (and processes)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.db")
+        writer = SQLiteResultStore(path)
+        ContextHygieneController(llm=FakeHygieneLLM(), result_cache=ResultCache(persistent=writer)).optimize_context(
+            HISTORY, QUERY, fast_path=False
+        )
+        reader = SQLiteResultStore(path)
+        llm = FakeHygieneLLM()
+        cache = ResultCache(persistent=reader)
+        result = ContextHygieneController(llm=llm, result_cache=cache).optimize_context(HISTORY, QUERY, fast_path=False)
+        ok &= check(
+            "persistent tier serves another controller",
+            result.decision_tier == "cache" and llm.stats()["calls"] == 0 and cache.stats()["persistent_hits"] == 1
+        )
+        writer.close()
+        reader.close()
+
+    print("\nAll cache checks passed." if ok else "\nSome cache checks FAILED.")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if run_verification() else 1)
@@ -0,0 +1,87 @@
+import sys
+import os
+import asyncio
+
+# Add the project root to python path to allow imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.cascade import CascadeController, CascadeTier
+from app.core.fake_llm import FakeHygieneLLM
+from app.core.hygiene import ContextHygieneController
+
+HISTORY = [
+    "User: Explain backpropagation.",
+    "AI: Backpropagation computes the gradient of the loss with respect to the weights.",
+    "User: How does the learning rate affect it?",
+    "AI: The learning rate scales each weight update."
+]
+
+def cascade(cheap_llm, strong_llm, **kwargs):
+    return CascadeController([
+        CascadeTier("cheap", ContextHygieneController(llm=cheap_llm, prompt_type="opensource"), input_cost_per_1k=0.0001),
+        CascadeTier("strong", ContextHygieneController(llm=strong_llm, prompt_type="optimized"), input_cost_per_1k=0.001)
+    ], **kwargs)
+
+def check(label, condition):
+    print(f"[{'PASS' if condition else 'FAIL'}] {label}")
+    return condition
+
+def run_verification():
+    ok = True
+
+    # 1. Confident cheap model: answered by the first tier, strong model never called
+    cheap, strong = FakeHygieneLLM(confidence=0.92), FakeHygieneLLM(confidence=0.95)
+    governor = cascade(cheap, strong)
+    result = governor.optimize_context(HISTORY, "Which optimizer should I use?", fast_path=False)
+    ok &= check("confident cheap tier is accepted", result.cascade_tier == "cheap" and strong.stats()["calls"] == 0)
+
+    # 2. Low confidence escalates
+    cheap, strong = FakeHygieneLLM(confidence=0.4), FakeHygieneLLM(confidence=0.95)
+    governor = cascade(cheap, strong, min_confidence=0.7)
+    result = governor.optimize_context(HISTORY, "Which optimizer should I use?", fast_path=False)
+    stats = governor.stats()
+    ok &= check("low confidence escalates to the strong tier", result.cascade_tier == "strong" and result.confidence == 0.95)
+    ok &= check("escalation reason recorded", stats["escalation_reasons"] == {"low_confidence": 1})
+
+    # 3. Severe degradation escalates
+    cheap, strong = FakeHygieneLLM(degradation_level="severe"), FakeHygieneLLM()
+    result = cascade(cheap, strong).optimize_context(HISTORY, "Which optimizer should I use?", fast_path=False)
+    ok &= check("severe degradation escalates", result.cascade_tier == "strong")
+
+    # 4. Malformed output (parser failure) escalates
+    cheap, strong = FakeHygieneLLM(malformed=True), FakeHygieneLLM()
+    governor = cascade(cheap, strong)
+    result = governor.optimize_context(HISTORY, "Which optimizer should I use?", fast_path=False)
+    ok &= check("invalid output escalates", result.cascade_tier == "strong" and governor.stats()["tiers"]["cheap"]["errors"] == 1)
+
+    # 5. The last tier's failure is raised
+    governor = cascade(FakeHygieneLLM(malformed=True), FakeHygieneLLM(malformed=True))
+    try:
+        governor.optimize_context(HISTORY, "Which optimizer should I use?", fast_path=False)
+        ok &= check("last tier failure raises", False)
+    except Exception as e:
+        ok &= check(f"last tier failure raises ({type(e).__name__})", True)
+
+    # 6. Local fast path answers before any model
+    cheap, strong = FakeHygieneLLM(), FakeHygieneLLM()
+    result = cascade(cheap, strong).optimize_context(HISTORY, "How does the learning rate affect backpropagation?")
+    ok &= check("local fast path is not escalated", result.decision_tier == "local" and cheap.stats()["calls"] == 0)
+
+    # 7. Async path, cost and latency accounting
+    cheap, strong = FakeHygieneLLM(confidence=0.3, latency=0.01), FakeHygieneLLM(latency=0.02)
+    governor = cascade(cheap, strong)
+    result = asyncio.run(governor.aoptimize_context(HISTORY, "Compare Adam and SGD.", fast_path=False))
+    stats = governor.stats()
+    ok &= check("async escalation", result.cascade_tier == "strong")
+    ok &= check("per-tier latency and cost recorded", stats["tiers"]["strong"]["mean_seconds"] >= 0.02 and stats["total_cost"] > 0)
+
+    # 8. Incremental mode works across tiers (shared context store)
+    follow_up = governor.optimize_context(["User: And momentum?"], "Explain momentum.", fast_path=False, previous_version_id=result.context_version_id)
+    ok &= check("incremental call finds the escalated tier's version", follow_up.decision_tier == "incremental")
+
+    print("\nCascade stats:", governor.stats())
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    run_verification()
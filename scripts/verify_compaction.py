@@ -0,0 +1,113 @@
+import sys
+import os
+import asyncio
+import re
+from typing import List
+
+# Add the project root to python path to allow imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from app.core.compaction import WindowedCompactor
+from app.core.fake_llm import FakeHygieneLLM
+from app.core.hygiene import ContextHygieneController
+from app.core.protection import default_protection_index
+from app.core.tokens import default_token_monitor
+
+MESSAGES_RE = re.compile(r"MESSAGES:\n(.*)\n\nTarget Size", re.DOTALL)
+
+class HalvingSummarizer(BaseChatModel):
+    """Lossy window summarizer: keeps every second message and ignores PROTECTED ITEMS."""
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "halving-summarizer"
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        self.calls += 1
+        lines = MESSAGES_RE.search(str(messages[-1].content)).group(1).split("\n")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="\n".join(lines[::2])))])
+
+PROTECTED = [
+    "User: My SSN is 123-45-6789, use it on the tax form.",
+    "User: Please email the summary to ana.lopez@example.com when done.",
+    "User: Never round the deduction amounts."
+]
+
+def history(turns):
+    messages = []
+    for i in range(turns):
+        messages.append(f"User: Question {i} about the quarterly filing schedule and which receipts still need scanning.")
+        messages.append(f"AI: Answer {i}: the receipts for that quarter go in the second folder, sorted by vendor and date.")
+        if i % 10 == 3:
+            messages.append(PROTECTED[(i // 10) % len(PROTECTED)])
+    return messages
+
+HISTORY = history(30)
+
+def check(label, condition):
+    print(f"[{'PASS' if condition else 'FAIL'}] {label}")
+    return condition
+
+def survivors(messages):
+    """True when every protected item of HISTORY is still in `messages`."""
+    return not default_protection_index.missing(default_protection_index.scan(HISTORY), "\n".join(messages))
+
+def run_verification():
+    ok = True
+    count = default_token_monitor.count_messages
+
+    # 1. Trigger: only histories above trigger_tokens are compacted
+    compactor = WindowedCompactor(HalvingSummarizer(), trigger_tokens=400, window_tokens=200)
+    ok &= check("long history needs compaction, short does not", compactor.needs_compaction(HISTORY) and not compactor.needs_compaction(HISTORY[:4]))
+
+    # 2. Protected items survive every compaction level
+    for levels in (1, 2, 3):
+        compactor = WindowedCompactor(HalvingSummarizer(), trigger_tokens=100, window_tokens=200, max_levels=levels)
+        compacted = compactor.compact(HISTORY)
+        ok &= check(
+            f"level {levels}: {count(HISTORY)} -> {count(compacted)} tokens, protected items kept "
+            f"(restored {compactor.stats()['protected_restored']})",
+            compactor.stats()["levels"] == levels and count(compacted) < count(HISTORY) and survivors(compacted)
+        )
+
+    compactor = WindowedCompactor(HalvingSummarizer(), trigger_tokens=400, window_tokens=200)
+    compacted = compactor.compact(HISTORY)
+    ok &= check(f"stops once under trigger_tokens ({compactor.stats()['levels']} levels)", count(compacted) <= 400 and survivors(compacted))
+
+    # 3. Memo: a grown session only compacts its new windows
+    llm = HalvingSummarizer()
+    compactor = WindowedCompactor(llm, trigger_tokens=100, window_tokens=200, max_levels=1)
+    compactor.compact(HISTORY)
+    first_calls = llm.calls
+    compactor.compact(history(33))
+    ok &= check(
+        f"grown session reuses old windows ({compactor.stats()['memo_hits']} memo hits, {llm.calls - first_calls} new calls)",
+        compactor.stats()["memo_hits"] > 0 and llm.calls - first_calls < first_calls
+    )
+
+    # 4. Async parity
+    compacted = WindowedCompactor(HalvingSummarizer(), trigger_tokens=400, window_tokens=200).compact(HISTORY)
+    acompacted = asyncio.run(WindowedCompactor(HalvingSummarizer(), trigger_tokens=400, window_tokens=200).acompact(HISTORY))
+    ok &= check("acompact matches compact", acompacted == compacted)
+
+    # 5. Controller: the hygiene call sees the compacted history, protected items included
+    plain_llm, compacted_llm = FakeHygieneLLM(), FakeHygieneLLM()
+    plain = ContextHygieneController(llm=plain_llm).optimize_context(HISTORY, "Which folder for Q3?", fast_path=False)
+    compactor = WindowedCompactor(HalvingSummarizer(), trigger_tokens=400, window_tokens=200)
+    result = ContextHygieneController(llm=compacted_llm, compactor=compactor).optimize_context(HISTORY, "Which folder for Q3?", fast_path=False)
+    ok &= check(
+        f"controller compacts before the hygiene call ({plain_llm.stats()['prompt_bytes']} -> {compacted_llm.stats()['prompt_bytes']} prompt bytes)",
+        compacted_llm.stats()["prompt_bytes"] < plain_llm.stats()["prompt_bytes"] and survivors([result.optimized_context])
+        and plain.decision_tier == result.decision_tier == "llm"
+    )
+
+    print("\nAll compaction checks passed." if ok else "\nSome compaction checks FAILED.")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if run_verification() else 1)
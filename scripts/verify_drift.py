@@ -0,0 +1,80 @@
+import sys
+import os
+
+# Add the project root to python path to allow imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.drift import DriftDetector, stem
+from app.core.fake_llm import FakeHygieneLLM
+from app.core.hygiene import ContextHygieneController
+
+HISTORY = [
+    "User: How do I train a neural network?",
+    "AI: Use gradient descent to update the weights; momentum and weight decay help the optimizer converge.",
+    "User: What learning rate should I use?",
+    "AI: Start with 0.001 for Adam and tune from there."
+]
+
+INTENTS = [
+    ("How does momentum help the optimizer?", "follow_up", False),
+    ("Actually, use momentum in the optimizer instead of Adam.", "task_modification", False),
+    ("What do you mean?", "clarification", False),
+    ("What about a network for my home office router?", "topic_shift", True),
+    ("Which GPU should I buy for gaming?", "unrelated", True)
+]
+
+def check(label, condition):
+    print(f"[{'PASS' if condition else 'FAIL'}] {label}")
+    return condition
+
+def run_verification():
+    ok = True
+    detector = DriftDetector()
+
+    # 1. Intent literals and the drift flag
+    for query, intent, drift in INTENTS:
+        estimate = detector.detect(HISTORY, query)
+        ok &= check(
+            f"{query!r} -> {estimate.query_intent} (similarity {estimate.similarity}, confidence {estimate.confidence})",
+            estimate.query_intent == intent and estimate.drift_detected == drift
+        )
+    ok &= check("no history -> no estimate", detector.detect([], "Hello?") is None)
+
+    # 2. Stemming: inflections share a feature, so they ground the query
+    ok &= check("stem", [stem(w) for w in ("decays", "decaying", "weights", "studies", "class")] == ["decay", "decay", "weight", "study", "class"])
+    estimate = detector.detect(HISTORY, "How does decaying the weights work?")
+    ok &= check(
+        f"inflected query is grounded (grounding {detector.grounding(HISTORY, 'How does decaying the weights work?'):.2f})",
+        estimate.query_intent == "follow_up"
+    )
+
+    # 3. Recency: the same topic scores lower once it is far back in the history
+    filler = [f"User: Tell me about the history of Rome, part {i}." for i in range(8)]
+    recent = detector.detect(filler + HISTORY, "How does momentum help the optimizer?").similarity
+    old = detector.detect(HISTORY + filler, "How does momentum help the optimizer?").similarity
+    ok &= check(f"recent topic scores higher ({recent} vs {old})", recent > old)
+
+    # 4. Confidence is calibrated on the drift boundary and never certain
+    threshold = detector.follow_up_threshold
+    ok &= check(
+        "confidence: 0.5 at the boundary, max_confidence far from it, 0.8 for clarifications",
+        detector.confidence(threshold) == 0.5 and detector.confidence(0.0) == detector.confidence(2 * threshold) == 0.95
+        and detector.confidence(1.0) == 0.95 and detector.confidence(0.0, clarification=True) == 0.8
+    )
+
+    # 5. The controller adds the estimate to the prompt as a hint
+    plain, hinted = FakeHygieneLLM(), FakeHygieneLLM()
+    ContextHygieneController(llm=plain).optimize_context(HISTORY, INTENTS[3][0], fast_path=False)
+    ContextHygieneController(llm=hinted, drift_detector=detector).optimize_context(HISTORY, INTENTS[3][0], fast_path=False)
+    hint = detector.detect(HISTORY, INTENTS[3][0]).hint()
+    ok &= check(
+        "drift hint is sent with the prompt",
+        "suggested query_intent=topic_shift" in hint
+        and hinted.stats()["prompt_bytes"] - plain.stats()["prompt_bytes"] == len(hint.encode("utf-8"))
+    )
+
+    print("\nAll drift checks passed." if ok else "\nSome drift checks FAILED.")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if run_verification() else 1)
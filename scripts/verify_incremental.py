@@ -0,0 +1,64 @@
+import sys
+import os
+import asyncio
+
+# Add the project root to python path to allow imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.fake_llm import FakeHygieneLLM
+from app.core.hygiene import ContextHygieneController
+from app.core.store import UnknownContextVersion
+from app.graph.nodes import SpeculativeHygiene
+from app.graph.workflow import build_parallel_graph, build_speculative_graph
+
+HISTORY = [
+    "User: My SSN is 123-45-6789, keep it for the tax form.",
+    "AI: Noted. The form also needs your filing status."
+]
+DELTA = ["User: and the deadline?"]
+QUERY = "When is the tax form due?"
+
+def check(label, condition):
+    print(f"[{'PASS' if condition else 'FAIL'}] {label}")
+    return condition
+
+def raises_miss(call):
+    try:
+        call()
+    except UnknownContextVersion:
+        return True
+    return False
+
+def run_verification():
+    ok = True
+    llm = FakeHygieneLLM()
+    governor = ContextHygieneController(llm=llm)
+
+    # 1. Hit: only the delta is sent, the stored context (with its protected items) is kept
+    first = governor.optimize_context(HISTORY, QUERY, fast_path=False)
+    second = governor.optimize_context(DELTA, QUERY, fast_path=False, previous_version_id=first.context_version_id)
+    ok &= check(
+        "stored version + delta -> incremental tier keeps the earlier SSN",
+        second.decision_tier == "incremental" and "123-45-6789" in second.optimized_context
+    )
+
+    # 2. Miss: raised before any model call, never optimized over the delta alone
+    llm.reset_stats()
+    ok &= check(
+        "unknown version raises UnknownContextVersion without a model call",
+        raises_miss(lambda: governor.optimize_context(DELTA, QUERY, previous_version_id="v-unknown"))
+        and raises_miss(lambda: asyncio.run(governor.aoptimize_context(DELTA, QUERY, previous_version_id="v-unknown")))
+        and llm.stats()["calls"] == 0
+    )
+
+    # 3. The graphs surface the same miss
+    state = {"raw_messages": DELTA, "current_query": QUERY, "previous_context_version_id": "v-unknown"}
+    ok &= check("parallel graph raises on a miss", raises_miss(lambda: build_parallel_graph().invoke(dict(state))))
+    speculative = build_speculative_graph(speculation=SpeculativeHygiene(controller=governor))
+    ok &= check("speculative graph raises on a miss", raises_miss(lambda: speculative.invoke(dict(state))))
+
+    print("\nAll incremental checks passed." if ok else "\nSome incremental checks FAILED.")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if run_verification() else 1)
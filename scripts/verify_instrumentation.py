@@ -0,0 +1,124 @@
+import sys
+import os
+import json
+import logging
+import tempfile
+
+# Add the project root to python path to allow imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.fake_llm import FakeHygieneLLM
+from app.core.hygiene import ContextHygieneController
+from app.core.instrumentation import (
+    NOOP_SPAN, Histogram, Instrumentation, JSONLinesExporter, LoggingExporter, default_instrumentation
+)
+from app.graph.workflow import build_graph
+
+HISTORY = [
+    "User: Explain backpropagation.",
+    "AI: Backpropagation computes the gradient of the loss with respect to the weights."
+]
+QUERY = "How are the weights updated?"
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(record.getMessage())
+
+def check(label, condition):
+    print(f"[{'PASS' if condition else 'FAIL'}] {label}")
+    return condition
+
+def run_verification():
+    ok = True
+    # Collect the module's log lines (exporter output, contained hook failures) instead of printing them
+    handler = ListHandler()
+    log = logging.getLogger("app.core.instrumentation")
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+
+    # 1. Disabled by default: shared no-op spans, no callbacks, nothing recorded
+    instrumentation = Instrumentation()
+    ContextHygieneController(llm=FakeHygieneLLM(), instrumentation=instrumentation).optimize_context(HISTORY, QUERY, fast_path=False)
+    ok &= check(
+        "disabled instrumentation records nothing",
+        instrumentation.span("x") is NOOP_SPAN and instrumentation.callbacks() is None
+        and instrumentation.registry.snapshot() == {"counters": {}, "histograms": {}}
+    )
+
+    # 2. Enabled: stage spans, chain steps with sizes and usage, tier counters
+    instrumentation = Instrumentation(enabled=True)
+    seen = []
+    instrumentation.add_hook(lambda name, seconds, attrs: seen.append(name))
+    instrumentation.add_hook(lambda name, seconds, attrs: 1 / 0)
+    governor = ContextHygieneController(llm=FakeHygieneLLM(), instrumentation=instrumentation)
+    governor.optimize_context(HISTORY, QUERY, fast_path=False)
+    governor.optimize_context(HISTORY, QUERY, fast_path=False)
+    snapshot = instrumentation.registry.snapshot()
+    histograms, counters = snapshot["histograms"], snapshot["counters"]
+    stages = ["hygiene.cache_lookup", "hygiene.chain", "hygiene.protection", "hygiene.token_monitor", "chain.prompt", "chain.llm_call", "chain.parse"]
+    ok &= check("every stage is timed", all(f"{stage}.seconds" in histograms for stage in stages))
+    ok &= check(
+        "model call reports bytes and token usage",
+        all(f"chain.llm_call.{attr}" in histograms for attr in ("prompt_bytes", "response_bytes", "input_tokens", "output_tokens"))
+        and histograms["chain.llm_call.seconds"]["count"] == 1
+    )
+    ok &= check("tier counters", counters.get("hygiene.tier.llm") == 1 and counters.get("hygiene.tier.cache") == 1)
+    ok &= check(
+        "hooks see every span; a failing hook is logged and contained",
+        "hygiene.chain" in seen and "chain.llm_call" in seen and any(line.startswith("Instrumentation hook failed") for line in handler.lines)
+    )
+
+    # 3. Errors are counted and re-raised
+    try:
+        with instrumentation.span("custom.step", items=3):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    counters = instrumentation.registry.snapshot()["counters"]
+    ok &= check("failed span counted as an error", counters["custom.step.errors"] == 1 and counters["custom.step.calls"] == 1)
+
+    # 4. Histogram quantiles are bucket upper bounds; the overflow bucket reports the max
+    histogram = Histogram(buckets=(1, 10, 100))
+    for value in (0.5, 5, 5, 50, 500):
+        histogram.observe(value)
+    stats = histogram.snapshot()
+    ok &= check(f"histogram quantiles (p50={stats['p50']}, p99={stats['p99']})", stats["p50"] == 10 and stats["p99"] == 500 and stats["count"] == 5)
+
+    # 5. Exporters
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "metrics.jsonl")
+        instrumentation.add_exporter(JSONLinesExporter(path))
+        instrumentation.add_exporter(LoggingExporter())
+        instrumentation.export()
+        instrumentation.export()
+        with open(path, encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+    log.removeHandler(handler)
+    log.propagate = True
+    ok &= check(
+        "JSON lines and logging exporters",
+        len(lines) == 2 and lines[0]["counters"]["hygiene.tier.llm"] == 1 and "timestamp" in lines[0]
+        and any(line.startswith("histogram chain.llm_call.seconds") for line in handler.lines)
+    )
+
+    # 6. Graph nodes report through the process-wide instrumentation
+    default_instrumentation.registry.reset()
+    default_instrumentation.enable()
+    try:
+        build_graph(controller=ContextHygieneController(llm=FakeHygieneLLM())).invoke({"raw_messages": HISTORY, "current_query": QUERY})
+        histograms = default_instrumentation.registry.snapshot()["histograms"]
+    finally:
+        default_instrumentation.disable()
+        default_instrumentation.registry.reset()
+    ok &= check("graph nodes are timed", "node.context_hygiene.seconds" in histograms and "node.reasoning_engine.seconds" in histograms)
+
+    print("\nAll instrumentation checks passed." if ok else "\nSome instrumentation checks FAILED.")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if run_verification() else 1)
@@ -0,0 +1,73 @@
+import sys
+import os
+import tempfile
+
+# Add the project root to python path to allow imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import app.graph.nodes as nodes
+from app.core.fake_llm import FakeHygieneLLM
+from app.core.hygiene import ContextHygieneController
+from app.core.store import InMemoryMessageStore, SQLiteMessageStore
+from app.core.versioning import compute_version_id, diff_refs, version_id_from_refs
+from app.graph.workflow import build_graph
+
+HISTORY = [
+    "User: Explain backpropagation.",
+    "AI: Backpropagation computes the gradient of the loss with respect to the weights.",
+    "User: How does the learning rate affect it?"
+]
+
+def check(label, condition):
+    print(f"[{'PASS' if condition else 'FAIL'}] {label}")
+    return condition
+
+def run_verification():
+    ok = True
+
+    # 1. Content addressing: one entry per distinct message, shared across turns
+    store = InMemoryMessageStore()
+    first = store.put_many(HISTORY)
+    second = store.put_many(HISTORY + ["AI: It scales each update."])
+    ok &= check("refs round-trip", store.materialize(first) == HISTORY)
+    ok &= check("unchanged messages are shared", second[:3] == first and len(store) == 4)
+
+    # 2. Bounded LRU: recently used messages survive, evicted refs fail loudly
+    store = InMemoryMessageStore(max_entries=3)
+    refs = store.put_many(["a", "b", "c"])
+    store.get(refs[0])
+    store.put("d")
+    ok &= check("least recently used message evicted", store.get(refs[1]) is None and store.get(refs[0]) == "a" and store.evictions == 1)
+    try:
+        store.materialize(refs)
+        ok &= check("evicted ref raises KeyError", False)
+    except KeyError:
+        ok &= check("evicted ref raises KeyError", True)
+
+    # 3. Version ids from refs equal those from text; diffs need no text
+    context = "\n".join(HISTORY)
+    ok &= check("version id from refs", version_id_from_refs(first) == compute_version_id(context))
+    diff = diff_refs(first, second)
+    ok &= check("append-only diff", diff["common_prefix"] == 3 and diff["added"] == second[3:] and diff["removed"] == [])
+
+    # 4. Reference-based graph state (SQLite store, as next to a persistent checkpointer)
+    with tempfile.TemporaryDirectory() as directory:
+        nodes.message_store = SQLiteMessageStore(os.path.join(directory, "messages.db"))
+        try:
+            graph = build_graph(controller=ContextHygieneController(llm=FakeHygieneLLM()))
+            state = graph.invoke({"raw_messages": None, "raw_message_refs": nodes.store_messages(HISTORY), "current_query": "And momentum?"})
+            ok &= check(
+                "graph keeps refs in state and materializes on demand",
+                state["optimized_context"] is None and state["optimized_context_refs"]
+                and nodes.optimized_context_of(state).startswith(HISTORY[0])
+                and state["context_version_id"] == version_id_from_refs(state["optimized_context_refs"])
+            )
+        finally:
+            nodes.message_store.close()
+            nodes.message_store = nodes.default_message_store
+
+    print("\nAll message store checks passed." if ok else "\nSome message store checks FAILED.")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if run_verification() else 1)
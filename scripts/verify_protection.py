@@ -0,0 +1,52 @@
+import sys
+import os
+
+# Add the project root to python path to allow imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.fake_llm import FakeHygieneLLM
+from app.core.hygiene import ContextHygieneController
+from app.core.protection import ProtectionIndex
+
+PROTECTED = ["User: My SSN is 123-45-6789, keep it for the tax form.", "AI: Noted."]
+PLAIN = ["User: What is a good pasta recipe?", "AI: Try cacio e pepe."]
+
+def check(label, condition):
+    print(f"[{'PASS' if condition else 'FAIL'}] {label}")
+    return condition
+
+def run_verification():
+    ok = True
+    index = ProtectionIndex(dictionary=["Project Falcon"])
+
+    # 1. Entities: patterns, dictionary terms, and directives only on user turns
+    kinds = {entity.kind for entity in index.scan(PROTECTED + ["User: Status of Project Falcon? Never share it."])}
+    advice = index.scan(["AI: You should always normalize inputs."])
+    ok &= check(f"ssn, dictionary term and user constraint found ({sorted(kinds)})", {"ssn", "dictionary", "constraint"} <= kinds)
+    ok &= check("assistant advice is not a constraint", not advice)
+
+    # 2. Dropped protected spans are restored verbatim
+    result = ContextHygieneController(llm=FakeHygieneLLM(), protection=index).optimize_context(PROTECTED, "Summarize.", fast_path=False)
+    result.optimized_context = "User: keep it for the tax form."
+    index.enforce(result, PROTECTED)
+    ok &= check(
+        "dropped span restored verbatim",
+        "[Protected] 123-45-6789" in result.optimized_context and result.protected_items_count >= 1 and index.stats()["restored"] == 1
+    )
+
+    # 3. Smart Autonomy: drift + protected -> HITL; drift alone -> auto-prune
+    result = ContextHygieneController(llm=FakeHygieneLLM(drift_detected=True), protection=index).optimize_context(PROTECTED, "Pasta?", fast_path=False)
+    ok &= check("drift + protected item requires HITL", result.hitl_required)
+    result = ContextHygieneController(llm=FakeHygieneLLM(drift_detected=True), protection=index).optimize_context(PLAIN, "Tax forms?", fast_path=False)
+    ok &= check("drift without protected items auto-prunes", not result.hitl_required)
+
+    # 4. The model's own HITL (ambiguity, low confidence) is never cleared
+    result = ContextHygieneController(llm=FakeHygieneLLM(drift_detected=True, hitl_required=True), protection=index).optimize_context(PLAIN, "Tax forms?", fast_path=False)
+    ok &= check("model-raised HITL is kept when nothing is protected", result.hitl_required)
+
+    print(f"\nProtection counters: {index.stats()}")
+    print("\nAll protection checks passed." if ok else "\nSome protection checks FAILED.")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if run_verification() else 1)
@@ -0,0 +1,76 @@
+import sys
+import os
+import asyncio
+
+# Add the project root to python path to allow imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_core.exceptions import OutputParserException
+from app.core.fake_llm import FakeHygieneLLM
+from app.core.hygiene import ContextHygieneController
+from app.core.repair import HygieneOutputParser
+
+HISTORY = [
+    "User: Explain backpropagation.",
+    "AI: Backpropagation computes the gradient of the loss with respect to the weights."
+]
+QUERY = "How are the weights updated?"
+
+def check(label, condition):
+    print(f"[{'PASS' if condition else 'FAIL'}] {label}")
+    return condition
+
+def controller(llm, parser, **kwargs):
+    return ContextHygieneController(llm=llm, prompt_type="opensource", output_parser=parser, **kwargs)
+
+def run_verification():
+    ok = True
+
+    # 1. Well-formed replies take the fast path
+    parser = HygieneOutputParser()
+    controller(FakeHygieneLLM(), parser).optimize_context(HISTORY, QUERY, fast_path=False)
+    ok &= check("valid reply parsed on the fast path", parser.stats()["fast_path"] == 1)
+
+    # 2. Off-schema reply (fences, trailing comma, Python literal, 90 for 0.9, "Medium",
+    #    "Follow-up", no metrics) is repaired locally: one model call, no retry
+    parser, llm = HygieneOutputParser(), FakeHygieneLLM(off_schema=True)
+    result = controller(llm, parser).optimize_context(HISTORY, QUERY, fast_path=False)
+    stats = parser.stats()
+    ok &= check(
+        f"off-schema reply repaired without a retry (calls={llm.stats()['calls']}, rules={sorted(stats['rules'])})",
+        llm.stats()["calls"] == 1 and stats["repaired"] == 1 and stats["failed"] == 0
+    )
+    ok &= check(
+        "repaired values normalized",
+        result.confidence == 0.9 and result.degradation_level == "moderate"
+        and result.query_intent == "follow_up" and result.metrics.relevance_retention_score == 0.9
+    )
+
+    # 3. Streaming uses the same repair rules
+    parser = HygieneOutputParser()
+    events = list(controller(FakeHygieneLLM(off_schema=True), parser).stream_optimize_context(HISTORY, QUERY, fast_path=False))
+    ok &= check("streamed off-schema reply repaired", events[-1].type == "result" and parser.stats()["repaired"] == 1)
+
+    # 4. Unrepairable (truncated) reply -> exactly one re-invocation
+    parser, llm = HygieneOutputParser(), FakeHygieneLLM(malformed_first=1)
+    controller(llm, parser).optimize_context(HISTORY, QUERY, fast_path=False)
+    ok &= check(
+        f"truncated reply retried once (calls={llm.stats()['calls']})",
+        llm.stats()["calls"] == 2 and parser.stats()["failed"] == 1
+    )
+
+    # 5. Still broken after the retries -> OutputParserException (cascade escalation error)
+    parser, llm = HygieneOutputParser(), FakeHygieneLLM(malformed=True)
+    try:
+        asyncio.run(controller(llm, parser, parse_retries=2).aoptimize_context(HISTORY, QUERY, fast_path=False))
+        raised = False
+    except OutputParserException:
+        raised = True
+    ok &= check(f"persistent failure raises after {llm.stats()['calls']} calls", raised and llm.stats()["calls"] == 3)
+
+    print(f"\nRepair counters: {parser.stats()}")
+    print("\nAll repair checks passed." if ok else "\nSome repair checks FAILED.")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if run_verification() else 1)
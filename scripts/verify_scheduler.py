@@ -0,0 +1,84 @@
+import sys
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the project root to python path to allow imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.fake_llm import FakeHygieneLLM
+from app.core.hygiene import ContextHygieneController
+from app.core.scheduler import LLMScheduler
+
+HISTORY = [
+    "User: Explain backpropagation.",
+    "AI: Backpropagation computes the gradient of the loss with respect to the weights."
+]
+
+def check(label, condition):
+    print(f"[{'PASS' if condition else 'FAIL'}] {label}")
+    return condition
+
+def burst(controller, n, workers=16):
+    """n distinct requests from `workers` threads; returns the number that failed."""
+    def call(i):
+        try:
+            controller.optimize_context(HISTORY, f"Question {i} about gradients?", fast_path=False, use_cache=False)
+            return 0
+        except Exception:
+            return 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(call, range(n)))
+
+def run_verification():
+    ok = True
+
+    # 1. Without a scheduler, a burst over the provider's concurrency limit gets 429s
+    llm = FakeHygieneLLM(latency=0.02, max_concurrent=4)
+    failures = burst(ContextHygieneController(llm=llm), 40)
+    ok &= check(f"unscheduled burst hits throttling ({failures} failed)", failures > 0)
+
+    # 2. With a scheduler, every call succeeds: throttled ones are retried and the limit adapts
+    llm = FakeHygieneLLM(latency=0.02, max_concurrent=4)
+    scheduler = LLMScheduler(max_concurrency=16, base_delay=0.01, max_retries=8)
+    failures = burst(ContextHygieneController(llm=llm, scheduler=scheduler), 40)
+    stats = scheduler.stats()
+    ok &= check(f"scheduled burst succeeds (throttled={stats['throttled']}, limit={stats['concurrency_limit']})", failures == 0 and stats["completed"] == 40)
+    ok &= check("throttling lowered the concurrency limit", stats["concurrency_limit"] < 16)
+
+    # 3. Request quota: 120 rpm (2/s) with a full one-minute bucket -> calls past 120 wait
+    scheduler = LLMScheduler(requests_per_minute=120, max_concurrency=4)
+    controller = ContextHygieneController(llm=FakeHygieneLLM(), scheduler=scheduler)
+    burst(controller, 124, workers=8)
+    stats = scheduler.stats()
+    ok &= check(f"request bucket delays calls over quota (max wait {stats['max_wait_seconds']:.2f}s)", stats["max_wait_seconds"] > 1.0)
+
+    # 4. Priorities: interactive calls overtake a queued batch sweep
+    scheduler = LLMScheduler(max_concurrency=2)
+    controller = ContextHygieneController(llm=FakeHygieneLLM(latency=0.02), scheduler=scheduler)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        sweep = pool.submit(controller.optimize_context_batch, [(HISTORY, f"Batch {i}?") for i in range(30)], max_concurrency=8, fast_path=False)
+        interactive = [pool.submit(controller.optimize_context, HISTORY, f"Interactive {i}?", fast_path=False) for i in range(5)]
+        [future.result() for future in interactive]
+        sweep.result()
+    waits = scheduler.stats()["mean_wait_seconds"]
+    ok &= check(f"interactive waits less than batch ({waits})", waits["interactive"] < waits["batch"])
+
+    # 5. Async path under throttling
+    llm = FakeHygieneLLM(latency=0.02, max_concurrent=3)
+    scheduler = LLMScheduler(max_concurrency=12, base_delay=0.01, max_retries=8)
+    controller = ContextHygieneController(llm=llm, scheduler=scheduler)
+
+    async def many():
+        return await asyncio.gather(*[
+            controller.aoptimize_context(HISTORY, f"Async {i}?", fast_path=False, use_cache=False) for i in range(30)
+        ])
+    results = asyncio.run(many())
+    ok &= check(f"async burst succeeds (throttled={scheduler.stats()['throttled']})", len(results) == 30)
+
+    print("\nScheduler stats:", scheduler.stats())
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    run_verification()
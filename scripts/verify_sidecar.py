@@ -0,0 +1,151 @@
+import sys
+import os
+import asyncio
+import json
+import socket
+import subprocess
+import time
+
+# Add the project root to python path to allow imports
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+from app.core.fake_llm import FakeHygieneLLM
+from app.core.sidecar import HygieneSidecar
+
+HISTORY = [
+    "User: Explain backpropagation.",
+    "AI: Backpropagation computes the gradient of the loss with respect to the weights."
+]
+
+def check(label, condition):
+    print(f"[{'PASS' if condition else 'FAIL'}] {label}")
+    return condition
+
+async def request(port, method, path, payload=None):
+    """Minimal HTTP/1.1 client: returns (status, headers, json body)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, data = raw.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = dict(line.split(": ", 1) for line in lines[1:])
+    return int(lines[0].split(" ")[1]), headers, json.loads(data)
+
+async def raw_status(port, content_length):
+    """Status for a POST whose Content-Length header is sent as given."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"POST /v1/sanitize HTTP/1.1\r\nHost: localhost\r\nContent-Length: {content_length}\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    return int(raw.split(b" ", 2)[1]) if raw else None
+
+def sanitize_body(query, **options):
+    return {"history": HISTORY, "query": query, "fast_path": False, **options}
+
+async def verify_in_process():
+    ok = True
+
+    # 1. Concurrent identical requests share one LLM call (cache bypassed to isolate singleflight)
+    llm = FakeHygieneLLM(latency=0.2)
+    sidecar = HygieneSidecar(llm=llm)
+    await sidecar.start(port=0)
+    status, _, body = await request(sidecar.port, "GET", "/healthz")
+    ok &= check("healthz answers", status == 200 and body["status"] == "ok")
+
+    replies = await asyncio.gather(*[
+        request(sidecar.port, "POST", "/v1/sanitize", sanitize_body("How are the weights updated?", use_cache=False))
+        for _ in range(20)
+    ])
+    contents = {reply[2]["content"] for reply in replies}
+    ok &= check(
+        f"20 identical concurrent requests -> {llm.stats()['calls']} LLM call(s)",
+        all(reply[0] == 200 for reply in replies) and len(contents) == 1 and llm.stats()["calls"] == 1
+    )
+
+    # 2. Different configs are not coalesced
+    llm.reset_stats()
+    await asyncio.gather(
+        request(sidecar.port, "POST", "/v1/sanitize", sanitize_body("How are the weights updated?", use_cache=False, max_token_threshold=500)),
+        request(sidecar.port, "POST", "/v1/sanitize", sanitize_body("How are the weights updated?", use_cache=False, max_token_threshold=800))
+    )
+    ok &= check("different configs make separate calls", llm.stats()["calls"] == 2)
+
+    # 3. Graph endpoint runs the compiled app
+    status, _, body = await request(sidecar.port, "POST", "/v1/graph", {"raw_messages": HISTORY, "current_query": "And the learning rate?"})
+    ok &= check("graph endpoint returns a final response", status == 200 and bool(body.get("final_response")))
+
+    # 4. Bad input
+    status, _, _ = await request(sidecar.port, "POST", "/v1/sanitize", {"query": "missing history"})
+    ok &= check("invalid body answers 400", status == 400)
+    before = (await sidecar.handle_stats({}))["controllers"]["builds"]
+    bad = [{"prompt_type": "made-up"}, {"engine": "gpu"}, {"max_token_threshold": "2000"}, {"use_cache": "no"}, {"timeout": -1}]
+    statuses = [(await request(sidecar.port, "POST", "/v1/sanitize", sanitize_body("Why?", **options)))[0] for options in bad]
+    after = (await sidecar.handle_stats({}))["controllers"]["builds"]
+    ok &= check(f"invalid options answer 400 without building controllers ({statuses})", statuses == [400] * len(bad) and after == before)
+    statuses = [await raw_status(sidecar.port, length) for length in ("abc", "-5", str(10 * 1024 * 1024))]
+    ok &= check(f"bad Content-Length answers 400/413 ({statuses})", statuses == [400, 400, 413])
+    status, _, body = await request(sidecar.port, "POST", "/v1/sanitize", sanitize_body("And then?", previous_version_id="v-unknown"))
+    ok &= check("unknown previous_version_id answers 409", status == 409 and "resend" in body["error"])
+    await sidecar.close()
+
+    # 5. Backpressure: 2 running + 2 queued, the rest answer 503 with Retry-After
+    sidecar = HygieneSidecar(llm=FakeHygieneLLM(latency=0.3), max_concurrency=2, max_queue=2)
+    await sidecar.start(port=0)
+    replies = await asyncio.gather(*[
+        request(sidecar.port, "POST", "/v1/sanitize", sanitize_body(f"Distinct question {i}?"))
+        for i in range(10)
+    ])
+    statuses = sorted(reply[0] for reply in replies)
+    ok &= check(
+        f"overload sheds load (statuses {statuses})",
+        statuses.count(200) == 4 and statuses.count(503) == 6 and all("Retry-After" in reply[1] for reply in replies if reply[0] == 503)
+    )
+    await sidecar.close()
+    return ok
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def verify_workers():
+    """Two worker processes on one port, served with the fake LLM."""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "app.core.sidecar", "--port", str(port), "--workers", "2", "--fake-llm-latency", "0.05", "--log-level", "WARNING"],
+        cwd=PROJECT_ROOT
+    )
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                await request(port, "GET", "/healthz")
+                break
+            except OSError:
+                if time.time() > deadline:
+                    return check("workers started", False)
+                await asyncio.sleep(0.2)
+        replies = await asyncio.gather(*[
+            request(port, "POST", "/v1/sanitize", sanitize_body(f"Question {i}?")) for i in range(20)
+        ])
+        return check("multi-worker mode serves requests", all(reply[0] == 200 for reply in replies))
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+def run_verification():
+    ok = asyncio.run(verify_in_process())
+    ok &= asyncio.run(verify_workers())
+    print("\nAll sidecar checks passed." if ok else "\nSome sidecar checks FAILED.")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if run_verification() else 1)
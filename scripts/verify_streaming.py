@@ -0,0 +1,116 @@
+import sys
+import os
+import asyncio
+import json
+
+# Add the project root to python path to allow imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.fake_llm import FakeHygieneLLM
+from app.core.hygiene import ContextHygieneController
+from app.core.streaming import IncrementalJSONParser
+from app.graph.workflow import build_graph
+
+REPEATED = "User: Please keep answers short and use metric units."
+HISTORY = [
+    REPEATED,
+    "AI: Understood, short answers in metric units.",
+    "User: How far is the Moon?",
+    "AI: About 384,400 km on average.",
+    REPEATED
+]
+QUERY = "And the Sun?"
+PROTECTED = ["User: My SSN is 123-45-6789, keep it for the tax form.", "AI: Noted."]
+
+def check(label, condition):
+    print(f"[{'PASS' if condition else 'FAIL'}] {label}")
+    return condition
+
+async def collect(events):
+    return [event async for event in events]
+
+def run_verification():
+    ok = True
+
+    # 1. Incremental parser: any chunking gives the same object as json.loads
+    document = json.dumps({
+        "query_intent": "follow_up", "drift_detected": False, "hitl_required": None,
+        "optimized_context": "line \"one\"\nemoji \U0001F600 tab\t\\ end", "metrics": {"nested": [1, {"a": "}"}]}
+    })
+    for size in (1, 3, 7, len(document)):
+        parser = IncrementalJSONParser()
+        pieces = []
+        for i in range(0, len(document), size):
+            pieces += [value for kind, key, value in parser.feed(document[i:i + size]) if kind == "chunk"]
+        ok &= check(
+            f"incremental parser, {size}-char chunks",
+            parser.done and parser.value == json.loads(document) and "".join(pieces) == json.loads(document)["optimized_context"]
+        )
+
+    # 2. Event order and the streamed pieces vs. the final context (duplicate history -> back-reference)
+    governor = ContextHygieneController(llm=FakeHygieneLLM())
+    events = list(governor.stream_optimize_context(HISTORY, QUERY, fast_path=False, use_cache=False))
+    types = [event.type for event in events]
+    result = events[-1].value
+    pieces = "".join(event.value for event in events if event.type == "context")
+    ok &= check(
+        "decision precedes the first context piece; result is last",
+        types.count("decision") == 1 and types.index("decision") < types.index("context") and types[-1] == "result"
+    )
+    ok &= check(
+        "context pieces concatenate to the result, back-references expanded",
+        pieces == result.optimized_context and "<ref" not in pieces and result.optimized_context.count(REPEATED) == 2
+    )
+    streamed = [event.value for event in events if event.type == "field" and event.field == "optimized_context"]
+    ok &= check("optimized_context field event is expanded", streamed == [pieces])
+
+    # 3. Async stream yields the same events
+    async_events = asyncio.run(collect(governor.astream_optimize_context(HISTORY, QUERY, fast_path=False, use_cache=False)))
+    ok &= check("async stream matches", [(e.type, e.field) for e in async_events] == [(e.type, e.field) for e in events]
+                and async_events[-1].value.optimized_context == result.optimized_context)
+
+    # 4. Halt: drift with a protected item decides HITL early; closing the stream abandons the call
+    governor = ContextHygieneController(llm=FakeHygieneLLM(drift_detected=True))
+    stream = governor.stream_optimize_context(PROTECTED, "What's a good pasta recipe?", fast_path=False)
+    seen = []
+    for event in stream:
+        seen.append(event.type)
+        if event.type == "decision":
+            decision = event.value
+            break
+    stream.close()
+    ok &= check(
+        "drift + protected item halts before any context piece",
+        decision["hitl_required"] and decision["drift_detected"] and "context" not in seen
+    )
+    ok &= check("abandoned stream is neither cached nor stored", governor.result_cache.stats()["size"] == 0)
+    model_hitl = ContextHygieneController(llm=FakeHygieneLLM(drift_detected=True, hitl_required=True))
+    decision = next(event for event in model_hitl.stream_optimize_context(HISTORY, "Pasta?", fast_path=False) if event.type == "decision")
+    ok &= check("early decision keeps the model's HITL without protected items", decision.value["hitl_required"])
+
+    # 5. The streaming graph routes the early halt to human review
+    graph = build_graph(controller=governor, stream_hygiene=True)
+    hygiene_events = [chunk["hygiene"]["type"] for chunk in graph.stream(
+        {"raw_messages": PROTECTED, "current_query": "What's a good pasta recipe?"}, stream_mode="custom"
+    )]
+    final = graph.invoke({"raw_messages": PROTECTED, "current_query": "What's a good pasta recipe?"})
+    ok &= check(
+        "streaming graph halts at the decision",
+        hygiene_events[-1] == "decision" and final["hitl_required"] and final["optimized_context"] is None
+        and final["final_response"].startswith("[SYSTEM GOVERNANCE]")
+    )
+
+    # 6. Cache tier: decision, context and result at once
+    governor = ContextHygieneController(llm=FakeHygieneLLM())
+    governor.optimize_context(HISTORY, QUERY, fast_path=False)
+    events = list(governor.stream_optimize_context(HISTORY, QUERY, fast_path=False))
+    ok &= check(
+        "cached request streams decision, context, result",
+        [event.type for event in events] == ["decision", "context", "result"] and events[-1].value.decision_tier == "cache"
+    )
+
+    print("\nAll streaming checks passed." if ok else "\nSome streaming checks FAILED.")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if run_verification() else 1)
@@ -0,0 +1,65 @@
+import sys
+import os
+
+# Add the project root to python path to allow imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.fake_llm import FakeHygieneLLM
+from app.core.hygiene import ContextHygieneController
+from app.core.tokens import TokenMonitor, estimate_tokens
+
+HISTORY = [
+    "User: Explain backpropagation.",
+    "AI: Backpropagation computes the gradient of the loss with respect to the weights.",
+    "User: How does the learning rate affect it?",
+    "AI: The learning rate scales each weight update."
+]
+
+class CountingTokenizer:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        return len(text.split())
+
+def check(label, condition):
+    print(f"[{'PASS' if condition else 'FAIL'}] {label}")
+    return condition
+
+def run_verification():
+    ok = True
+
+    # 1. Estimator: deterministic, ~4 characters or ~0.75 words per token
+    ok &= check("estimate_tokens", estimate_tokens("") == 0 and estimate_tokens("abcd" * 10) == 10 and estimate_tokens("a b c") == 4)
+
+    # 2. Pluggable tokenizer, per-message cache: a growing history only tokenizes new messages
+    tokenizer = CountingTokenizer()
+    monitor = TokenMonitor(tokenizer=tokenizer)
+    first = monitor.count_messages(HISTORY[:3])
+    second = monitor.count_messages(HISTORY)
+    ok &= check(
+        f"appending one message tokenizes one message (tokenizer calls={tokenizer.calls})",
+        tokenizer.calls == 4 and second == first + len(HISTORY[3].split()) and monitor.stats()["hits"] == 3
+    )
+    small = TokenMonitor(tokenizer=tokenizer, cache_size=2)
+    small.count_messages(HISTORY)
+    ok &= check("cache is bounded", small.stats()["size"] == 2)
+
+    # 3. Local counts replace the model's guesses; the budget is checked locally
+    governor = ContextHygieneController(llm=FakeHygieneLLM(), token_monitor=TokenMonitor(tokenizer=tokenizer))
+    result = governor.optimize_context(HISTORY, "Compare Adam and SGD.", fast_path=False, max_token_threshold=2000)
+    expected = sum(len(message.split()) for message in HISTORY)
+    ok &= check(
+        f"tokens_before/after counted locally ({result.tokens_before}/{result.tokens_after})",
+        result.tokens_before == expected and result.tokens_after == len(result.optimized_context.split())
+        and result.within_budget and not result.requires_reasoning_caution
+    )
+    result = governor.optimize_context(HISTORY, "Compare Adam and SGD.", fast_path=False, max_token_threshold=10)
+    ok &= check("over budget -> within_budget=False and reasoning caution", not result.within_budget and result.requires_reasoning_caution)
+
+    print("\nAll token monitor checks passed." if ok else "\nSome token monitor checks FAILED.")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if run_verification() else 1)